@@ -16,7 +16,29 @@ from beanie import init_beanie
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
-from app.user.schemas import ProposalFile, User
+from app.user.schemas import ProjectDocument, ProposalDocument, ProposalFile, User
+
+from app.user.projects_migration import EmbeddedProjectsMigration
+
+from app.user.proposal_storage import proposal_file_storage
+
+from app.user.proposal_files_migration import ProposalFilesMigration
+
+from app.jobs.schemas import ProposalJob
+
+from app.ocr.schemas import AnalyzeResultCache
+
+from app.proposal_object.checkpoints import ProposalCheckpoint
+
+from app.jobs.job_queue import proposal_job_queue
+
+from app.progemi_api.http_client import progemi_http_client
+
+from app.llm.openai_gateway import openai_gateway
+
+from app.user.project_reconciler import project_reconciler
+
+from app.auth.session_token import session_token_handler
 
 from config.config import env_param
 
@@ -29,6 +51,8 @@ async def lifespan(app_lifespan: FastAPI) -> AsyncIterator[None]:
     Init fastapi app with Beanie and MongoDB connection.
     """
 
+    session_token_handler.check_configured()
+
     openapi_schema = app_lifespan.openapi()
 
     with open(
@@ -50,16 +74,54 @@ async def lifespan(app_lifespan: FastAPI) -> AsyncIterator[None]:
 
         await init_beanie(
             database=client[env_param.USER_DB_NAME],
-            document_models=[User, ProposalFile],
+            document_models=[
+                User,
+                ProjectDocument,
+                ProposalDocument,
+                ProposalFile,
+                ProposalJob,
+                AnalyzeResultCache,
+                ProposalCheckpoint,
+            ],
         )
 
+        await proposal_file_storage.init(database=client[env_param.USER_DB_NAME])
+
+        await proposal_job_queue.fail_stale_jobs()
+
     except Exception as e:
         logger.error("APP => Error initializing MongoDB connection: %s", str(e))
 
+    try:
+        await EmbeddedProjectsMigration().run()
+
+        await ProposalFilesMigration().run()
+
+    except Exception as e:
+        logger.error("APP => Migration failed, the app is not started: %s", str(e))
+
+        raise
+
+    progemi_http_client.start()
+
+    openai_gateway.start()
+
+    proposal_job_queue.start()
+
+    project_reconciler.start()
+
     try:
         yield
 
     finally:
+        await project_reconciler.stop()
+
+        await proposal_job_queue.stop()
+
+        await progemi_http_client.stop()
+
+        await openai_gateway.stop()
+
         try:
             await client.close()
 
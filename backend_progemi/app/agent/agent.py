@@ -4,8 +4,6 @@ from typing import List, Optional
 
 from pydantic import BaseModel
 
-from openai import AsyncOpenAI
-
 from openai.types.chat.chat_completion_user_message_param import (
     ChatCompletionUserMessageParam,
 )
@@ -29,8 +27,14 @@ from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
 
 from app.cost.cost import CostTracker
 
+from app.llm.openai_gateway import get_cached_tokens, openai_gateway
+
+from app.llm.retry_policy import RetryPolicy
+
 from app.performances.time_counter import time_execution
 
+from config.config import env_param
+
 from config.logger_config import logger
 
 
@@ -39,10 +43,9 @@ class Agent:
 
     def __init__(
         self,
-        api_key: str,
         model_name: str,
         system_promt: str,
-        nb_retry: int = 1,
+        nb_retry: int = env_param.LLM_RETRY_MAX_ATTEMPTS,
         timeout: float = 60.0,
         temprature: float = 0.0,
         name: str = "",
@@ -50,8 +53,6 @@ class Agent:
         reasoning_effort: str = "high",
         prediction: Optional[ChatCompletionPredictionContentParam] = None,
     ) -> None:
-        self.client = AsyncOpenAI(api_key=api_key)
-
         self.model_name: str = model_name
 
         self.system_prompt: str = system_promt
@@ -104,40 +105,34 @@ class Agent:
                     )
                 ]
 
-        for _ in range(self.nb_retry):
-            try:
-                completion: ParsedChatCompletion = (
-                    await self.client.chat.completions.parse(
-                        model=self.model_name,
-                        messages=messages,
-                        response_format=response_format,
-                        timeout=self.timeout,
-                        temperature=self.temprature,
-                        prediction=self.prediction,
-                        # reasoning_effort=self.reasoning_effort,
-                    )
-                )
-
-                reasoning = completion.choices[0].message.parsed
+        try:
+            completion: ParsedChatCompletion = await openai_gateway.parse(
+                name=self.name,
+                retry_policy=RetryPolicy(max_attempts=self.nb_retry),
+                model=self.model_name,
+                messages=messages,
+                response_format=response_format,
+                timeout=self.timeout,
+                temperature=self.temprature,
+                prediction=self.prediction,
+                # reasoning_effort=self.reasoning_effort,
+            )
 
-                self.add_cost(completion=completion)
+        except Exception as e:
+            logger.error(
+                "AGENT => Error while calling openai [%s] : %s",
+                self.name,
+                e,
+                exc_info=True,
+            )
 
-                return reasoning
+            return None
 
-            except Exception as e:
-                logger.warning(
-                    "AGENT => Error while calling openai [%s] : %s",
-                    self.name,
-                    e,
-                    exc_info=True,
-                )
+        reasoning = completion.choices[0].message.parsed
 
-        logger.error(
-            "AGENT => Max retry calling openai [%s] : 3",
-            self.name,
-        )
+        self.add_cost(completion=completion)
 
-        return None
+        return reasoning
 
     def add_cost(self, completion: ParsedChatCompletion) -> None:
         """Add cost"""
@@ -154,6 +149,7 @@ class Agent:
                 nb_output_token=output_tokens,
                 model=model,
                 function_name=self.name,
+                nb_cached_input_token=get_cached_tokens(usage=completion.usage),
             )
 
     def log_agent_output(self, agent_output: BaseModel) -> None:
@@ -14,8 +14,12 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app import create_app
 
+from app.auth.session_token import SESSION_COOKIE_NAME
+
 from app.user.router import router as user_router
 
+from config.config import env_param
+
 from config.logger_config import logger
 
 os.environ["SSL_CERT_FILE"] = certifi.where()
@@ -34,6 +38,32 @@ app.add_middleware(
 app.include_router(user_router)
 
 
+@app.middleware("http")
+async def set_session_cookie(request: Request, call_next):
+    """Set the session token issued while verifying the Progemi token."""
+
+    response = await call_next(request)
+
+    session_token = getattr(request.state, "session_token", None)
+
+    cookie_already_set = any(
+        cookie.startswith(f"{SESSION_COOKIE_NAME}=")
+        for cookie in response.headers.getlist("set-cookie")
+    )
+
+    if session_token and not cookie_already_set:
+        response.set_cookie(
+            key=SESSION_COOKIE_NAME,
+            value=session_token,
+            max_age=env_param.SESSION_TTL_SECONDS,
+            httponly=True,
+            secure=env_param.SESSION_COOKIE_SECURE,
+            samesite="lax",
+        )
+
+    return response
+
+
 @app.exception_handler(Exception)
 async def full_traceback_exception_handler(_: Request, exc: Exception):
     """Handle unhandled exceptions and return a full traceback."""
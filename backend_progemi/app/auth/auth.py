@@ -1,8 +1,8 @@
 """Basic JWT authentication example using FastAPI."""
 
-from typing import List
+from typing import List, Optional
 
-from fastapi import Cookie, Depends, HTTPException
+from fastapi import Cookie, Depends, HTTPException, Request
 
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -10,6 +10,10 @@ from app.user.schemas import NewUserInput
 
 from app.auth.schemas import ConnectedUser
 
+from app.auth.session_token import session_token_handler
+
+from app.user.project_reconciler import project_reconciler
+
 from app.user.user_handler import UserHandler
 
 from app.progemi_api.schemas import PackProgemi
@@ -22,14 +26,21 @@ auth_scheme = HTTPBearer(auto_error=False)
 
 
 async def verify_token(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(auth_scheme),
     access_token: str | None = Cookie(default=None),
+    session_token: str | None = Cookie(default=None),
     ip_client: str | None = Cookie(default=None),
     idholding: str | None = Cookie(default=None),
     idsociete: str | None = Cookie(default=None),
     idagence: str | None = Cookie(default=None),
 ) -> ConnectedUser:
-    """Verify JWT token and return the payload."""
+    """Verify JWT token and return the payload.
+
+    The Progemi token is checked against the Progemi API once, then a session token
+    is set in a cookie and verified locally until it expires. The projects of the
+    user are synchronized in background each time a new session token is issued.
+    """
 
     token = credentials.credentials if credentials else access_token
 
@@ -38,24 +49,35 @@ async def verify_token(
     if not token:
         raise HTTPException(status_code=401, detail="Missing credentials")
 
-    user_id: str = await ProgemiAPIHandler().get_user_id_from_token(token=token)
+    user_id: Optional[str] = (
+        session_token_handler.verify(session_token=session_token, progemi_token=token)
+        if session_token
+        else None
+    )
+
+    is_new_session = not user_id
 
-    all_ai_db_user_ids: List[str] = await UserHandler().get_all_user_ids()
+    if is_new_session:
+        user_id = await ProgemiAPIHandler().get_user_id_from_token(token=token)
 
-    if user_id not in all_ai_db_user_ids:
-        logger.info("User %s not found in AI DB, creating new user entry.", user_id)
+        if not await UserHandler().user_exists(user_id=user_id):
+            logger.info("User %s not found in AI DB, creating new user entry.", user_id)
 
-        user_packs_progemi: List[
-            PackProgemi
-        ] = await ProgemiAPIHandler().get_user_packs(token=token)
+            user_packs_progemi: List[
+                PackProgemi
+            ] = await ProgemiAPIHandler().get_user_packs(token=token)
 
-        await UserHandler().create_user(
-            new_user_params=NewUserInput(
-                user_id=user_id, user_name=user_id, user_packs=user_packs_progemi
+            await UserHandler().create_user(
+                new_user_params=NewUserInput(
+                    user_id=user_id, user_name=user_id, user_packs=user_packs_progemi
+                )
             )
+
+        request.state.session_token = session_token_handler.issue(
+            user_id=user_id, progemi_token=token
         )
 
-    return ConnectedUser(
+    connected_user = ConnectedUser(
         user_id=user_id,
         token=token,
         ip_client=ip_client,
@@ -63,3 +85,8 @@ async def verify_token(
         idsociete=idsociete,
         idagence=idagence,
     )
+
+    if is_new_session:
+        project_reconciler.schedule(connected_user=connected_user)
+
+    return connected_user
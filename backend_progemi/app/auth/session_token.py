@@ -0,0 +1,110 @@
+"""Short-lived session tokens signed by the backend, to skip the Progemi token check."""
+
+import hmac
+
+import hashlib
+
+from datetime import datetime, timezone
+
+from typing import Optional
+
+from jwt import JWT, jwk_from_dict
+
+from jwt.exceptions import JWTDecodeError
+
+from jwt.utils import b64encode, get_int_from_datetime
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+SESSION_COOKIE_NAME = "session_token"
+
+ALGORITHM = "HS256"
+
+
+class SessionTokenHandler:
+    """Issue and verify HS256 session tokens bound to a Progemi token.
+
+    The token carries the user ID and a hash of the Progemi token it was issued for,
+    so it is only accepted along with that same Progemi token.
+    """
+
+    def __init__(self, secret_key: Optional[str], ttl_seconds: int) -> None:
+        """Initialize the signing key, checked at startup by `check_configured`."""
+
+        self.key = (
+            jwk_from_dict({"kty": "oct", "k": b64encode(secret_key.encode())})
+            if secret_key and secret_key != "None"
+            else None
+        )
+
+        self.ttl_seconds: int = ttl_seconds
+
+        self.jwt = JWT()
+
+    def check_configured(self) -> None:
+        """Raise if no secret is configured.
+
+        The key must be shared by all the uvicorn workers and kept across restarts,
+        otherwise the session tokens issued by another process are rejected.
+        """
+
+        if self.key is None:
+            logger.error("SESSION TOKEN => No SESSION_SECRET_KEY set")
+
+            raise RuntimeError("SESSION_SECRET_KEY must be set in config/.env")
+
+    @staticmethod
+    def hash_token(progemi_token: str) -> str:
+        """Hash a Progemi token, so it is not stored in the session token."""
+
+        return hashlib.sha256(progemi_token.encode()).hexdigest()
+
+    def issue(self, user_id: str, progemi_token: str) -> str:
+        """Issue a session token for a user authenticated with a Progemi token."""
+
+        self.check_configured()
+
+        now = get_int_from_datetime(datetime.now(timezone.utc))
+
+        return self.jwt.encode(
+            {
+                "sub": user_id,
+                "tkh": self.hash_token(progemi_token),
+                "iat": now,
+                "exp": now + self.ttl_seconds,
+            },
+            self.key,
+            alg=ALGORITHM,
+        )
+
+    def verify(self, session_token: str, progemi_token: str) -> Optional[str]:
+        """Return the user ID of a valid session token, None if invalid or expired."""
+
+        self.check_configured()
+
+        try:
+            claims = self.jwt.decode(
+                session_token, self.key, algorithms={ALGORITHM}, do_time_check=True
+            )
+
+        except (JWTDecodeError, ValueError) as e:
+            logger.debug("SESSION TOKEN => Invalid session token: %s", str(e))
+
+            return None
+
+        if not hmac.compare_digest(
+            str(claims.get("tkh", "")), self.hash_token(progemi_token)
+        ):
+            logger.debug("SESSION TOKEN => Session token issued for another token")
+
+            return None
+
+        return claims.get("sub")
+
+
+session_token_handler = SessionTokenHandler(
+    secret_key=env_param.SESSION_SECRET_KEY,
+    ttl_seconds=env_param.SESSION_TTL_SECONDS,
+)
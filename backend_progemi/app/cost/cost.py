@@ -7,13 +7,13 @@ from decimal import ROUND_HALF_UP, Decimal
 from app.cost.schemas import Cost, Query
 
 
-_MODEL_PRICES: List[Tuple[str, tuple[float, float]]] = [
-    ("gpt-4o-mini", (0.150, 0.60)),
-    ("gpt-4o-", (2.50, 10.00)),
-    ("gpt-4.1-mini", (0.40, 1.60)),
-    ("gpt-4.1", (2.00, 8.00)),
-    ("o3", (2.00, 8.00)),
-    ("o4-mini", (1.10, 4.40)),
+_MODEL_PRICES: List[Tuple[str, tuple[float, float, float]]] = [
+    ("gpt-4o-mini", (0.150, 0.075, 0.60)),
+    ("gpt-4o-", (2.50, 1.25, 10.00)),
+    ("gpt-4.1-mini", (0.40, 0.10, 1.60)),
+    ("gpt-4.1", (2.00, 0.50, 8.00)),
+    ("o3", (2.00, 0.50, 8.00)),
+    ("o4-mini", (1.10, 0.275, 4.40)),
 ]
 
 
@@ -28,8 +28,8 @@ def _round(value: float | Decimal) -> float:
     return float(Decimal(value).quantize(Decimal("0.000001"), ROUND_HALF_UP))
 
 
-def _find_prices(model: str) -> Tuple[float, float]:
-    """Return (input_price, output_price) for **model**.
+def _find_prices(model: str) -> Tuple[float, float, float]:
+    """Return (input_price, cached_input_price, output_price) for **model**.
 
     Raises:
         ValueError: if the model is unknown.
@@ -55,26 +55,40 @@ class CostTracker:
         nb_output_token: int | None,
         model: str,
         function_name: str | None = None,
+        nb_cached_input_token: int | None = None,
     ) -> None:
         """Record a chat/completion API call.
 
         Args:
-            nb_input_token: Prompt tokens.
+            nb_input_token: Prompt tokens, including the cached ones.
             nb_output_token: Completion tokens.
             model: Model name (e.g. "gpt-4o-mini-2025-05-13").
             function_name: Optional label (makes dashboards nicer).
+            nb_cached_input_token: Prompt tokens read from the provider prompt cache.
         """
 
-        input_price, output_price = _find_prices(model)
+        input_price, cached_input_price, output_price = _find_prices(model)
 
-        cost_input = (input_price * (nb_input_token or 0)) / 1_000_000
+        nb_cached = min(nb_cached_input_token or 0, nb_input_token or 0)
+
+        cost_input = (input_price * ((nb_input_token or 0) - nb_cached)) / 1_000_000
+
+        cost_cached_input = (cached_input_price * nb_cached) / 1_000_000
 
         cost_output = (output_price * (nb_output_token or 0)) / 1_000_000
 
-        total_cost = cost_input + cost_output
+        total_cost = cost_input + cost_cached_input + cost_output
+
+        saving = ((input_price - cached_input_price) * nb_cached) / 1_000_000
 
         self.cost.cost_openai.cost_openai_input += _round(cost_input)
 
+        self.cost.cost_openai.cost_openai_cached_input += _round(cost_cached_input)
+
+        self.cost.cost_openai.cost_openai_cache_saving += _round(saving)
+
+        self.cost.cost_openai.nb_cached_input_token += nb_cached
+
         self.cost.cost_openai.cost_openai_output += _round(cost_output)
 
         self.cost.cost_openai.cost_openai_total += _round(total_cost)
@@ -84,9 +98,28 @@ class CostTracker:
         self.cost.cost_openai.nb_query += 1
 
         self.cost.cost_openai.queries.append(
-            Query(model=model, cost=_round(total_cost), function_name=function_name)
+            Query(
+                model=model,
+                cost=_round(total_cost),
+                function_name=function_name,
+                nb_cached_input_token=nb_cached,
+            )
         )
 
+    def add_cache_hit(self, *, model: str, function_name: str | None = None) -> None:
+        """Record a chat/completion call answered by the LLM response cache."""
+
+        self.cost.cost_openai.nb_cache_hit += 1
+
+        self.cost.cost_openai.queries.append(
+            Query(model=model, cost=0.0, function_name=function_name, from_cache=True)
+        )
+
+    def add_cache_miss(self) -> None:
+        """Record a chat/completion call not found in the LLM response cache."""
+
+        self.cost.cost_openai.nb_cache_miss += 1
+
     def add_embeddings_query(
         self,
         *,
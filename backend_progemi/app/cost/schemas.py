@@ -14,12 +14,22 @@ class Query(BaseModel):
 
     function_name: Optional[str] = None
 
+    from_cache: bool = False
+
+    nb_cached_input_token: int = 0
+
 
 class CostOpenAI(BaseModel):
     """Cost openai."""
 
     cost_openai_input: float = 0
 
+    cost_openai_cached_input: float = 0
+
+    cost_openai_cache_saving: float = 0
+
+    nb_cached_input_token: int = 0
+
     cost_openai_output: float = 0
 
     cost_embeddings: float = 0
@@ -28,6 +38,10 @@ class CostOpenAI(BaseModel):
 
     nb_query: int = 0
 
+    nb_cache_hit: int = 0
+
+    nb_cache_miss: int = 0
+
     queries: List[Query] = []
 
 
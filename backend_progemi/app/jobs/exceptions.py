@@ -0,0 +1,28 @@
+"""Proposal jobs exceptions."""
+
+from fastapi import HTTPException, status
+
+
+class JobNotFound(HTTPException):
+    """Exception raised when a job is not found."""
+
+    status_code = status.HTTP_404_NOT_FOUND
+
+    detail = "Job {job_id} does not exist"
+
+    def __init__(self, job_id: str) -> None:
+        super().__init__(
+            status_code=self.status_code,
+            detail=self.detail.format(job_id=job_id),
+        )
+
+
+class JobQueueFull(HTTPException):
+    """Exception raised when the job queue is full."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    detail = "Too many proposals are being processed, please retry later"
+
+    def __init__(self) -> None:
+        super().__init__(status_code=self.status_code, detail=self.detail)
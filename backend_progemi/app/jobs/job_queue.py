@@ -0,0 +1,379 @@
+"""Queue and workers running the proposal processing pipeline in background.
+
+Jobs run in the process that accepted them. Their status is saved in Mongo, and
+the process saves a heartbeat on the jobs it holds, queued or running, every
+`JOBS_HEARTBEAT_SECONDS`. A job lost with its process, on a restart or a crash, is
+failed once it has not been saved for `JOBS_STALE_AFTER_SECONDS`.
+"""
+
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from beanie.odm.fields import PydanticObjectId
+
+from beanie.operators import In, LT, Set
+
+from app.auth.schemas import ConnectedUser
+
+from app.jobs.exceptions import JobNotFound, JobQueueFull
+
+from app.jobs.schemas import JobStatus, ProposalJob, ProposalJobOutput
+
+from app.llm.openai_gateway import openai_gateway
+
+from app.proposal_object.stages import StageInfo, StageTracker
+
+from app.user.schemas import CreateProposalObjectInput, GetProposalExtractedObjectInput
+
+from app.user.user_handler import UserHandler
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+QueuedJob = Tuple[PydanticObjectId, CreateProposalObjectInput, ConnectedUser]
+
+PENDING_STATUSES = [JobStatus.QUEUED, JobStatus.RUNNING]
+
+STALE_JOB_ERROR = "The job was interrupted, please submit the proposal again"
+
+
+class ProposalJobQueue:
+    """Bounded queue of proposal jobs consumed by a pool of asyncio workers."""
+
+    def __init__(
+        self, nb_workers: int, max_queue_size: int, heartbeat_seconds: int
+    ) -> None:
+        """Initialize the queue, workers are started with `start`."""
+
+        self.nb_workers: int = nb_workers
+
+        self.heartbeat_seconds: int = heartbeat_seconds
+
+        self.queue: asyncio.Queue[QueuedJob] = asyncio.Queue(maxsize=max_queue_size)
+
+        self.workers: List[asyncio.Task] = []
+
+        self.heartbeat_task: Optional[asyncio.Task] = None
+
+        self.held_job_ids: set[PydanticObjectId] = set()
+
+    def start(self) -> None:
+        """Start the workers and the heartbeat of the held jobs."""
+
+        self.workers = [
+            asyncio.create_task(self._worker(worker_index=i), name=f"proposal_job_{i}")
+            for i in range(self.nb_workers)
+        ]
+
+        self.heartbeat_task = asyncio.create_task(
+            self._heartbeat(), name="proposal_job_heartbeat"
+        )
+
+        logger.debug("JOB QUEUE => ✅ %d workers started", self.nb_workers)
+
+    async def stop(self) -> None:
+        """Cancel the workers and the heartbeat and wait for them to stop."""
+
+        tasks = self.workers + ([self.heartbeat_task] if self.heartbeat_task else [])
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.workers = []
+
+        self.heartbeat_task = None
+
+        logger.debug("JOB QUEUE => Workers stopped")
+
+    async def submit(
+        self,
+        create_proposal_object_input: CreateProposalObjectInput,
+        connected_user: ConnectedUser,
+    ) -> ProposalJob:
+        """Register a new job and put it in the queue.
+
+        Args:
+            create_proposal_object_input (CreateProposalObjectInput): Input containing project_name and proposal_title.
+            connected_user (ConnectedUser): The connected user object.
+
+        Returns:
+            ProposalJob: The queued job.
+
+        Raises:
+            JobQueueFull: If the queue is full.
+        """
+
+        if self.queue.full():
+            logger.error("JOB QUEUE => Queue is full (%d jobs)", self.queue.qsize())
+
+            raise JobQueueFull()
+
+        job = ProposalJob(
+            user_id=connected_user.user_id,
+            project_name=create_proposal_object_input.project_name,
+            proposal_title=create_proposal_object_input.proposal_title,
+        )
+
+        await job.insert()
+
+        try:
+            self.queue.put_nowait(
+                (job.id, create_proposal_object_input, connected_user)
+            )
+
+        except asyncio.QueueFull as e:
+            logger.error("JOB QUEUE => Queue filled up while job %s was saved", job.id)
+
+            job.status = JobStatus.FAILED
+
+            job.error = JobQueueFull.detail
+
+            await self.save_job(job=job, ended=True)
+
+            raise JobQueueFull() from e
+
+        self.held_job_ids.add(job.id)
+
+        logger.debug(
+            "JOB QUEUE => Job %s queued for proposal %s (%d in queue)",
+            job.id,
+            job.proposal_title,
+            self.queue.qsize(),
+        )
+
+        return job
+
+    async def get_job(
+        self, job_id: PydanticObjectId, connected_user: ConnectedUser
+    ) -> ProposalJob:
+        """Get a job of the connected user by its ID.
+
+        Raises:
+            JobNotFound: If the job does not exist or belongs to another user.
+        """
+
+        job: Optional[ProposalJob] = await ProposalJob.get(job_id)
+
+        if not job or job.user_id != connected_user.user_id:
+            logger.error("JOB QUEUE => Job %s not found", job_id)
+
+            raise JobNotFound(job_id=str(job_id))
+
+        return job
+
+    async def get_job_output(
+        self, job_id: PydanticObjectId, connected_user: ConnectedUser
+    ) -> ProposalJobOutput:
+        """Get the status of a job, with the extracted object once it is done."""
+
+        job: ProposalJob = await self.get_job(
+            job_id=job_id, connected_user=connected_user
+        )
+
+        if job.status in PENDING_STATUSES and self.is_stale(job=job):
+            logger.error("JOB QUEUE => Job %s was lost, marking it failed", job.id)
+
+            job.status = JobStatus.FAILED
+
+            job.error = STALE_JOB_ERROR
+
+            await self.save_job(job=job, ended=True)
+
+        job_output = ProposalJobOutput(
+            job_id=str(job.id),
+            project_name=job.project_name,
+            proposal_title=job.proposal_title,
+            status=job.status,
+            stages=job.stages,
+            error=job.error,
+            llm_queue_depth=openai_gateway.queue_depth,
+            llm_queue_depths=openai_gateway.get_queue_depths(),
+        )
+
+        if job.status == JobStatus.DONE:
+            job_output.result = await UserHandler().get_proposal_extracted_object(
+                get_proposal_extracted_object_input=GetProposalExtractedObjectInput(
+                    project_name=job.project_name,
+                    proposal_title=job.proposal_title,
+                ),
+                connected_user=connected_user,
+            )
+
+        return job_output
+
+    @staticmethod
+    def get_stale_cutoff() -> datetime:
+        """Date before which a queued or running job not saved since is lost."""
+
+        return datetime.now(timezone.utc) - timedelta(
+            seconds=env_param.JOBS_STALE_AFTER_SECONDS
+        )
+
+    def is_stale(self, job: ProposalJob) -> bool:
+        """Check whether a job has not been saved for too long.
+
+        The jobs held by this process are saved by the heartbeat, and never stale.
+        """
+
+        if job.id in self.held_job_ids:
+            return False
+
+        updated_at = job.updated_at
+
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+
+        return updated_at < self.get_stale_cutoff()
+
+    async def fail_stale_jobs(self) -> None:
+        """Fail the queued or running jobs lost by a previous process."""
+
+        now = datetime.now(timezone.utc)
+
+        result = await ProposalJob.find(
+            In(ProposalJob.status, PENDING_STATUSES),
+            LT(ProposalJob.updated_at, self.get_stale_cutoff()),
+        ).update(
+            Set(
+                {
+                    ProposalJob.status: JobStatus.FAILED,
+                    ProposalJob.error: STALE_JOB_ERROR,
+                    ProposalJob.ended_at: now,
+                    ProposalJob.updated_at: now,
+                }
+            )
+        )
+
+        nb_failed: int = getattr(result, "modified_count", 0)
+
+        if nb_failed:
+            logger.warning("JOB QUEUE => %d lost jobs marked failed", nb_failed)
+
+    async def touch_held_jobs(self) -> None:
+        """Save the date of the queued or running jobs held by this process, so they
+        are not taken for lost while they wait for a worker."""
+
+        if not self.held_job_ids:
+            return
+
+        await ProposalJob.find(
+            In(ProposalJob.id, list(self.held_job_ids)),
+            In(ProposalJob.status, PENDING_STATUSES),
+        ).update(Set({ProposalJob.updated_at: datetime.now(timezone.utc)}))
+
+    async def _heartbeat(self) -> None:
+        """Save the held jobs heartbeat forever."""
+
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+
+            try:
+                await self.touch_held_jobs()
+
+            except Exception as e:
+                logger.error("JOB QUEUE => Error saving the jobs heartbeat: %s", str(e))
+
+    @staticmethod
+    async def save_job(job: ProposalJob, ended: bool = False) -> None:
+        """Save a job, with the date it ended when `ended` is True."""
+
+        job.updated_at = datetime.now(timezone.utc)
+
+        if ended:
+            job.ended_at = job.updated_at
+
+        await job.save()
+
+    async def _worker(self, worker_index: int) -> None:
+        """Consume jobs from the queue forever."""
+
+        while True:
+            job_id, create_proposal_object_input, connected_user = (
+                await self.queue.get()
+            )
+
+            logger.debug("JOB QUEUE => Worker %d runs job %s", worker_index, job_id)
+
+            try:
+                await self._run_job(
+                    job_id=job_id,
+                    create_proposal_object_input=create_proposal_object_input,
+                    connected_user=connected_user,
+                )
+
+            except Exception as e:
+                logger.error("JOB QUEUE => Error running job %s: %s", job_id, str(e))
+
+            finally:
+                self.held_job_ids.discard(job_id)
+
+                self.queue.task_done()
+
+    async def _run_job(
+        self,
+        job_id: PydanticObjectId,
+        create_proposal_object_input: CreateProposalObjectInput,
+        connected_user: ConnectedUser,
+    ) -> None:
+        """Run the proposal pipeline for a job and save its status at each stage."""
+
+        job: Optional[ProposalJob] = await ProposalJob.get(job_id)
+
+        if not job:
+            logger.error("JOB QUEUE => Job %s not found, skipping", job_id)
+
+            return
+
+        if job.status != JobStatus.QUEUED:
+            logger.error(
+                "JOB QUEUE => Job %s is %s, skipping", job_id, job.status.value
+            )
+
+            return
+
+        job.status = JobStatus.RUNNING
+
+        await self.save_job(job=job)
+
+        async def on_stage_change(stage_info: StageInfo) -> None:
+            """Save the new stage status on the job."""
+
+            job.stages = [
+                stage_info if stage.stage == stage_info.stage else stage
+                for stage in job.stages
+            ]
+
+            await self.save_job(job=job)
+
+        try:
+            await UserHandler().create_proposal_object(
+                create_proposal_object_input=create_proposal_object_input,
+                connected_user=connected_user,
+                stage_tracker=StageTracker(on_change=on_stage_change),
+            )
+
+            job.status = JobStatus.DONE
+
+        except Exception as e:
+            logger.exception("JOB QUEUE => Job %s failed: %s", job_id, str(e))
+
+            job.status = JobStatus.FAILED
+
+            job.error = str(e.detail) if isinstance(e, HTTPException) else str(e)
+
+        await self.save_job(job=job, ended=True)
+
+
+proposal_job_queue = ProposalJobQueue(
+    nb_workers=env_param.JOBS_NB_WORKERS,
+    max_queue_size=env_param.JOBS_MAX_QUEUE_SIZE,
+    heartbeat_seconds=env_param.JOBS_HEARTBEAT_SECONDS,
+)
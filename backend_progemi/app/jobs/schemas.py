@@ -0,0 +1,132 @@
+"""Proposal jobs schemas"""
+
+from enum import Enum
+
+from datetime import datetime, timezone
+
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from beanie import Document
+
+from beanie.odm.fields import PydanticObjectId
+
+from app.proposal_object.schemas import ProposalWithPolygonAndValidation
+
+from app.proposal_object.stages import ProposalStage, StageInfo
+
+
+class JobStatus(str, Enum):
+    """Enumeration for job status."""
+
+    QUEUED = "queued"
+
+    RUNNING = "running"
+
+    DONE = "done"
+
+    FAILED = "failed"
+
+
+class ProposalJob(Document):
+    """Proposal processing job schema."""
+
+    id: Optional[PydanticObjectId] = Field(
+        default_factory=PydanticObjectId, alias="_id"
+    )
+
+    user_id: str = Field(..., description="ID of the user who submitted the job")
+
+    project_name: str = Field(..., description="Name of the project")
+
+    proposal_title: str = Field(..., description="Title of the proposal to process")
+
+    status: JobStatus = Field(
+        default=JobStatus.QUEUED,
+        description="Status of the job",
+    )
+
+    stages: List[StageInfo] = Field(
+        default_factory=lambda: [StageInfo(stage=stage) for stage in ProposalStage],
+        description="Status of each stage of the pipeline",
+    )
+
+    error: Optional[str] = Field(
+        default=None,
+        description="Error message if the job failed",
+    )
+
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Date when the job was submitted",
+    )
+
+    ended_at: Optional[datetime] = Field(
+        default=None,
+        description="Date when the job ended",
+    )
+
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Date when the job was last saved or its heartbeat, a queued or "
+        "running job not saved for too long is considered lost",
+    )
+
+    class Settings:
+        """Settings for the ProposalJob collection."""
+
+        name = "proposal_jobs"
+
+
+class SubmitProposalJobOutput(BaseModel):
+    """Output schema for a submitted proposal job."""
+
+    job_id: str = Field(..., description="ID of the submitted job")
+
+    status: JobStatus = Field(..., description="Status of the job")
+
+
+class GetProposalJobInput(BaseModel):
+    """Parameters for getting a proposal job."""
+
+    job_id: PydanticObjectId = Field(..., description="ID of the job to retrieve")
+
+
+class ProposalJobOutput(BaseModel):
+    """Output schema for a proposal job status and result."""
+
+    job_id: str = Field(..., description="ID of the job")
+
+    project_name: str = Field(..., description="Name of the project")
+
+    proposal_title: str = Field(..., description="Title of the proposal")
+
+    status: JobStatus = Field(..., description="Status of the job")
+
+    stages: List[StageInfo] = Field(
+        ...,
+        description="Status of each stage of the pipeline",
+    )
+
+    error: Optional[str] = Field(
+        default=None,
+        description="Error message if the job failed",
+    )
+
+    llm_queue_depth: int = Field(
+        default=0,
+        description="Number of OpenAI calls waiting in the gateway, for a rate "
+        "limit budget or for a concurrency slot",
+    )
+
+    llm_queue_depths: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Number of OpenAI calls waiting for the rate limit budget of "
+        "each model",
+    )
+
+    result: Optional[ProposalWithPolygonAndValidation] = Field(
+        default=None,
+        description="Extracted object, available once the job is done",
+    )
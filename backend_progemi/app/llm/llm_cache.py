@@ -0,0 +1,204 @@
+"""In-memory cache of structured LLM responses."""
+
+import json
+
+import time
+
+import hashlib
+
+from collections import OrderedDict
+
+from functools import lru_cache
+
+from typing import Any, Dict, Iterable, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from app.cost.cost import CostTracker
+
+from app.llm.openai_gateway import (
+    PartialCallback,
+    get_cached_tokens,
+    openai_gateway,
+)
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def _sha256(value: Any) -> str:
+    """Hash a JSON serializable value."""
+
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode(
+            "utf-8"
+        )
+    ).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _schema_sha256(response_format: Type[BaseModel]) -> str:
+    """Hash the JSON schema of a response model, generated once per model."""
+
+    return _sha256(response_format.model_json_schema())
+
+
+class LLMResponseCache:
+    """LRU cache with TTL of the raw JSON answers of `chat.completions.parse`."""
+
+    def __init__(self, enabled: bool, ttl_seconds: int, max_entries: int) -> None:
+        """Initialize an empty cache."""
+
+        self.enabled: bool = enabled
+
+        self.ttl_seconds: int = ttl_seconds
+
+        self.max_entries: int = max_entries
+
+        self.entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        model: str, messages: Iterable[Dict[str, Any]], response_format: Type[BaseModel]
+    ) -> str:
+        """Build the cache key from the model, the messages and the response schema."""
+
+        messages_hash = _sha256(list(messages))
+
+        schema_hash = _schema_sha256(response_format)
+
+        return f"{model}:{messages_hash}:{schema_hash}"
+
+    def get(self, key: str, response_format: Type[T]) -> Optional[T]:
+        """Return the cached response for a key, None if missing or expired."""
+
+        entry = self.entries.get(key)
+
+        if not entry:
+            return None
+
+        stored_at, content = entry
+
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self.entries[key]
+
+            return None
+
+        self.entries.move_to_end(key)
+
+        return response_format.model_validate_json(content)
+
+    def set(self, key: str, content: str) -> None:
+        """Store a response and evict the least recently used entries."""
+
+        self.entries[key] = (time.monotonic(), content)
+
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+llm_response_cache = LLMResponseCache(
+    enabled=env_param.LLM_CACHE_ENABLED,
+    ttl_seconds=env_param.LLM_CACHE_TTL_SECONDS,
+    max_entries=env_param.LLM_CACHE_MAX_ENTRIES,
+)
+
+
+async def cached_parse(
+    *,
+    model: str,
+    messages: list,
+    response_format: Type[T],
+    cost_tracker: CostTracker,
+    function_name: str,
+    use_cache: bool = True,
+    hedge: bool = False,
+    on_partial: Optional[PartialCallback] = None,
+    **kwargs: Any,
+) -> Optional[T]:
+    """Call `chat.completions.parse` through the LLM response cache and the OpenAI
+    gateway.
+
+    Args:
+        model (str): The model name.
+        messages (list): The messages of the conversation.
+        response_format (Type[T]): The pydantic model of the structured output.
+        cost_tracker (CostTracker): Tracker recording cost, cache hits and misses.
+        function_name (str): Label of the call in the cost report.
+        use_cache (bool): Set to False to bypass the cache and force a new call.
+        hedge (bool): Duplicate the call if it is slower than usual, when hedging
+            is enabled.
+        on_partial (Optional[PartialCallback]): Stream the answer and call this with
+            the partially parsed JSON, with the whole answer on a cache hit. Hedging
+            is not used when streaming.
+        **kwargs: Other parameters of `chat.completions.parse`.
+
+    Returns:
+        Optional[T]: The parsed response, None if the model did not answer.
+    """
+
+    use_cache = use_cache and llm_response_cache.enabled
+
+    cache_key: Optional[str] = None
+
+    if use_cache:
+        cache_key = llm_response_cache.make_key(
+            model=model, messages=messages, response_format=response_format
+        )
+
+        cached: Optional[T] = llm_response_cache.get(
+            key=cache_key, response_format=response_format
+        )
+
+        if cached is not None:
+            logger.info("LLM CACHE => Hit for %s", function_name)
+
+            cost_tracker.add_cache_hit(model=model, function_name=function_name)
+
+            if on_partial:
+                await on_partial(cached.model_dump(mode="json"))
+
+            return cached
+
+        cost_tracker.add_cache_miss()
+
+    if hedge and not on_partial:
+        completion = await openai_gateway.parse_hedged(
+            cost_tracker=cost_tracker,
+            name=function_name,
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            **kwargs,
+        )
+
+    else:
+        completion = await openai_gateway.parse(
+            name=function_name,
+            on_partial=on_partial,
+            model=model,
+            messages=messages,
+            response_format=response_format,
+            **kwargs,
+        )
+
+    if completion.usage:
+        cost_tracker.add_openai_query(
+            model=model,
+            nb_input_token=completion.usage.prompt_tokens,
+            nb_output_token=completion.usage.completion_tokens,
+            function_name=function_name,
+            nb_cached_input_token=get_cached_tokens(usage=completion.usage),
+        )
+
+    message = completion.choices[0].message
+
+    if cache_key and message.parsed is not None and message.content:
+        llm_response_cache.set(key=cache_key, content=message.content)
+
+    return message.parsed
@@ -0,0 +1,566 @@
+"""Process-wide gateway to the OpenAI API, with one pooled client and rate limits."""
+
+import time
+
+import asyncio
+
+from collections import deque
+
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+import httpx
+
+from openai import AsyncOpenAI
+
+from openai.types.chat.parsed_chat_completion import ParsedChatCompletion
+
+from openai.types.completion_usage import CompletionUsage
+
+from app.cost.cost import CostTracker
+
+from app.llm.retry_policy import RetryPolicy
+
+from app.utils.utils import token_counter
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+PartialCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def get_cached_tokens(usage: Optional[CompletionUsage]) -> int:
+    """Return the prompt tokens of a call read from the provider prompt cache."""
+
+    if usage is None or usage.prompt_tokens_details is None:
+        return 0
+
+    return usage.prompt_tokens_details.cached_tokens or 0
+
+
+class TokenBucket:
+    """Bucket refilled continuously up to its capacity over one minute."""
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize a full bucket."""
+
+        self.capacity: float = float(capacity)
+
+        self.refill_per_second: float = capacity / 60.0
+
+        self.tokens: float = float(capacity)
+
+        self.updated_at: float = time.monotonic()
+
+    def refill(self) -> None:
+        """Add the tokens refilled since the last update."""
+
+        now = time.monotonic()
+
+        refilled = (now - self.updated_at) * self.refill_per_second
+
+        self.tokens = min(self.capacity, self.tokens + refilled)
+
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds to wait before `amount` tokens are available, 0 if they are."""
+
+        self.refill()
+
+        if self.tokens >= amount:
+            return 0.0
+
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float) -> None:
+        """Remove tokens, or give them back when negative.
+
+        The bucket goes negative when more tokens were used than it held.
+        """
+
+        self.refill()
+
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ModelBudget:
+    """Requests and tokens per minute budgets of a model.
+
+    Requests wait for the budget one at a time, in their arrival order, so a large
+    request is not starved by smaller ones.
+    """
+
+    def __init__(self, model: str, rpm: int, tpm: int) -> None:
+        """Initialize the full budgets of a model."""
+
+        self.model: str = model
+
+        self.requests: TokenBucket = TokenBucket(capacity=rpm)
+
+        self.tokens: TokenBucket = TokenBucket(capacity=tpm)
+
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+        self.waiting: int = 0
+
+    async def acquire(self, nb_tokens: int) -> None:
+        """Wait for one request and `nb_tokens` tokens of the budget, and take them."""
+
+        nb_tokens = min(nb_tokens, int(self.tokens.capacity))
+
+        self.waiting += 1
+
+        try:
+            async with self.lock:
+                while True:
+                    wait = max(
+                        self.requests.wait_time(1), self.tokens.wait_time(nb_tokens)
+                    )
+
+                    if wait <= 0:
+                        break
+
+                    logger.debug(
+                        "OPENAI GATEWAY => Waiting %.2fs for %s budget, %d queued",
+                        wait,
+                        self.model,
+                        self.waiting,
+                    )
+
+                    await asyncio.sleep(wait)
+
+                self.requests.take(1)
+
+                self.tokens.take(nb_tokens)
+
+        finally:
+            self.waiting -= 1
+
+    def settle(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Correct the tokens budget with the usage reported by the API."""
+
+        self.tokens.take(used_tokens - estimated_tokens)
+
+
+class OpenAIGateway:
+    """Send every OpenAI call of the process through one pooled client.
+
+    Each model has its own RPM/TPM budgets, taken before dispatch with a token
+    estimate of the request and corrected with the reported usage. The calls in
+    flight are capped, the others are queued. Failed calls are retried by the
+    gateway retry policy only, the client does not retry.
+    """
+
+    def __init__(self) -> None:
+        """Initialize without client, it is created by `start` or on first use."""
+
+        self._client: Optional[AsyncOpenAI] = None
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.budgets: Dict[str, ModelBudget] = {}
+
+        self.waiting_slots: int = 0
+
+        self.latencies: Dict[Tuple[str, str], Deque[float]] = {}
+
+    @staticmethod
+    def build_client() -> AsyncOpenAI:
+        """Build a client with the timeout and connection limits of the config."""
+
+        return AsyncOpenAI(
+            api_key=env_param.OPENAI_API_KEY,
+            timeout=env_param.OPENAI_GATEWAY_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=env_param.OPENAI_GATEWAY_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=env_param.OPENAI_GATEWAY_MAX_CONNECTIONS,
+                    max_keepalive_connections=env_param.OPENAI_GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+        )
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Return the shared client, created on first use outside of the lifespan."""
+
+        if self._client is None or self._client.is_closed():
+            self._client = self.build_client()
+
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore capping the calls in flight."""
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(
+                env_param.OPENAI_GATEWAY_MAX_CONCURRENT_REQUESTS
+            )
+
+        return self._semaphore
+
+    def start(self) -> None:
+        """Create the shared client and reset the budgets."""
+
+        self._client = self.build_client()
+
+        self._semaphore = None
+
+        self.budgets = {}
+
+        logger.debug("OPENAI GATEWAY => ✅ OpenAI client started")
+
+    async def stop(self) -> None:
+        """Close the shared client and its connections."""
+
+        if self._client is not None:
+            await self._client.close()
+
+            self._client = None
+
+        logger.debug("OPENAI GATEWAY => OpenAI client closed")
+
+    def get_budget(self, model: str) -> ModelBudget:
+        """Return the budget of a model, created with its configured limits."""
+
+        if model not in self.budgets:
+            rpm, tpm = env_param.OPENAI_GATEWAY_MODEL_LIMITS.get(
+                model,
+                (
+                    env_param.OPENAI_GATEWAY_DEFAULT_RPM,
+                    env_param.OPENAI_GATEWAY_DEFAULT_TPM,
+                ),
+            )
+
+            self.budgets[model] = ModelBudget(model=model, rpm=rpm, tpm=tpm)
+
+        return self.budgets[model]
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a budget or for a slot."""
+
+        return self.waiting_slots + sum(
+            budget.waiting for budget in self.budgets.values()
+        )
+
+    def get_queue_depths(self) -> Dict[str, int]:
+        """Number of calls waiting for the budget of each model."""
+
+        return {model: budget.waiting for model, budget in self.budgets.items()}
+
+    @staticmethod
+    def estimate_file_tokens(file_data: str) -> int:
+        """Estimate the input tokens of a file from the size of its base64 data URL."""
+
+        base64_data = file_data.split(",", 1)[-1]
+
+        nb_bytes = len(base64_data) * 3 // 4
+
+        return nb_bytes // env_param.OPENAI_GATEWAY_FILE_BYTES_PER_TOKEN
+
+    @staticmethod
+    def estimate_input_tokens(messages: Iterable[Dict[str, Any]]) -> int:
+        """Estimate the input tokens of a request from the text and the files of its
+        messages."""
+
+        nb_tokens = 0
+
+        for message in messages:
+            content = message.get("content")
+
+            if isinstance(content, str):
+                nb_tokens += token_counter(text=content)
+
+                continue
+
+            for part in content or []:
+                if part.get("type") == "text":
+                    nb_tokens += token_counter(text=part["text"])
+
+                elif part.get("type") == "file":
+                    nb_tokens += OpenAIGateway.estimate_file_tokens(
+                        file_data=part["file"].get("file_data") or ""
+                    )
+
+        return nb_tokens
+
+    @staticmethod
+    def estimate_tokens(
+        messages: Iterable[Dict[str, Any]], max_output_tokens: Optional[int]
+    ) -> int:
+        """Estimate the input and output tokens of a request."""
+
+        return OpenAIGateway.estimate_input_tokens(messages=messages) + (
+            max_output_tokens or env_param.OPENAI_GATEWAY_ESTIMATED_OUTPUT_TOKENS
+        )
+
+    async def parse(
+        self,
+        name: str = "openai",
+        retry_policy: Optional[RetryPolicy] = None,
+        on_partial: Optional[PartialCallback] = None,
+        **kwargs: Any,
+    ) -> ParsedChatCompletion:
+        """Call `chat.completions.parse`, retrying the transient errors.
+
+        Args:
+            name (str): Name of the call in the logs.
+            retry_policy (Optional[RetryPolicy]): The policy, the default one if None.
+            on_partial (Optional[PartialCallback]): Stream the answer and call this
+                with the partially parsed JSON at each chunk. A call is not retried
+                once a chunk was delivered.
+            **kwargs: The parameters of `chat.completions.parse`.
+
+        Returns:
+            ParsedChatCompletion: The completion returned by the API.
+        """
+
+        retry_policy = retry_policy or RetryPolicy()
+
+        delivered = False
+
+        async def deliver(partial: Dict[str, Any]) -> None:
+            nonlocal delivered
+
+            delivered = True
+
+            await on_partial(partial)
+
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            try:
+                return await self.dispatch(
+                    name=name, on_partial=deliver if on_partial else None, **kwargs
+                )
+
+            except Exception as e:
+                if delivered:
+                    raise
+
+                delay = retry_policy.get_retry_delay(
+                    error=e, attempt=attempt, name=name
+                )
+
+                if delay is None:
+                    raise
+
+                await asyncio.sleep(delay)
+
+    async def dispatch(
+        self,
+        name: str = "openai",
+        on_partial: Optional[PartialCallback] = None,
+        **kwargs: Any,
+    ) -> ParsedChatCompletion:
+        """Call `chat.completions.parse` once the model budgets and a slot are free."""
+
+        model: str = kwargs["model"]
+
+        budget = self.get_budget(model=model)
+
+        estimated_tokens = self.estimate_tokens(
+            messages=kwargs["messages"],
+            max_output_tokens=kwargs.get("max_completion_tokens"),
+        )
+
+        await budget.acquire(nb_tokens=estimated_tokens)
+
+        self.waiting_slots += 1
+
+        try:
+            await self.semaphore.acquire()
+
+        finally:
+            self.waiting_slots -= 1
+
+        started_at = time.monotonic()
+
+        try:
+            completion: ParsedChatCompletion = (
+                await self.client.chat.completions.parse(**kwargs)
+                if on_partial is None
+                else await self.stream(on_partial=on_partial, **kwargs)
+            )
+
+        except asyncio.CancelledError:
+            self.record_latency(
+                model=model, name=name, latency=time.monotonic() - started_at
+            )
+
+            raise
+
+        finally:
+            self.semaphore.release()
+
+        self.record_latency(
+            model=model, name=name, latency=time.monotonic() - started_at
+        )
+
+        if completion.usage:
+            budget.settle(
+                estimated_tokens=estimated_tokens,
+                used_tokens=completion.usage.total_tokens,
+            )
+
+        return completion
+
+    async def stream(
+        self, on_partial: PartialCallback, **kwargs: Any
+    ) -> ParsedChatCompletion:
+        """Stream a structured answer, calling `on_partial` with the JSON parsed so far
+        at each chunk, and return the completion once the answer is complete."""
+
+        async with self.client.chat.completions.stream(
+            stream_options={"include_usage": True}, **kwargs
+        ) as completion_stream:
+            async for event in completion_stream:
+                if event.type == "content.delta" and isinstance(event.parsed, dict):
+                    await on_partial(event.parsed)
+
+            return await completion_stream.get_final_completion()
+
+    def record_latency(self, model: str, name: str, latency: float) -> None:
+        """Add the latency of a call to the window of its model and call name.
+
+        A cancelled call records its elapsed time, a lower bound of its latency, so
+        the hedged calls losing to their duplicate still weigh in the percentile.
+        """
+
+        self.latencies.setdefault(
+            (model, name), deque(maxlen=env_param.LLM_HEDGING_WINDOW)
+        ).append(latency)
+
+    def get_hedge_delay(self, model: str, name: str) -> Optional[float]:
+        """Latency percentile of the recent calls of a model with the same name, after
+        which a call is hedged, None while too few calls were observed."""
+
+        latencies = sorted(self.latencies.get((model, name), []))
+
+        if len(latencies) < env_param.LLM_HEDGING_MIN_SAMPLES:
+            return None
+
+        index = round(env_param.LLM_HEDGING_PERCENTILE / 100 * (len(latencies) - 1))
+
+        return latencies[index]
+
+    @staticmethod
+    def is_valid(task: "asyncio.Task[ParsedChatCompletion]") -> bool:
+        """Check whether a finished call returned a parsed answer."""
+
+        return (
+            not task.cancelled()
+            and task.exception() is None
+            and task.result().choices[0].message.parsed is not None
+        )
+
+    async def parse_hedged(
+        self,
+        cost_tracker: CostTracker,
+        name: str = "openai",
+        **kwargs: Any,
+    ) -> ParsedChatCompletion:
+        """Call `chat.completions.parse`, starting a duplicate call if the first one
+        is slower than the usual latency of the calls with this model and name.
+
+        The first valid answer wins and the other call is cancelled. The tokens of
+        the losing call are charged to the cost tracker, its input tokens, files
+        included, are estimated when it was cancelled. Requests with more input tokens than the
+        hedging budget are never duplicated.
+
+        Args:
+            cost_tracker (CostTracker): Tracker charged with the losing call.
+            name (str): Name of the call in the logs and in the cost report.
+            **kwargs: The parameters of `chat.completions.parse`.
+
+        Returns:
+            ParsedChatCompletion: The completion of the winning call.
+        """
+
+        model: str = kwargs["model"]
+
+        hedge_delay = self.get_hedge_delay(model=model, name=name)
+
+        input_tokens = self.estimate_input_tokens(messages=kwargs["messages"])
+
+        if (
+            not env_param.LLM_HEDGING_ENABLED
+            or hedge_delay is None
+            or input_tokens > env_param.LLM_HEDGING_MAX_INPUT_TOKENS
+        ):
+            return await self.parse(name=name, **kwargs)
+
+        primary = asyncio.create_task(self.parse(name=name, **kwargs))
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+
+        if done:
+            return primary.result()
+
+        logger.info(
+            "OPENAI GATEWAY => %s slower than %.1fs on %s, hedging",
+            name,
+            hedge_delay,
+            model,
+        )
+
+        hedge = asyncio.create_task(self.parse(name=name, **kwargs))
+
+        pending = {primary, hedge}
+
+        winner: Optional["asyncio.Task[ParsedChatCompletion]"] = None
+
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                winner = next((task for task in done if self.is_valid(task)), None)
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            winner = primary
+
+        loser = hedge if winner is primary else primary
+
+        if loser.done() and not loser.cancelled() and loser.exception() is None:
+            usage = loser.result().usage
+
+            cost_tracker.add_openai_query(
+                model=model,
+                nb_input_token=usage.prompt_tokens if usage else 0,
+                nb_output_token=usage.completion_tokens if usage else 0,
+                function_name=f"{name}_hedge",
+                nb_cached_input_token=get_cached_tokens(usage=usage),
+            )
+
+        elif loser.cancelled():
+            cost_tracker.add_openai_query(
+                model=model,
+                nb_input_token=input_tokens,
+                nb_output_token=0,
+                function_name=f"{name}_hedge",
+            )
+
+        logger.info(
+            "OPENAI GATEWAY => %s answered by the %s call",
+            name,
+            "hedged" if winner is hedge else "first",
+        )
+
+        return winner.result()
+
+
+openai_gateway = OpenAIGateway()
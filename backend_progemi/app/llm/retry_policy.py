@@ -0,0 +1,185 @@
+"""Retry policy of the LLM calls, with backoff, jitter and `Retry-After` support."""
+
+import time
+
+import random
+
+from contextlib import contextmanager
+
+from contextvars import ContextVar
+
+from datetime import datetime, timezone
+
+from email.utils import parsedate_to_datetime
+
+from typing import Iterator, Optional
+
+import httpx
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+NON_RETRYABLE_ERROR_CODES = {"insufficient_quota"}
+
+llm_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def llm_retry_deadline(seconds: float) -> Iterator[None]:
+    """Stop retrying the LLM calls made in the block once `seconds` have passed."""
+
+    token = llm_deadline.set(time.monotonic() + seconds)
+
+    try:
+        yield
+
+    finally:
+        llm_deadline.reset(token)
+
+
+def parse_retry_after(headers: Optional[httpx.Headers]) -> Optional[float]:
+    """Return the delay in seconds asked by the `retry-after-ms` or `Retry-After`
+    headers, as a number of seconds or an HTTP date, None if there is none."""
+
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+
+    if not retry_after:
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+
+    except (TypeError, ValueError):
+        return None
+
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """Decide whether a failed LLM call is retried, and after which delay.
+
+    Rate limits, timeouts, connection and server errors are transient and retried.
+    The other errors, such as invalid requests or quota exhaustion, are raised at
+    once. The delay is the one asked by the API, or an exponential backoff with
+    full jitter so the retries of concurrent calls are spread out.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = env_param.LLM_RETRY_MAX_ATTEMPTS,
+        base_delay_seconds: float = env_param.LLM_RETRY_BASE_DELAY_SECONDS,
+        max_delay_seconds: float = env_param.LLM_RETRY_MAX_DELAY_SECONDS,
+    ) -> None:
+        """Initialize the policy, `max_attempts` counts the first call."""
+
+        self.max_attempts: int = max_attempts
+
+        self.base_delay_seconds: float = base_delay_seconds
+
+        self.max_delay_seconds: float = max_delay_seconds
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Check whether an error is transient."""
+
+        if isinstance(error, RateLimitError):
+            return error.code not in NON_RETRYABLE_ERROR_CODES
+
+        if isinstance(error, (APIConnectionError, InternalServerError)):
+            return True
+
+        if isinstance(error, APIStatusError):
+            return (
+                error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+            )
+
+        return False
+
+    def get_delay(self, error: Exception, attempt: int) -> float:
+        """Delay before the retry following the failed attempt `attempt`, from 1."""
+
+        retry_after: Optional[float] = (
+            parse_retry_after(error.response.headers)
+            if isinstance(error, APIStatusError)
+            else None
+        )
+
+        if retry_after is not None:
+            return min(retry_after, self.max_delay_seconds)
+
+        backoff = self.base_delay_seconds * 2 ** (attempt - 1)
+
+        return random.uniform(0, min(self.max_delay_seconds, backoff))
+
+    def get_retry_delay(
+        self, error: Exception, attempt: int, name: str
+    ) -> Optional[float]:
+        """Delay before retrying a failed attempt, None if it must not be retried.
+
+        Args:
+            error (Exception): The error of the attempt.
+            attempt (int): The number of the failed attempt, from 1.
+            name (str): Name of the call in the logs.
+
+        Returns:
+            Optional[float]: The delay in seconds, None to raise the error.
+        """
+
+        if not self.is_retryable(error):
+            return None
+
+        if attempt >= self.max_attempts:
+            logger.error(
+                "LLM RETRY => Max retry calling %s : %d", name, self.max_attempts
+            )
+
+            return None
+
+        delay = self.get_delay(error=error, attempt=attempt)
+
+        deadline = llm_deadline.get()
+
+        if deadline is not None and time.monotonic() + delay > deadline:
+            logger.error(
+                "LLM RETRY => Deadline of the run reached, not retrying %s", name
+            )
+
+            return None
+
+        logger.warning(
+            "LLM RETRY => Attempt %d of %s failed, retrying in %.2fs: %s",
+            attempt,
+            name,
+            delay,
+            str(error),
+        )
+
+        return delay
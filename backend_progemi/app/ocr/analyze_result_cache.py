@@ -0,0 +1,166 @@
+"""Content-addressed cache of Azure Document Intelligence results."""
+
+import json
+
+import zlib
+
+import asyncio
+
+import hashlib
+
+from datetime import datetime, timezone
+
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from beanie.operators import In
+
+from beanie.odm.fields import PydanticObjectId
+
+from azure.ai.documentintelligence.models import AnalyzeResult
+
+from app.ocr.schemas import AnalyzeResultCache
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+MAX_ENTRY_SIZE = 15 * 1024 * 1024
+
+COMPRESSION_LEVEL = 6
+
+
+class AnalyzeResultCacheEntrySize(BaseModel):
+    """Projection of a cache entry on its size."""
+
+    id: PydanticObjectId = Field(..., alias="_id")
+
+    size: int
+
+
+class AnalyzeResultCacheHandler:
+    """Read and write Azure Document Intelligence results in the Mongo cache."""
+
+    def __init__(self) -> None:
+        """Initialize the cache handler from the config."""
+
+        self.enabled: bool = env_param.AZURE_DI_CACHE_ENABLED
+
+        self.max_size: int = env_param.AZURE_DI_CACHE_MAX_SIZE_MB * 1024 * 1024
+
+    @staticmethod
+    def make_key(file_binary: bytes, model_id: str, features: Sequence[str]) -> str:
+        """Build the cache key from the document content and the analysis options."""
+
+        digest = hashlib.sha256(file_binary)
+
+        digest.update(model_id.encode())
+
+        for feature in sorted(features):
+            digest.update(b"|" + feature.encode())
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def serialize(analyze_result: AnalyzeResult) -> bytes:
+        """Serialize and compress an AnalyzeResult."""
+
+        return zlib.compress(
+            json.dumps(analyze_result.as_dict()).encode("utf-8"), COMPRESSION_LEVEL
+        )
+
+    @staticmethod
+    def deserialize(data: bytes) -> AnalyzeResult:
+        """Decompress and deserialize an AnalyzeResult."""
+
+        return AnalyzeResult(json.loads(zlib.decompress(data)))
+
+    async def get(self, key: str) -> Optional[AnalyzeResult]:
+        """Return the cached result for a key, None on cache miss."""
+
+        if not self.enabled:
+            return None
+
+        try:
+            entry: Optional[AnalyzeResultCache] = await AnalyzeResultCache.find_one(
+                AnalyzeResultCache.key == key
+            )
+
+            if not entry:
+                logger.debug("OCR CACHE => Miss for %s", key)
+
+                return None
+
+            await entry.set(
+                {AnalyzeResultCache.last_used_at: datetime.now(timezone.utc)}
+            )
+
+            analyze_result = await asyncio.to_thread(self.deserialize, entry.data)
+
+        except Exception as e:
+            logger.warning("OCR CACHE => Error reading %s: %s", key, str(e))
+
+            return None
+
+        logger.info("OCR CACHE => Hit for %s (%d bytes)", key, entry.size)
+
+        return analyze_result
+
+    async def set(self, key: str, analyze_result: AnalyzeResult) -> None:
+        """Store a result in the cache, then evict the least recently used entries."""
+
+        if not self.enabled:
+            return
+
+        try:
+            data: bytes = await asyncio.to_thread(self.serialize, analyze_result)
+
+            if len(data) > MAX_ENTRY_SIZE:
+                logger.warning(
+                    "OCR CACHE => Result %s too large to be cached (%d bytes)",
+                    key,
+                    len(data),
+                )
+
+                return
+
+            await AnalyzeResultCache.find_one(AnalyzeResultCache.key == key).upsert(
+                {"$set": {AnalyzeResultCache.last_used_at: datetime.now(timezone.utc)}},
+                on_insert=AnalyzeResultCache(key=key, data=data, size=len(data)),
+            )
+
+            logger.debug("OCR CACHE => Stored %s (%d bytes)", key, len(data))
+
+            await self.evict()
+
+        except Exception as e:
+            logger.warning("OCR CACHE => Error writing %s: %s", key, str(e))
+
+    async def evict(self) -> None:
+        """Delete the least recently used entries until the cache fits its max size."""
+
+        total_size: int = int(
+            await AnalyzeResultCache.find_all().sum(AnalyzeResultCache.size) or 0
+        )
+
+        if total_size <= self.max_size:
+            return
+
+        ids_to_delete: List[PydanticObjectId] = []
+
+        async for entry in (
+            AnalyzeResultCache.find_all()
+            .sort(+AnalyzeResultCache.last_used_at)
+            .project(AnalyzeResultCacheEntrySize)
+        ):
+            if total_size <= self.max_size:
+                break
+
+            ids_to_delete.append(entry.id)
+
+            total_size -= entry.size
+
+        await AnalyzeResultCache.find(In(AnalyzeResultCache.id, ids_to_delete)).delete()
+
+        logger.info("OCR CACHE => Evicted %d entries", len(ids_to_delete))
@@ -1,5 +1,7 @@
 """Azure Document Intelligence handler for processing documents."""
 
+import asyncio
+
 from typing import List, Optional, Tuple
 
 from app.ocr.exceptions import (
@@ -9,6 +11,8 @@ from app.ocr.exceptions import (
 
 from app.ocr.utils import build_document_text
 
+from app.ocr.analyze_result_cache import AnalyzeResultCacheHandler
+
 from azure.core.credentials import AzureKeyCredential
 
 from azure.ai.documentintelligence.models import (
@@ -23,10 +27,16 @@ from azure.ai.documentintelligence.models import (
 
 from azure.ai.documentintelligence import DocumentIntelligenceClient
 
+from azure.ai.documentintelligence.aio import (
+    DocumentIntelligenceClient as AsyncDocumentIntelligenceClient,
+)
+
 from config.config import env_param
 
 from config.logger_config import logger
 
+_ANALYSIS_SEMAPHORE = asyncio.Semaphore(env_param.AZURE_DI_MAX_CONCURRENT_ANALYSES)
+
 
 class AzureDIHandler:
     """Handler for Azure Document Intelligence operations."""
@@ -39,16 +49,41 @@ class AzureDIHandler:
             credential=AzureKeyCredential(env_param.AZURE_DI_KEY),
         )
 
+        self.model_id = "prebuilt-layout"
+
         self.features = [
             DocumentAnalysisFeature.STYLE_FONT,
             DocumentAnalysisFeature.OCR_HIGH_RESOLUTION,
         ]
 
-    def analyze_document(self, file_binary: bytes) -> AnalyzeResult:
-        """Analyze the document using Azure Document Intelligence."""
+        self.cache_handler = AnalyzeResultCacheHandler()
+
+    def create_async_client(self) -> Optional[AsyncDocumentIntelligenceClient]:
+        """Create the async client, None if its HTTP transport is not available."""
+
+        if not env_param.AZURE_DI_USE_ASYNC_CLIENT:
+            return None
+
+        try:
+            return AsyncDocumentIntelligenceClient(
+                endpoint=env_param.AZURE_DI_URL,
+                credential=AzureKeyCredential(env_param.AZURE_DI_KEY),
+            )
+
+        except ImportError as e:
+            logger.warning(
+                "Azure Document Intelligence async client unavailable (%s), "
+                "falling back to the sync client in a thread.",
+                str(e),
+            )
+
+            return None
+
+    def analyze_document_sync(self, file_binary: bytes) -> AnalyzeResult:
+        """Analyze the document using the blocking Azure Document Intelligence client."""
 
         poller = self.document_intelligence_client.begin_analyze_document(
-            model_id="prebuilt-layout",
+            model_id=self.model_id,
             body=file_binary,
             features=self.features,
             output_content_format=DocumentContentFormat.MARKDOWN,
@@ -58,6 +93,27 @@ class AzureDIHandler:
 
         return analyze_result
 
+    async def analyze_document(self, file_binary: bytes) -> AnalyzeResult:
+        """Analyze the document using Azure Document Intelligence without blocking the event loop."""
+
+        async with _ANALYSIS_SEMAPHORE:
+            async_client = self.create_async_client()
+
+            if not async_client:
+                return await asyncio.to_thread(self.analyze_document_sync, file_binary)
+
+            async with async_client:
+                poller = await async_client.begin_analyze_document(
+                    model_id=self.model_id,
+                    body=file_binary,
+                    features=self.features,
+                    output_content_format=DocumentContentFormat.MARKDOWN,
+                )
+
+                analyze_result: AnalyzeResult = await poller.result()
+
+            return analyze_result
+
     def process_results(self, analyze_result: AnalyzeResult) -> Optional[str]:
         """Process the analysis results and extract relevant information."""
 
@@ -86,17 +142,44 @@ class AzureDIHandler:
 
         return document_str
 
-    def analyze_and_extract(self, file_binary: bytes) -> Tuple[str, AnalyzeResult]:
-        """Analyze the document and extract structured information."""
+    def get_cache_key(self, file_binary: bytes) -> str:
+        """Return the key of the analysis of a document in the cache."""
+
+        return self.cache_handler.make_key(
+            file_binary=file_binary,
+            model_id=self.model_id,
+            features=[feature.value for feature in self.features],
+        )
+
+    async def get_analyze_result(self, file_binary: bytes) -> AnalyzeResult:
+        """Return the analysis of a document, from the cache when available."""
 
-        analyze_result = self.analyze_document(file_binary=file_binary)
+        cache_key: str = self.get_cache_key(file_binary=file_binary)
+
+        analyze_result = await self.cache_handler.get(key=cache_key)
 
         if not analyze_result:
-            logger.error("Failed to analyze document with Azure Document Intelligence.")
+            analyze_result = await self.analyze_document(file_binary=file_binary)
+
+            if not analyze_result:
+                logger.error(
+                    "Failed to analyze document with Azure Document Intelligence."
+                )
+
+                raise AzureDocumentIntelligenceAnalyzeError()
+
+            await self.cache_handler.set(key=cache_key, analyze_result=analyze_result)
+
+        return analyze_result
+
+    async def analyze_and_extract(
+        self, file_binary: bytes
+    ) -> Tuple[str, AnalyzeResult]:
+        """Analyze the document and extract structured information."""
 
-            raise AzureDocumentIntelligenceAnalyzeError()
+        analyze_result = await self.get_analyze_result(file_binary=file_binary)
 
-        document_str = self.process_results(analyze_result=analyze_result)
+        document_str = await asyncio.to_thread(self.process_results, analyze_result)
 
         if not document_str:
             logger.error("Failed to process results from Azure Document Intelligence.")
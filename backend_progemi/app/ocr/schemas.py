@@ -1,8 +1,12 @@
 """Schemas for OCR processing and table representation."""
 
+from datetime import datetime, timezone
+
 from typing import List, Optional, Sequence
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from beanie import Document, Indexed
 
 
 MULT = 10
@@ -137,3 +141,31 @@ class Table(BaseModel):
                 parts[i] = cell_txt
 
             print(SEP.join(parts).rstrip())
+
+
+class AnalyzeResultCache(Document):
+    """Compressed Azure Document Intelligence result, keyed by the analyzed content."""
+
+    key: Indexed(str, unique=True) = Field(
+        ...,
+        description="SHA-256 of the PDF bytes, model ID and features",
+    )
+
+    data: bytes = Field(..., description="zlib compressed JSON of the AnalyzeResult")
+
+    size: int = Field(..., description="Size of the compressed data in bytes")
+
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Date when the result was cached",
+    )
+
+    last_used_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Date when the result was last read, used for eviction",
+    )
+
+    class Settings:
+        """Settings for the AnalyzeResultCache collection."""
+
+        name = "ocr_cache"
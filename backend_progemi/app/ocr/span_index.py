@@ -0,0 +1,181 @@
+"""Indexes of OCR elements by span offset, built once per AnalyzeResult."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+
+from collections import defaultdict
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from azure.ai.documentintelligence.models import (
+    DocumentPage,
+    DocumentStyle,
+    DocumentWord,
+)
+
+
+class IntervalIndex:
+    """Static interval tree over half-open character intervals [start, end).
+
+    The intervals are sorted by start and seen as an implicit balanced binary
+    tree (the middle of each range is the root of its subtree), each node storing
+    the max end of its subtree. A query visits O(log n + k) nodes for k results.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, int]]) -> None:
+        """Build the tree from (start, end, value) tuples."""
+
+        items = sorted(intervals)
+
+        self.starts: List[int] = [start for start, _, _ in items]
+
+        self.ends: List[int] = [end for _, end, _ in items]
+
+        self.values: List[int] = [value for _, _, value in items]
+
+        self.max_ends: List[int] = list(self.ends)
+
+        self._build_max_ends(0, len(items))
+
+    def _build_max_ends(self, lo: int, hi: int) -> int:
+        """Fill `max_ends` for the subtree of [lo, hi) and return its max end."""
+
+        if lo >= hi:
+            return -1
+
+        mid = (lo + hi) // 2
+
+        self.max_ends[mid] = max(
+            self.ends[mid],
+            self._build_max_ends(lo, mid),
+            self._build_max_ends(mid + 1, hi),
+        )
+
+        return self.max_ends[mid]
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """Return the values of the intervals overlapping [start, end)."""
+
+        out: List[int] = []
+
+        stack = [(0, len(self.starts))]
+
+        while stack:
+            lo, hi = stack.pop()
+
+            if lo >= hi:
+                continue
+
+            mid = (lo + hi) // 2
+
+            if self.max_ends[mid] <= start:
+                continue
+
+            stack.append((lo, mid))
+
+            if self.starts[mid] >= end:
+                continue
+
+            if self.ends[mid] > start:
+                out.append(self.values[mid])
+
+            stack.append((mid + 1, hi))
+
+        return out
+
+
+class WordIndex:
+    """Words of all the pages sorted by span offset.
+
+    - `find_after` returns the first word with a given content after an offset,
+      by bisecting the offsets of the words sharing the lower-cased content.
+    - `overlapping` returns the words whose span overlaps a character range.
+    """
+
+    def __init__(self, pages: List[DocumentPage]) -> None:
+        """Sort the words once and group their positions by lower-cased content."""
+
+        self.words: List[DocumentWord] = sorted(
+            (
+                word
+                for page in pages
+                if page.words
+                for word in page.words
+                if word.span is not None
+            ),
+            key=lambda word: word.span.offset,
+        )
+
+        self.offsets: List[int] = [word.span.offset for word in self.words]
+
+        self.positions_by_content: Dict[str, List[int]] = defaultdict(list)
+
+        for position, word in enumerate(self.words):
+            self.positions_by_content[word.content.lower()].append(position)
+
+        self.offsets_by_content: Dict[str, List[int]] = {
+            content: [self.offsets[position] for position in positions]
+            for content, positions in self.positions_by_content.items()
+        }
+
+    def find_after(self, offset_min: int, target: str) -> Optional[DocumentWord]:
+        """Return the first word matching `target` (case-insensitive) at or after `offset_min`."""
+
+        target = target.lower()
+
+        offsets = self.offsets_by_content.get(target)
+
+        if not offsets:
+            return None
+
+        i = bisect_left(offsets, offset_min)
+
+        if i == len(offsets):
+            return None
+
+        return self.words[self.positions_by_content[target][i]]
+
+    def overlapping(self, start: int, end: int) -> Iterator[DocumentWord]:
+        """Yield, in offset order, the words whose span overlaps [start, end)."""
+
+        i = bisect_left(self.offsets, start)
+
+        if i > 0:
+            previous = self.words[i - 1]
+
+            if previous.span.offset + previous.span.length > start:
+                i -= 1
+
+        while i < len(self.words) and self.offsets[i] < end:
+            word = self.words[i]
+
+            if word.span.offset + word.span.length > start:
+                yield word
+
+            i += 1
+
+
+class StyleIndex:
+    """Spans of the document styles, indexed to find the styles overlapping a range."""
+
+    def __init__(self, styles: List[DocumentStyle]) -> None:
+        """Index every span of every style, keyed by the style position."""
+
+        self.styles: List[DocumentStyle] = styles
+
+        self.intervals = IntervalIndex(
+            (span.offset, span.offset + span.length, position)
+            for position, style in enumerate(styles)
+            for span in style.spans or []
+        )
+
+    def overlapping(self, ranges: Iterable[Tuple[int, int]]) -> List[DocumentStyle]:
+        """Return, in the styles order and without duplicates, the styles overlapping any range."""
+
+        positions: Set[int] = set()
+
+        for start, end in ranges:
+            positions.update(self.intervals.overlapping(start, end))
+
+        return [self.styles[position] for position in sorted(positions)]
@@ -10,10 +10,12 @@ from math import sqrt
 
 from itertools import cycle
 
-from typing import Dict, List, Optional, Sequence, Any, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from app.ocr.schemas import SEP, Cell, LineStyle, TableRow, Table
 
+from app.ocr.span_index import StyleIndex, WordIndex
+
 from azure.ai.documentintelligence.models import (
     DocumentParagraph,
     DocumentStyle,
@@ -202,47 +204,28 @@ def _poly_height_px(
     raise ValueError(f"Unknown unit: {unit!r}")
 
 
-def _intersects(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
-    """Do two character intervals overlap?"""
-
-    return not (a[1] <= b[0] or a[0] >= b[1])
-
-
 def _estimate_row_height_px(
     row: TableRow,
-    pages: List[DocumentPage],
+    word_index: WordIndex,
     *,
     dpi: int = 96,
 ) -> float:
     """
-    Estimates the height of a row in pixels.
+    Estimates the height of a row in pixels, from the first word of its first cell.
     """
 
-    max_h_px = 0.0
-
     for cell in row.cells[:1]:
-        for page in pages:
-            if not page.words:
+        for word in word_index.overlapping(
+            cell.offset_span, cell.offset_span + cell.span_len
+        ):
+            if not word.polygon:
                 continue
 
-            for word in page.words:
-                if not word.polygon:
-                    continue
-
-                if _intersects(
-                    (word.span.offset, word.span.offset + word.span.length),
-                    (cell.offset_span, cell.offset_span + cell.span_len),
-                ):
-                    h_px = _poly_height_px(word.polygon, unit="inch", dpi=dpi)
-
-                    max_h_px = max(max_h_px, h_px)
+            cell.polygon = word.polygon
 
-                    if h_px == max_h_px:
-                        cell.polygon = word.polygon
+            cell.word_used_for_size = word.content
 
-                        cell.word_used_for_size = word.content
-
-                        return max_h_px
+            return _poly_height_px(word.polygon, unit="inch", dpi=dpi)
 
     return 0.0
 
@@ -263,7 +246,7 @@ def _to_line_style(s: DocumentStyle) -> LineStyle:
     )
 
 
-def _styles_for_row(row: TableRow, styles: List[DocumentStyle]) -> List[LineStyle]:
+def _styles_for_row(row: TableRow, style_index: StyleIndex) -> List[LineStyle]:
     """
     Returns a list of LineStyle objects for the given row based on the styles
     that intersect with the cell spans in the row.
@@ -271,18 +254,7 @@ def _styles_for_row(row: TableRow, styles: List[DocumentStyle]) -> List[LineStyl
 
     ranges = [(c.offset_span, c.offset_span + c.span_len) for c in row.cells]
 
-    out: List[LineStyle] = []
-
-    for st in styles:
-        for sp in st.spans or []:
-            span_rng = (sp.offset, sp.offset + sp.length)
-
-            if any(_intersects(span_rng, r) for r in ranges):
-                out.append(_to_line_style(st))
-
-                break
-
-    return out
+    return [_to_line_style(st) for st in style_index.overlapping(ranges)]
 
 
 def _first_point_x_pixels(
@@ -315,31 +287,6 @@ def _first_point_x_pixels(
     return None
 
 
-def _span_offset(span: Any) -> int:
-    """
-    Returns the offset of a span.
-    If the span is None, returns -1.
-    If the span has an 'offset' attribute, returns that.
-    If the span is a dictionary, checks for 'offset' or 'span.offset'.
-    Raises ValueError if the span is not recognized.
-    """
-
-    if span is None:
-        return -1
-
-    if hasattr(span, "offset"):
-        return span.offset
-
-    if isinstance(span, dict):
-        if "offset" in span:
-            return span["offset"]
-
-        if "span" in span and "offset" in span["span"]:
-            return span["span"]["offset"]
-
-    raise ValueError("Span not recognized: " + str(span))
-
-
 def _table_col_widths(
     table: Table, col_off: List[float], bg2icon: Dict[str, str] | None
 ) -> List[int]:
@@ -372,47 +319,6 @@ def _table_col_widths(
     return w
 
 
-def _find_word_after_span(
-    pages: List[DocumentPage],
-    offset_min: int,
-    target: str,
-) -> Optional[DocumentWord]:
-    """
-    Finds the first word in the pages that matches the target string
-    and is located after the specified offset.
-    The search is case-insensitive and ignores words before the offset_min.
-    If no matching word is found, returns None.
-    The target string is converted to lowercase for case-insensitive comparison.
-    The function assumes that the pages contain words with spans that have an 'offset' attribute.
-    If a page has no words, it is skipped.
-    If a word's span offset is less than offset_min, it is skipped.
-    If a word's content matches the target string (case-insensitive), that word is returned.
-    If no matching word is found after checking all pages, None is returned.
-    """
-
-    target = target.lower()
-
-    for page in pages:
-        if not page.words:
-            continue
-
-        words: List[DocumentWord] = page.words
-
-        words_sorted = sorted(
-            words,
-            key=lambda w: _span_offset(w.span),
-        )
-
-        for w in words_sorted:
-            if w.span.offset < offset_min:
-                continue
-
-            if w.content.lower() == target:
-                return w
-
-    return None
-
-
 def _first_token(text: str) -> str:
     """
     Returns the first token in the text that contains at least one alphanumeric character.
@@ -454,9 +360,9 @@ def _overlaps(start: int, length: int, ranges: List[Tuple[int, int]]) -> bool:
 
 
 def _rebuilt_tables(
-    tables: List[DocumentTable], pages: List[DocumentPage], styles: List[DocumentStyle]
+    tables: List[DocumentTable], word_index: WordIndex, style_index: StyleIndex
 ) -> Tuple[List[Table], List[Tuple[int, int]], Dict[str, str]]:
-    """Rebuilds tables from the document pages and styles."""
+    """Rebuilds tables from the document words and styles."""
 
     logger.debug("# FOUNDING TABLES SPANS")
 
@@ -503,8 +409,7 @@ def _rebuilt_tables(
             if cell.content:
                 first_cell_word_text: str = _first_token(cell.content)
 
-                first_cell_word_object: Optional[DocumentWord] = _find_word_after_span(
-                    pages,
+                first_cell_word_object: Optional[DocumentWord] = word_index.find_after(
                     offset_min=cell.spans[0].offset,
                     target=first_cell_word_text,
                 )
@@ -623,17 +528,17 @@ def _rebuilt_tables(
                     )
                 )
 
-        table_row.line_styles = _styles_for_row(table_row, styles)
+        table_row.line_styles = _styles_for_row(table_row, style_index)
 
         for row in table_rebuilt.table_rows:
-            row.line_styles = _styles_for_row(row, styles)
+            row.line_styles = _styles_for_row(row, style_index)
 
         if table_rebuilt.table_rows:
             tables_rebuilt.append(table_rebuilt)
 
     for table_rebuilt in tables_rebuilt:
         for row in table_rebuilt.table_rows:
-            row_font_pt = _estimate_row_height_px(row=row, pages=pages)
+            row_font_pt = _estimate_row_height_px(row=row, word_index=word_index)
 
             row.line_styles.append(LineStyle(font_size=row_font_pt))
 
@@ -710,7 +615,11 @@ def build_document_text(
     and spans are provided for the tables and paragraphs.
     """
 
-    tables_built, tbl_ranges, bg2icon = _rebuilt_tables(tables, pages, styles)
+    word_index = WordIndex(pages)
+
+    style_index = StyleIndex(styles or [])
+
+    tables_built, tbl_ranges, bg2icon = _rebuilt_tables(tables, word_index, style_index)
 
     _assign_h_levels(tables_built)
 
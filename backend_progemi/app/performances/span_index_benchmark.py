@@ -0,0 +1,225 @@
+"""Micro-benchmark of the style matching of table rows, with and without StyleIndex.
+
+Run from backend_progemi: `python -m app.performances.span_index_benchmark`
+"""
+
+import time
+
+import random
+
+from typing import Callable, List, Tuple
+
+from azure.ai.documentintelligence.models import DocumentSpan, DocumentStyle
+
+from pydantic import BaseModel
+
+from app.ocr.schemas import Cell, TableRow
+
+from app.ocr.span_index import StyleIndex
+
+from config.logger_config import logger
+
+NB_CELLS_PER_ROW = 6
+
+CELL_LEN = 20
+
+SIZES = [(50, 50), (100, 200), (200, 400), (400, 800)]
+
+
+class SpanIndexTiming(BaseModel):
+    """Durations of both implementations for one size of rows x styles."""
+
+    nb_rows: int
+
+    nb_styles: int
+
+    loops_seconds: float
+
+    index_seconds: float
+
+    @property
+    def speedup(self) -> float:
+        """How many times the index is faster than the loops."""
+
+        return self.loops_seconds / max(self.index_seconds, 1e-9)
+
+
+def _make_rows(nb_rows: int) -> List[TableRow]:
+    """Build contiguous rows of cells, as laid out by Azure DI."""
+
+    rows: List[TableRow] = []
+
+    offset = 0
+
+    for row_index in range(nb_rows):
+        cells: List[Cell] = []
+
+        for column_index in range(NB_CELLS_PER_ROW):
+            cells.append(
+                Cell(
+                    row_index=row_index,
+                    column_index=column_index,
+                    content="",
+                    offset_px=0.0,
+                    offset_span=offset,
+                    span_len=CELL_LEN,
+                    polygon=[],
+                )
+            )
+
+            offset += CELL_LEN + 1
+
+        rows.append(TableRow(row_index=row_index, cells=cells))
+
+    return rows
+
+
+def _make_styles(
+    nb_styles: int, doc_len: int, rng: random.Random
+) -> List[DocumentStyle]:
+    """Build styles with a few short random spans each."""
+
+    return [
+        DocumentStyle(
+            is_handwritten=False,
+            font_weight="bold",
+            spans=[
+                DocumentSpan(offset=rng.randrange(doc_len), length=rng.randint(1, 40))
+                for _ in range(rng.randint(1, 4))
+            ],
+        )
+        for _ in range(nb_styles)
+    ]
+
+
+def _intersects(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    """Do two character intervals overlap?"""
+
+    return not (a[1] <= b[0] or a[0] >= b[1])
+
+
+def match_with_loops(
+    rows: List[TableRow], styles: List[DocumentStyle]
+) -> List[List[int]]:
+    """Previous implementation: every style span against every cell of every row."""
+
+    out: List[List[int]] = []
+
+    for row in rows:
+        ranges = [(c.offset_span, c.offset_span + c.span_len) for c in row.cells]
+
+        matched: List[int] = []
+
+        for position, st in enumerate(styles):
+            for sp in st.spans or []:
+                span_rng = (sp.offset, sp.offset + sp.length)
+
+                if any(_intersects(span_rng, r) for r in ranges):
+                    matched.append(position)
+
+                    break
+
+        out.append(matched)
+
+    return out
+
+
+def match_with_index(
+    rows: List[TableRow], styles: List[DocumentStyle]
+) -> List[List[int]]:
+    """StyleIndex built once, then queried for each row."""
+
+    style_index = StyleIndex(styles)
+
+    positions = {id(style): position for position, style in enumerate(styles)}
+
+    return [
+        [
+            positions[id(style)]
+            for style in style_index.overlapping(
+                (c.offset_span, c.offset_span + c.span_len) for c in row.cells
+            )
+        ]
+        for row in rows
+    ]
+
+
+def _timed(
+    func: Callable[[List[TableRow], List[DocumentStyle]], List[List[int]]],
+    rows: List[TableRow],
+    styles: List[DocumentStyle],
+) -> Tuple[float, List[List[int]]]:
+    """Run a matching function and return its duration in seconds and its result."""
+
+    start = time.perf_counter()
+
+    result = func(rows, styles)
+
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(
+    sizes: List[Tuple[int, int]] = SIZES, seed: int = 0
+) -> List[SpanIndexTiming]:
+    """Time both implementations for growing rows x styles.
+
+    Args:
+        sizes (List[Tuple[int, int]]): The numbers of rows and styles to time.
+        seed (int): The seed of the random styles.
+
+    Returns:
+        List[SpanIndexTiming]: The durations, one per size.
+
+    Raises:
+        ValueError: If both implementations do not match the same styles.
+    """
+
+    rng = random.Random(seed)
+
+    timings: List[SpanIndexTiming] = []
+
+    for nb_rows, nb_styles in sizes:
+        rows = _make_rows(nb_rows)
+
+        styles = _make_styles(
+            nb_styles, doc_len=nb_rows * NB_CELLS_PER_ROW * (CELL_LEN + 1), rng=rng
+        )
+
+        loops_time, loops_result = _timed(match_with_loops, rows, styles)
+
+        index_time, index_result = _timed(match_with_index, rows, styles)
+
+        if loops_result != index_result:
+            raise ValueError(
+                f"StyleIndex result differs from loops for {nb_rows} rows "
+                f"and {nb_styles} styles"
+            )
+
+        timings.append(
+            SpanIndexTiming(
+                nb_rows=nb_rows,
+                nb_styles=nb_styles,
+                loops_seconds=loops_time,
+                index_seconds=index_time,
+            )
+        )
+
+    return timings
+
+
+def main() -> None:
+    """Log the duration of both implementations for growing rows x styles."""
+
+    for timing in run_benchmark():
+        logger.info(
+            "PERFORMANCES => %d rows x %d styles : loops %.4f s, index %.4f s (%.1fx)",
+            timing.nb_rows,
+            timing.nb_styles,
+            timing.loops_seconds,
+            timing.index_seconds,
+            timing.speedup,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Long-lived pooled HTTP client for the Progemi API."""
+
+from typing import Optional
+
+import httpx
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+
+class ProgemiHttpClient:
+    """Hold one httpx.AsyncClient, reusing keep-alive connections across requests."""
+
+    def __init__(self) -> None:
+        """Initialize without client, it is created by `start` or on first use."""
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def build_client() -> httpx.AsyncClient:
+        """Build a client with the timeouts and connection limits of the config."""
+
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                env_param.PROGEMI_API_TIMEOUT_SECONDS,
+                connect=env_param.PROGEMI_API_CONNECT_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=env_param.PROGEMI_API_MAX_CONNECTIONS,
+                max_keepalive_connections=env_param.PROGEMI_API_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=env_param.PROGEMI_API_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the shared client, created on first use outside of the app lifespan."""
+
+        if self._client is None or self._client.is_closed:
+            self._client = self.build_client()
+
+        return self._client
+
+    def start(self) -> None:
+        """Create the shared client."""
+
+        self._client = self.build_client()
+
+        logger.debug("PROGEMI API => ✅ HTTP client started")
+
+    async def stop(self) -> None:
+        """Close the shared client and its connections."""
+
+        if self._client is not None:
+            await self._client.aclose()
+
+            self._client = None
+
+        logger.debug("PROGEMI API => HTTP client closed")
+
+
+progemi_http_client = ProgemiHttpClient()
@@ -7,6 +7,10 @@ import httpx
 from app.auth.schemas import ConnectedUser
 from app.progemi_api.schemas import PackProgemi, ProjectProgemi
 
+from app.progemi_api.http_client import progemi_http_client
+
+from app.progemi_api.progemi_cache import progemi_response_cache
+
 from app.progemi_api.exception import (
     InvalidToken,
     PacksError,
@@ -29,6 +33,21 @@ class ProgemiAPIHandler:
         return f"{env_param.PROGEMI_API_BASE_URL}/{env_param.PROGEMI_API_VERSION}/apikey/{token}/{route}"
 
     async def get_user_packs(self, token: str) -> List[PackProgemi]:
+        """
+        Retrieve the List of packs from the Progemi API, through the response cache.
+
+        Returns:
+            List of PackProgemi objects.
+        """
+
+        packs: List[PackProgemi] = await progemi_response_cache.get_or_fetch(
+            key=("lots", token),
+            fetch=lambda: self.fetch_user_packs(token=token),
+        )
+
+        return list(packs)
+
+    async def fetch_user_packs(self, token: str) -> List[PackProgemi]:
         """
         Retrieve the List of packs from the Progemi API.
 
@@ -39,16 +58,15 @@ class ProgemiAPIHandler:
         try:
             url = self.make_url(token, "lots")
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
+            response = await progemi_http_client.client.get(url)
 
-                response.raise_for_status()
+            response.raise_for_status()
 
-                packs_data = response.json()
+            packs_data = response.json()
 
-                packs: List[PackProgemi] = [
-                    PackProgemi(**pack) for pack in packs_data["lot"]
-                ]
+            packs: List[PackProgemi] = [
+                PackProgemi(**pack) for pack in packs_data["lot"]
+            ]
 
             logger.debug("PROGEMI API => ✅ Retrieved %d packs", len(packs))
 
@@ -82,12 +100,11 @@ class ProgemiAPIHandler:
         try:
             url = self.make_url(token, "controletoken")
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
+            response = await progemi_http_client.client.get(url)
 
-                response.raise_for_status()
+            response.raise_for_status()
 
-                response_json: Dict = response.json()
+            response_json: Dict = response.json()
 
             user_id: Optional[str] = response_json.get("nomholding", None)
 
@@ -116,6 +133,32 @@ class ProgemiAPIHandler:
 
     async def get_user_project(
         self, connected_user: ConnectedUser
+    ) -> List[ProjectProgemi]:
+        """
+        Retrieve the List of projects from the Progemi API, through the response cache.
+
+        Args:
+            connected_user (ConnectedUser): The connected user, with its token and IDs.
+
+        Returns:
+            List of ProjectProgemi objects.
+        """
+
+        projects: List[ProjectProgemi] = await progemi_response_cache.get_or_fetch(
+            key=(
+                "lireprojetssansetude",
+                connected_user.token,
+                connected_user.idholding,
+                connected_user.idsociete,
+                connected_user.idagence,
+            ),
+            fetch=lambda: self.fetch_user_project(connected_user=connected_user),
+        )
+
+        return list(projects)
+
+    async def fetch_user_project(
+        self, connected_user: ConnectedUser
     ) -> List[ProjectProgemi]:
         """
         Retrieve the List of projects from the Progemi API.
@@ -137,16 +180,15 @@ class ProgemiAPIHandler:
                 "idagence": connected_user.idagence,
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.request("GET", url, json=params)
+            response = await progemi_http_client.client.request("GET", url, json=params)
 
-                response.raise_for_status()
+            response.raise_for_status()
 
-                projects_data = response.json()
+            projects_data = response.json()
 
-                projects: List[ProjectProgemi] = [
-                    ProjectProgemi(**project) for project in projects_data["projets"]
-                ]
+            projects: List[ProjectProgemi] = [
+                ProjectProgemi(**project) for project in projects_data["projets"]
+            ]
 
             logger.debug("PROGEMI API => ✅ Retrieved %d projects", len(projects))
 
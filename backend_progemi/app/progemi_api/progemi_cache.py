@@ -0,0 +1,125 @@
+"""Read-through cache of the Progemi API responses."""
+
+import time
+
+import asyncio
+
+from collections import OrderedDict
+
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+T = TypeVar("T")
+
+
+class StaleWhileRevalidateCache(Generic[T]):
+    """LRU cache with TTL, serving stale values while refreshing them in background.
+
+    - a value younger than `ttl_seconds` is returned as is;
+    - a value younger than `ttl_seconds + stale_seconds` is returned and refreshed
+      in background;
+    - otherwise the caller waits for a new fetch.
+
+    Concurrent fetches of the same key share a single call.
+    """
+
+    def __init__(self, ttl_seconds: int, stale_seconds: int, max_entries: int) -> None:
+        """Initialize an empty cache."""
+
+        self.ttl_seconds: int = ttl_seconds
+
+        self.stale_seconds: int = stale_seconds
+
+        self.max_entries: int = max_entries
+
+        self.entries: OrderedDict[Hashable, Tuple[float, T]] = OrderedDict()
+
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Return the value of a key, fetching it if missing or too old.
+
+        Args:
+            key (Hashable): The cache key.
+            fetch (Callable[[], Awaitable[T]]): Coroutine function fetching the value.
+
+        Returns:
+            T: The cached or fetched value.
+        """
+
+        entry = self.entries.get(key)
+
+        if entry:
+            stored_at, value = entry
+
+            age = time.monotonic() - stored_at
+
+            if age <= self.ttl_seconds:
+                self.entries.move_to_end(key)
+
+                return value
+
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self._fetch_once(key=key, fetch=fetch)
+
+                return value
+
+        return await asyncio.shield(self._fetch_once(key=key, fetch=fetch))
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a key from the cache."""
+
+        self.entries.pop(key, None)
+
+    def _fetch_once(
+        self, key: Hashable, fetch: Callable[[], Awaitable[T]]
+    ) -> asyncio.Task:
+        """Return the running fetch of a key, starting it if there is none."""
+
+        task = self.in_flight.get(key)
+
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key=key, fetch=fetch))
+
+            task.add_done_callback(self._log_failure)
+
+            self.in_flight[key] = task
+
+        return task
+
+    async def _fetch_and_store(
+        self, key: Hashable, fetch: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Fetch a value and store it, failures are not cached."""
+
+        try:
+            value = await fetch()
+
+            self.entries[key] = (time.monotonic(), value)
+
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+            return value
+
+        finally:
+            self.in_flight.pop(key, None)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        """Log the failure of a fetch, including background refreshes nobody awaits."""
+
+        if not task.cancelled() and task.exception():
+            logger.warning("PROGEMI CACHE => Fetch failed: %s", str(task.exception()))
+
+
+progemi_response_cache: StaleWhileRevalidateCache = StaleWhileRevalidateCache(
+    ttl_seconds=env_param.PROGEMI_API_CACHE_TTL_SECONDS,
+    stale_seconds=env_param.PROGEMI_API_CACHE_STALE_SECONDS,
+    max_entries=env_param.PROGEMI_API_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,281 @@
+"""Persisted outputs of the proposal pipeline stages, to resume or partially re-run it."""
+
+from datetime import datetime, timezone
+
+from contextlib import asynccontextmanager
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from pydantic import Field
+
+from beanie import Document, Indexed
+
+from beanie.odm.fields import PydanticObjectId
+
+from app.proposal_object.proposal_section_analysis import StructureProduitsDevis
+
+from app.proposal_object.proposal_validate_results import ValidationReport
+
+from app.proposal_object.schemas import ProposalWithPolygonAndValidation
+
+from app.proposal_object.stages import (
+    ProposalStage,
+    StageInfo,
+    StageStatus,
+    StageTracker,
+)
+
+from config.logger_config import logger
+
+STAGES: List[ProposalStage] = list(ProposalStage)
+
+STAGE_OUTPUTS: Dict[ProposalStage, List[str]] = {
+    ProposalStage.OCR: ["analyze_result_key", "proposal_str"],
+    ProposalStage.SECTIONS: ["sections"],
+    ProposalStage.STRUCTURING: ["structured_object"],
+    ProposalStage.POLYGONS: ["polygon_object"],
+    ProposalStage.VALIDATION: ["validated_object", "validation_report"],
+    ProposalStage.RETRY: ["retried_object", "retried_report"],
+}
+
+
+class ProposalCheckpoint(Document):
+    """Output of each completed stage of the pipeline for a proposal."""
+
+    proposal_id: Indexed(PydanticObjectId, unique=True) = Field(
+        ..., description="ID of the proposal processed by the pipeline"
+    )
+
+    packs: List[str] = Field(
+        default_factory=list,
+        description="Sorted pack names the structuring stage was run with",
+    )
+
+    stages: List[StageInfo] = Field(
+        default_factory=lambda: [StageInfo(stage=stage) for stage in ProposalStage],
+        description="Status and timestamps of each stage of the last run",
+    )
+
+    analyze_result_key: Optional[str] = Field(
+        default=None,
+        description="Key of the Azure Document Intelligence result in the OCR cache",
+    )
+
+    proposal_str: Optional[str] = Field(
+        default=None, description="Text of the proposal built from the OCR"
+    )
+
+    sections: Optional[StructureProduitsDevis] = Field(
+        default=None, description="Sections of the proposal products"
+    )
+
+    structured_object: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Raw structured proposal, validated against the packs Devis model",
+    )
+
+    polygon_object: Optional[ProposalWithPolygonAndValidation] = Field(
+        default=None, description="Structured proposal with the product polygons"
+    )
+
+    validated_object: Optional[ProposalWithPolygonAndValidation] = Field(
+        default=None, description="Proposal with the validation issues"
+    )
+
+    validation_report: Optional[ValidationReport] = Field(
+        default=None, description="Validation report of the first structuring"
+    )
+
+    retried_object: Optional[ProposalWithPolygonAndValidation] = Field(
+        default=None, description="Proposal fixed by the retry stage"
+    )
+
+    retried_report: Optional[ValidationReport] = Field(
+        default=None, description="Validation report after the retry"
+    )
+
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Date when the checkpoint was last saved",
+    )
+
+    class Settings:
+        """Settings for the ProposalCheckpoint collection."""
+
+        name = "proposal_checkpoints"
+
+
+class ProposalCheckpointHandler:
+    """Restore the completed stages of a proposal and save each new stage output.
+
+    Completed stages always form a prefix of the pipeline: when a stage is run
+    again, the outputs of the following stages are discarded.
+    """
+
+    def __init__(self, checkpoint: ProposalCheckpoint, persist: bool = True) -> None:
+        """Initialize the handler, nothing is saved when `persist` is False."""
+
+        self.checkpoint: ProposalCheckpoint = checkpoint
+
+        self.persist: bool = persist
+
+    @classmethod
+    def in_memory(cls, packs: List[str]) -> "ProposalCheckpointHandler":
+        """Return a handler keeping the stage outputs of a single run in memory."""
+
+        return cls(
+            checkpoint=ProposalCheckpoint(proposal_id=PydanticObjectId(), packs=packs),
+            persist=False,
+        )
+
+    @classmethod
+    async def load(
+        cls,
+        proposal_id: PydanticObjectId,
+        packs: List[str],
+        rerun_from: Optional[ProposalStage] = None,
+    ) -> "ProposalCheckpointHandler":
+        """Load the checkpoint of a proposal, ready to resume or re-run it.
+
+        Args:
+            proposal_id (PydanticObjectId): The ID of the proposal.
+            packs (List[str]): The sorted pack names of the new run.
+            rerun_from (Optional[ProposalStage]): The first stage to run again, None
+                to resume after the last completed stage, or to run a completed
+                pipeline again from the start.
+
+        Returns:
+            ProposalCheckpointHandler: The handler of the proposal checkpoint.
+        """
+
+        checkpoint: Optional[ProposalCheckpoint] = await ProposalCheckpoint.find_one(
+            ProposalCheckpoint.proposal_id == proposal_id
+        )
+
+        handler = cls(
+            checkpoint=checkpoint
+            or ProposalCheckpoint(proposal_id=proposal_id, packs=packs)
+        )
+
+        restart_stages: List[ProposalStage] = []
+
+        if rerun_from is not None:
+            restart_stages.append(rerun_from)
+
+        elif handler.is_complete():
+            restart_stages.append(ProposalStage.OCR)
+
+        if handler.checkpoint.packs != packs:
+            handler.checkpoint.packs = packs
+
+            restart_stages.append(ProposalStage.STRUCTURING)
+
+        restart_stages.extend(stage for stage in STAGES if not handler.is_done(stage))
+
+        first_stage: Optional[ProposalStage] = min(
+            restart_stages, key=STAGES.index, default=None
+        )
+
+        if first_stage is not None:
+            handler.invalidate_from(stage=first_stage)
+
+        logger.debug(
+            "PROPOSAL CHECKPOINT => Proposal %s runs from stage %s",
+            str(proposal_id),
+            first_stage.value if first_stage else "none",
+        )
+
+        return handler
+
+    def get_stage(self, stage: ProposalStage) -> StageInfo:
+        """Get the saved info of a stage."""
+
+        return next(info for info in self.checkpoint.stages if info.stage == stage)
+
+    def is_done(self, stage: ProposalStage) -> bool:
+        """Check whether the output of a stage is available."""
+
+        return self.get_stage(stage).status == StageStatus.DONE
+
+    def is_complete(self) -> bool:
+        """Check whether the last run went through the whole pipeline."""
+
+        retry_status: StageStatus = self.get_stage(ProposalStage.RETRY).status
+
+        return self.is_done(ProposalStage.VALIDATION) and retry_status in (
+            StageStatus.DONE,
+            StageStatus.SKIPPED,
+        )
+
+    def invalidate_from(self, stage: ProposalStage) -> None:
+        """Discard the outputs of a stage and of all the following ones."""
+
+        for following in STAGES[STAGES.index(stage) :]:
+            for field in STAGE_OUTPUTS[following]:
+                setattr(self.checkpoint, field, None)
+
+            info = self.get_stage(following)
+
+            info.status = StageStatus.PENDING
+
+            info.started_at = None
+
+            info.ended_at = None
+
+            info.model = None
+
+            info.tier = None
+
+    def record(self, stage: ProposalStage, **outputs: Any) -> None:
+        """Set the outputs of a stage, saved when the stage ends."""
+
+        for field, value in outputs.items():
+            if field not in STAGE_OUTPUTS[stage]:
+                raise ValueError(f"{field} is not an output of stage {stage.value}")
+
+            setattr(self.checkpoint, field, value)
+
+    async def skip(self, stage_tracker: StageTracker, stage: ProposalStage) -> None:
+        """Mark a stage not needed by this run as skipped, in the tracker and the
+        checkpoint."""
+
+        await stage_tracker.skip(stage)
+
+        await self.save_stage(stage_info=stage_tracker.get_stage(stage))
+
+    @asynccontextmanager
+    async def track(
+        self, stage_tracker: StageTracker, stage: ProposalStage
+    ) -> AsyncIterator[None]:
+        """Track a stage, then save its status with the outputs recorded in the block."""
+
+        try:
+            async with stage_tracker.track(stage):
+                yield
+
+        finally:
+            await self.save_stage(stage_info=stage_tracker.get_stage(stage))
+
+    async def save_stage(self, stage_info: StageInfo) -> None:
+        """Save the status of a stage along with the outputs recorded so far."""
+
+        self.checkpoint.stages = [
+            stage_info.model_copy() if info.stage == stage_info.stage else info
+            for info in self.checkpoint.stages
+        ]
+
+        if not self.persist:
+            return
+
+        self.checkpoint.updated_at = datetime.now(timezone.utc)
+
+        try:
+            await self.checkpoint.save()
+
+        except Exception as e:
+            logger.warning(
+                "PROPOSAL CHECKPOINT => Error saving stage %s of proposal %s: %s",
+                stage_info.stage.value,
+                str(self.checkpoint.proposal_id),
+                str(e),
+            )
@@ -0,0 +1,227 @@
+"""Build the Devis and lot assignment models constrained to the lots of a pack set."""
+
+import re
+
+import threading
+
+import unicodedata
+
+from enum import Enum
+
+from collections import OrderedDict
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, create_model
+
+from app.proposal_object.schemas import (
+    Devis,
+    LotAssignment,
+    LotAssignments,
+    Produit,
+)
+
+from config.logger_config import logger
+
+MAX_CACHED_MODELS = 128
+
+
+class DevisModelFactory:
+    """Build and memoize one isolated Devis model per pack set.
+
+    The shared `Produit` and `Devis` classes are never modified, each pack set gets
+    its own subclasses whose `lot` field is an Enum of the pack names.
+    """
+
+    def __init__(self, max_cached_models: int = MAX_CACHED_MODELS) -> None:
+        """Initialize an empty LRU cache of models."""
+
+        self.max_cached_models: int = max_cached_models
+
+        self.models: OrderedDict[Tuple[str, ...], Type[Devis]] = OrderedDict()
+
+        self.lot_assignment_models: OrderedDict[
+            Tuple[str, ...], Type[LotAssignments]
+        ] = OrderedDict()
+
+        self.schemas: Dict[Type[BaseModel], Dict[str, Any]] = {}
+
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_identifier(s: str) -> str:
+        """Convert a string to a valid identifier by removing accents and special characters."""
+
+        s_norm = unicodedata.normalize("NFKD", s)
+
+        s_ascii = "".join(ch for ch in s_norm if unicodedata.category(ch) != "Mn")
+
+        tmp = re.sub(r"\W+", "_", s_ascii)
+
+        if re.match(r"^\d", tmp):
+            tmp = "_" + tmp
+
+        return tmp.upper().strip("_")
+
+    @staticmethod
+    def make_packs_key(packs: Iterable[str]) -> Tuple[str, ...]:
+        """Freeze a pack set into a hashable key, independent of the packs order."""
+
+        return tuple(sorted(set(packs)))
+
+    def build_lot_enum(self, packs: Iterable[str]) -> Enum:
+        """
+        Build an Enum for the packs in a proposal.
+        """
+
+        members = {}
+
+        for pack in packs:
+            key = self.make_identifier(pack)
+
+            if key in members:
+                continue
+
+            members[key] = pack
+
+        return Enum("Lot", members)
+
+    def build_devis_model(self, packs: Iterable[str]) -> Type[Devis]:
+        """Build the Produit and Devis subclasses with the lot Enum of the packs."""
+
+        lot_enum = self.build_lot_enum(packs)
+
+        produit_fields = Produit.model_fields
+
+        produit_model: Type[Produit] = create_model(
+            "Produit",
+            __base__=Produit,
+            __module__=Produit.__module__,
+            __doc__=Produit.__doc__,
+            lot=(lot_enum, Field(..., description=produit_fields["lot"].description)),
+            sous_produits=(
+                Optional[List["Produit"]],
+                Field(..., description=produit_fields["sous_produits"].description),
+            ),
+        )
+
+        produit_model.model_rebuild(
+            force=True, _types_namespace={"Produit": produit_model}
+        )
+
+        devis_model: Type[Devis] = create_model(
+            "Devis",
+            __base__=Devis,
+            __module__=Devis.__module__,
+            __doc__=Devis.__doc__,
+            devis_produits=(
+                List[produit_model],
+                Field(
+                    ...,
+                    description=Devis.model_fields["devis_produits"].description,
+                ),
+            ),
+        )
+
+        return devis_model
+
+    def build_lot_assignment_model(self, packs: Iterable[str]) -> Type[LotAssignments]:
+        """Build the LotAssignment and LotAssignments subclasses with the lot Enum
+        of the packs."""
+
+        lot_enum = self.build_lot_enum(packs)
+
+        assignment_model = create_model(
+            "LotAssignment",
+            __base__=LotAssignment,
+            __module__=LotAssignment.__module__,
+            __doc__=LotAssignment.__doc__,
+            lot=(
+                lot_enum,
+                Field(..., description=LotAssignment.model_fields["lot"].description),
+            ),
+        )
+
+        assignments_model: Type[LotAssignments] = create_model(
+            "LotAssignments",
+            __base__=LotAssignments,
+            __module__=LotAssignments.__module__,
+            __doc__=LotAssignments.__doc__,
+            lots=(
+                List[assignment_model],
+                Field(..., description=LotAssignments.model_fields["lots"].description),
+            ),
+        )
+
+        return assignments_model
+
+    def get_devis_model(self, packs: Iterable[str]) -> Type[Devis]:
+        """Return the Devis model of a pack set, built once and kept in a LRU cache."""
+
+        return self.get_model(
+            models=self.models, packs=packs, build=self.build_devis_model
+        )
+
+    def get_lot_assignment_model(self, packs: Iterable[str]) -> Type[LotAssignments]:
+        """Return the LotAssignments model of a pack set, built once and kept in a
+        LRU cache."""
+
+        return self.get_model(
+            models=self.lot_assignment_models,
+            packs=packs,
+            build=self.build_lot_assignment_model,
+        )
+
+    def get_model(
+        self,
+        models: OrderedDict[Tuple[str, ...], Type[BaseModel]],
+        packs: Iterable[str],
+        build: Callable[[Tuple[str, ...]], Type[BaseModel]],
+    ) -> Type[BaseModel]:
+        """Return the model of a pack set from a LRU cache, building it if missing."""
+
+        packs_key = self.make_packs_key(packs)
+
+        with self.lock:
+            model = models.get(packs_key)
+
+            if model:
+                models.move_to_end(packs_key)
+
+                return model
+
+            model = build(packs_key)
+
+            models[packs_key] = model
+
+            while len(models) > self.max_cached_models:
+                _, evicted_model = models.popitem(last=False)
+
+                self.schemas.pop(evicted_model, None)
+
+        logger.debug(
+            "DEVIS MODEL FACTORY => %s model built for packs: %s",
+            model.__name__,
+            packs_key,
+        )
+
+        return model
+
+    def get_json_schema(self, model: Type[BaseModel]) -> Dict[str, Any]:
+        """Return the JSON schema of a model, generated once per model.
+
+        The returned dict is shared, callers must not modify it.
+        """
+
+        with self.lock:
+            schema = self.schemas.get(model)
+
+            if schema is None:
+                schema = model.model_json_schema()
+
+                self.schemas[model] = schema
+
+        return schema
+
+
+devis_model_factory = DevisModelFactory()
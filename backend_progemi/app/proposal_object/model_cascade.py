@@ -0,0 +1,100 @@
+"""Cascade of models for the stages calling a LLM, from the cheapest to the largest."""
+
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from app.proposal_object.stages import ProposalStage, StageTracker
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+T = TypeVar("T")
+
+
+class ModelCascade:
+    """Run a stage on a cheap model first, escalating to the next model when the
+    call fails, returns nothing or gives an output rejected by the stage.
+
+    The output of the last model is kept whatever its quality, and its failures
+    are raised. The model kept is recorded on the stage tracker.
+    """
+
+    def __init__(
+        self,
+        stage: ProposalStage,
+        models: List[str],
+        stage_tracker: Optional[StageTracker] = None,
+        enabled: bool = env_param.CASCADE_ENABLED,
+    ) -> None:
+        """Initialize the cascade of a stage, only its last model is used when the
+        cascade is disabled.
+
+        Raises:
+            ValueError: If no model is given for the stage.
+        """
+
+        if not models:
+            raise ValueError(f"No model given for the cascade of stage {stage.value}")
+
+        self.stage: ProposalStage = stage
+
+        self.models: List[str] = models if enabled else models[-1:]
+
+        self.stage_tracker: Optional[StageTracker] = stage_tracker
+
+    async def run(
+        self,
+        call: Callable[[str], Awaitable[Optional[T]]],
+        accept: Callable[[T], bool] = lambda _: True,
+    ) -> Tuple[Optional[T], str]:
+        """Run the stage on each model until one output is accepted.
+
+        Args:
+            call (Callable[[str], Awaitable[Optional[T]]]): Run the stage with a model.
+            accept (Callable[[T], bool]): Check the output of a model before the last.
+
+        Returns:
+            Tuple[Optional[T], str]: The output kept and the model which produced it.
+        """
+
+        output: Optional[T] = None
+
+        for tier, model in enumerate(self.models):
+            is_last = tier == len(self.models) - 1
+
+            try:
+                output = await call(model)
+
+            except Exception as e:
+                if is_last:
+                    raise
+
+                logger.warning(
+                    "MODEL CASCADE => Stage %s failed with %s, escalating: %s",
+                    self.stage.value,
+                    model,
+                    str(e),
+                )
+
+                continue
+
+            if is_last or (output is not None and accept(output)):
+                break
+
+            logger.info(
+                "MODEL CASCADE => Output of %s rejected for stage %s, escalating.",
+                model,
+                self.stage.value,
+            )
+
+        logger.info(
+            "MODEL CASCADE => Stage %s done with %s (tier %d).",
+            self.stage.value,
+            model,
+            tier,
+        )
+
+        if self.stage_tracker:
+            self.stage_tracker.set_model(self.stage, model=model, tier=tier)
+
+        return output, model
@@ -0,0 +1,135 @@
+"""Index of the OCR lines used to attach a polygon to each product."""
+
+import heapq
+
+from collections import defaultdict
+
+from difflib import SequenceMatcher
+
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from azure.ai.documentintelligence.models import AnalyzeResult
+
+NGRAM_SIZE = 3
+
+
+class PolygonLineIndex:
+    """OCR lines normalized once, with a trigram inverted index to shortlist candidates.
+
+    Each line keeps its own SequenceMatcher with the line as second sequence, so the
+    line analysis done by difflib is shared by all the labels compared to it.
+    """
+
+    def __init__(
+        self, analyze_result: AnalyzeResult, normalize: Callable[[str], str]
+    ) -> None:
+        """Normalize the lines with a polygon and index their trigrams."""
+
+        self.polygons: List[List[float]] = []
+
+        self.pages: List[int] = []
+
+        self.matchers: List[SequenceMatcher] = []
+
+        self.nb_ngrams: List[int] = []
+
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+        for page in analyze_result.pages or []:
+            for line in page.lines or []:
+                if not line.polygon:
+                    continue
+
+                norm_content = normalize(line.content)
+
+                position = len(self.matchers)
+
+                ngrams = self.ngrams(norm_content)
+
+                for ngram in ngrams:
+                    self.postings[ngram].append(position)
+
+                self.nb_ngrams.append(len(ngrams))
+
+                self.matchers.append(SequenceMatcher(None, "", norm_content))
+
+                self.polygons.append(line.polygon)
+
+                self.pages.append(page.page_number)
+
+    def __len__(self) -> int:
+        """Number of indexed lines."""
+
+        return len(self.matchers)
+
+    @staticmethod
+    def ngrams(text: str) -> Set[str]:
+        """Return the character trigrams of a text, the text itself if shorter."""
+
+        if len(text) < NGRAM_SIZE:
+            return {text} if text else set()
+
+        return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+    def candidates(self, norm_label: str, top_k: int) -> List[int]:
+        """Return, in document order, the top_k lines sharing the most trigrams with a label.
+
+        Lines are ranked by the Dice coefficient of their trigram sets, which favors
+        lines of a length close to the label as SequenceMatcher.ratio does.
+        """
+
+        label_ngrams = self.ngrams(norm_label)
+
+        shared: Dict[int, int] = defaultdict(int)
+
+        for ngram in label_ngrams:
+            for position in self.postings.get(ngram, []):
+                shared[position] += 1
+
+        top = heapq.nsmallest(
+            top_k,
+            shared.items(),
+            key=lambda item: (
+                -item[1] / (len(label_ngrams) + self.nb_ngrams[item[0]]),
+                item[0],
+            ),
+        )
+
+        return sorted(position for position, _ in top)
+
+    def best_match(
+        self, norm_label: str, positions: Iterable[int]
+    ) -> Tuple[List[float], int]:
+        """Return the polygon and page of the most similar line among positions.
+
+        quick_ratio is an upper bound of ratio, lines that cannot beat the current
+        best score are skipped without running the full comparison.
+        """
+
+        best_score = 0.0
+
+        best_polygon: List[float] = []
+
+        page_associated: int = 0
+
+        for position in positions:
+            matcher = self.matchers[position]
+
+            matcher.set_seq1(norm_label)
+
+            if matcher.real_quick_ratio() <= best_score:
+                continue
+
+            if matcher.quick_ratio() <= best_score:
+                continue
+
+            score = matcher.ratio()
+
+            if score > best_score:
+                best_score = score
+
+                best_polygon = self.polygons[position]
+
+                page_associated = self.pages[position]
+
+        return best_polygon, page_associated
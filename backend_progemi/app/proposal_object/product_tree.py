@@ -0,0 +1,118 @@
+"""Positions and validation paths of the products of a proposal."""
+
+from typing import Dict, List, Optional, Tuple
+
+from app.proposal_object.schemas import (
+    ProductWithPolygonAndValidation,
+    ProposalWithPolygonAndValidation,
+)
+
+ROOT_PATH = "__root__"
+
+ProductPath = Tuple[int, ...]
+
+
+class ProductTree:
+    """Access the products of a proposal by their position in the products tree.
+
+    A position is the tuple of the indexes of the product and of its ancestors in
+    their `sous_produits` lists, from the top level product.
+    """
+
+    def __init__(self, proposal: ProposalWithPolygonAndValidation) -> None:
+        """Initialize the tree of a proposal, which is read and modified in place."""
+
+        self.proposal: ProposalWithPolygonAndValidation = proposal
+
+    def get_siblings(
+        self, product_path: ProductPath
+    ) -> List[ProductWithPolygonAndValidation]:
+        """Get the list holding the product at a position."""
+
+        products = self.proposal.devis_produits
+
+        for index in product_path[:-1]:
+            products = products[index].sous_produits or []
+
+        return products
+
+    def get(self, product_path: ProductPath) -> ProductWithPolygonAndValidation:
+        """Get the product at a position."""
+
+        return self.get_siblings(product_path=product_path)[product_path[-1]]
+
+    def set(
+        self, product_path: ProductPath, product: ProductWithPolygonAndValidation
+    ) -> None:
+        """Replace the product at a position."""
+
+        self.get_siblings(product_path=product_path)[product_path[-1]] = product
+
+    def get_path_prefix(self, product_path: ProductPath) -> str:
+        """Get the validation path of the parent of a product, as the prefix of the
+        product path."""
+
+        prefix = ""
+
+        products = self.proposal.devis_produits
+
+        for index in product_path[:-1]:
+            prefix += f"{products[index].label} > "
+
+            products = products[index].sous_produits or []
+
+        return prefix
+
+    def get_product_paths(
+        self,
+        products: Optional[List[ProductWithPolygonAndValidation]] = None,
+        path: str = "",
+        product_path: ProductPath = (),
+    ) -> Dict[str, List[ProductPath]]:
+        """Map the validation path of each product, built as the validation does, to
+        its positions in the tree."""
+
+        if products is None:
+            products = self.proposal.devis_produits
+
+        product_paths: Dict[str, List[ProductPath]] = {}
+
+        for index, product in enumerate(products):
+            full_path = f"{path}{product.label}"
+
+            product_paths.setdefault(full_path, []).append(product_path + (index,))
+
+            for child_path, positions in self.get_product_paths(
+                products=product.sous_produits or [],
+                path=full_path + " > ",
+                product_path=product_path + (index,),
+            ).items():
+                product_paths.setdefault(child_path, []).extend(positions)
+
+        return product_paths
+
+    def get_leaf_paths(
+        self,
+        products: Optional[List[ProductWithPolygonAndValidation]] = None,
+        product_path: ProductPath = (),
+    ) -> List[ProductPath]:
+        """List the positions of the products without sub-products, depth first."""
+
+        if products is None:
+            products = self.proposal.devis_produits
+
+        leaf_paths: List[ProductPath] = []
+
+        for index, product in enumerate(products):
+            if product.sous_produits:
+                leaf_paths.extend(
+                    self.get_leaf_paths(
+                        products=product.sous_produits,
+                        product_path=product_path + (index,),
+                    )
+                )
+
+            else:
+                leaf_paths.append(product_path + (index,))
+
+        return leaf_paths
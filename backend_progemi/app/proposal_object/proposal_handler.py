@@ -1,12 +1,6 @@
 """Proposal Handler Module."""
 
-import re
-
-import unicodedata
-
-from enum import Enum
-
-from typing import List, Tuple, Type
+from typing import Dict, List, Optional, Tuple
 
 from azure.ai.documentintelligence.models import (
     AnalyzeResult,
@@ -17,130 +11,164 @@ from app.cost.cost import CostTracker
 
 from app.proposal_object.proposal_retry import ProposalRetry
 
-from app.proposal_object.proposal_polygone import ProposalPolygonHandler
-
-from app.proposal_object.proposal_validate_results import ValidationReport
-
-from app.proposal_object.proposal_object_creator import ProposalObjectCreator
-
-from app.proposal_object.proposal_object_analyzer import ProposalObjectHandler
+from app.proposal_object.model_cascade import ModelCascade
 
-from app.proposal_object.schemas import Devis, Produit, ProposalWithPolygonAndValidation
-
-from config.logger_config import logger
+from app.proposal_object.proposal_repair import ProposalRepair
 
+from app.proposal_object.product_tree import ProductPath, ProductTree
 
-class ProposalHandler:
-    """Class to handle proposal-related operations."""
+from app.proposal_object.proposal_polygone import ProposalPolygonHandler
 
-    def make_identifier(self, s: str) -> str:
-        """Convert a string to a valid identifier by removing accents and special characters."""
+from app.proposal_object.proposal_validate_results import (
+    ValidationError,
+    ValidationReport,
+)
 
-        s_norm = unicodedata.normalize("NFKD", s)
+from app.proposal_object.stages import ProposalStage, StageTracker
 
-        s_ascii = "".join(ch for ch in s_norm if unicodedata.category(ch) != "Mn")
+from app.proposal_object.checkpoints import ProposalCheckpointHandler
 
-        tmp = re.sub(r"\W+", "_", s_ascii)
+from app.proposal_object.proposal_object_creator import ProposalObjectCreator
 
-        if re.match(r"^\d", tmp):
-            tmp = "_" + tmp
+from app.proposal_object.proposal_stream import ProductCallback
 
-        return tmp.upper().strip("_")
+from app.proposal_object.proposal_object_analyzer import ProposalObjectHandler
 
-    def _build_lot_enum(self, packs: List[str]) -> Enum:
-        """
-        Build an Enum for the packs in a proposal.
-        """
+from app.proposal_object.schemas import (
+    Devis,
+    Produit,
+    ProposalWithPolygonAndValidation,
+)
 
-        members = {}
+from app.proposal_object.devis_model_factory import devis_model_factory
 
-        for pack in packs:
-            key = self.make_identifier(pack)
+from config.config import env_param
 
-            if key in members:
-                continue
+from config.logger_config import logger
 
-            members[key] = pack
 
-        return Enum("Lot", members)
+class ProposalHandler:
+    """Class to handle proposal-related operations."""
 
-    def inject_lot_enum(
+    async def get_proposal_object(
         self,
+        proposal_bytes: bytes,
         packs: List[str],
-        produit_model: Type[Produit],
-        devis_model: Type[Devis],
-    ) -> Type[Devis]:
-        """
-        Inject an Enum for the packs into the Produit model and update the Devis model schema.
-        """
-
-        Lot = self._build_lot_enum(packs)
-
-        produit_model.__annotations__["lot"] = Lot
-
-        produit_model.model_fields["lot"].annotation = Lot
-
-        produit_model.model_rebuild(force=True)
-
-        devis_model.model_rebuild(force=True)
-
-        logger.info(
-            "PROPOSAL HANDLER => devis_model schema updated with packs: %s",
-            devis_model.model_json_schema(),
-        )
-        return devis_model
-
-    async def get_proposal_object(
-        self, proposal_bytes: bytes, packs: List[str]
+        stage_tracker: Optional[StageTracker] = None,
+        use_llm_cache: bool = True,
+        checkpoint: Optional[ProposalCheckpointHandler] = None,
+        on_product: Optional[ProductCallback] = None,
     ) -> Tuple[ProposalWithPolygonAndValidation, ValidationReport, str]:
         """
         Create and return a structured proposal object from the proposal bytes.
+
+        Each stage output is saved in the checkpoint, and the stages it already
+        holds are restored instead of being run again. The products are sent to
+        `on_product` as soon as they are structured, before their validation.
         """
 
         cost_tracker = CostTracker()
 
-        devis_model = self.inject_lot_enum(
-            packs=packs,
-            produit_model=Produit,
-            devis_model=Devis,
-        )
+        stage_tracker = stage_tracker or StageTracker()
+
+        checkpoint = checkpoint or ProposalCheckpointHandler.in_memory(packs=packs)
+
+        devis_model = devis_model_factory.get_devis_model(packs=packs)
 
         proposal_object_creator = ProposalObjectCreator(
             proposal_bytes=proposal_bytes,
             cost_tracker=cost_tracker,
+            stage_tracker=stage_tracker,
+            use_llm_cache=use_llm_cache,
+            on_product=on_product,
         )
 
         (
             proposal_object,
             proposal_str,
             analyze_result,
-        ) = await proposal_object_creator.create(devis_model=devis_model)
+        ) = await proposal_object_creator.create(
+            devis_model=devis_model, checkpoint=checkpoint
+        )
 
         # logger.info(
         #     "PROPOSAL HANDLER => Proposal object: %s",
         #     proposal_object.model_dump_json(indent=2),
         # )
 
-        proposal_object, report = await self.validate_proposal_object(
-            proposal_object=proposal_object
-        )
+        if checkpoint.is_done(ProposalStage.VALIDATION):
+            proposal_object = checkpoint.checkpoint.validated_object
+
+            report: ValidationReport = checkpoint.checkpoint.validation_report
+
+            await stage_tracker.skip(ProposalStage.VALIDATION)
+
+        else:
+            async with checkpoint.track(stage_tracker, ProposalStage.VALIDATION):
+                proposal_object, report = await self.validate_proposal_object(
+                    proposal_object=proposal_object
+                )
+
+                checkpoint.record(
+                    ProposalStage.VALIDATION,
+                    validated_object=proposal_object,
+                    validation_report=report,
+                )
 
         logger.info(
             "PROPOSAL HANDLER => Report:\n%s",
             report.model_dump_json(indent=2),
         )
 
-        if len(report.errors) > 0:
+        if len(report.errors) > 0 and checkpoint.is_done(ProposalStage.RETRY):
+            proposal_object = checkpoint.checkpoint.retried_object
+
+            report = checkpoint.checkpoint.retried_report
+
+            await stage_tracker.skip(ProposalStage.RETRY)
+
+        elif len(report.errors) > 0:
             logger.warning(
-                "PROPOSAL HANDLER => Proposal object has errors, retrying creation."
+                "PROPOSAL HANDLER => Proposal object has errors, repairing or retrying creation."
             )
 
-            proposal_object, report = await self.check_and_retry_proposal_object(
-                analyze_result=analyze_result,
-                proposal_str=proposal_str,
-                proposal_object=proposal_object,
-                proposal_validation=report,
-            )
+            async with checkpoint.track(stage_tracker, ProposalStage.RETRY):
+                proposal_object, report, _ = ProposalRepair().repair(
+                    proposal=proposal_object, validation_report=report
+                )
+
+                if len(report.errors) > 0:
+                    analyze_result = (
+                        analyze_result
+                        or await proposal_object_creator.load_analyze_result()
+                    )
+
+                    (proposal_object, report), _ = await ModelCascade(
+                        stage=ProposalStage.RETRY,
+                        models=env_param.CASCADE_RETRY_MODELS,
+                        stage_tracker=stage_tracker,
+                    ).run(
+                        call=lambda model: self.check_and_retry_proposal_object(
+                            analyze_result=analyze_result,
+                            proposal_str=proposal_str,
+                            file_base64=proposal_object_creator.file_base64,
+                            proposal_object=proposal_object,
+                            proposal_validation=report,
+                            cost_tracker=cost_tracker,
+                            use_llm_cache=use_llm_cache,
+                            model=model,
+                        ),
+                        accept=lambda retried: len(retried[1].errors) == 0,
+                    )
+
+                checkpoint.record(
+                    ProposalStage.RETRY,
+                    retried_object=proposal_object,
+                    retried_report=report,
+                )
+
+        else:
+            await checkpoint.skip(stage_tracker, ProposalStage.RETRY)
 
         logger.info(
             "PROPOSAL HANDLER => Final cost: %s",
@@ -153,14 +181,56 @@ class ProposalHandler:
         self,
         analyze_result: AnalyzeResult,
         proposal_str: str,
+        file_base64: str,
         proposal_object: ProposalWithPolygonAndValidation,
         proposal_validation: ValidationReport,
+        cost_tracker: CostTracker,
+        use_llm_cache: bool = True,
+        model: str = env_param.GPT_4_1,
     ) -> Tuple[ProposalWithPolygonAndValidation, ValidationReport]:
         """
         Retry creating the proposal object if the first attempt fails.
+
+        When every product error can be located, only the subtrees with errors are
+        regenerated. The whole proposal is regenerated otherwise, or if the targeted
+        retry does not reduce the errors.
         """
 
-        proposal_retry = ProposalRetry(cost_tracker=CostTracker())
+        proposal_retry = ProposalRetry(
+            cost_tracker=cost_tracker,
+            file_base64=file_base64,
+            use_cache=use_llm_cache,
+            model=model,
+        )
+
+        subtrees: Optional[Dict[ProductPath, List[ValidationError]]] = (
+            proposal_retry.locate_errors(
+                proposal=proposal_object, validation_report=proposal_validation
+            )
+            if env_param.RETRY_TARGETED_ENABLED
+            else None
+        )
+
+        if subtrees:
+            new_proposal_object, new_report = await self.retry_subtrees(
+                proposal_retry=proposal_retry,
+                analyze_result=analyze_result,
+                proposal_str=proposal_str,
+                proposal_object=proposal_object,
+                subtrees=subtrees,
+            )
+
+            if len(new_report.errors) < len(proposal_validation.errors):
+                logger.info(
+                    "PROPOSAL HANDLER => New proposal report after targeted retry: %s",
+                    new_report.model_dump_json(indent=2),
+                )
+
+                return new_proposal_object, new_report
+
+            logger.warning(
+                "PROPOSAL HANDLER => Targeted retry did not reduce the errors, retrying the whole proposal."
+            )
 
         new_proposal_object = await proposal_retry.retry_create_proposal_object(
             proposal_str=proposal_str,
@@ -192,6 +262,58 @@ class ProposalHandler:
 
         return new_proposal_object, new_report
 
+    async def retry_subtrees(
+        self,
+        proposal_retry: ProposalRetry,
+        analyze_result: AnalyzeResult,
+        proposal_str: str,
+        proposal_object: ProposalWithPolygonAndValidation,
+        subtrees: Dict[ProductPath, List[ValidationError]],
+    ) -> Tuple[ProposalWithPolygonAndValidation, ValidationReport]:
+        """
+        Regenerate the subtrees with errors and splice them in a copy of the proposal.
+
+        Only the regenerated products whose label or description changed are matched
+        again with the OCR lines.
+        """
+
+        new_products: Dict[ProductPath, Produit] = await proposal_retry.retry_subtrees(
+            proposal_str=proposal_str,
+            proposal_object=proposal_object,
+            subtrees=subtrees,
+        )
+
+        new_proposal_object = proposal_object.model_copy(deep=True)
+
+        polygon_handler = ProposalPolygonHandler(
+            proposal_object=new_proposal_object, analyze_result=analyze_result
+        )
+
+        product_tree = ProductTree(proposal=proposal_object)
+
+        polygon_handler.remember_polygons(
+            products=[
+                product_tree.get(product_path=product_path)
+                for product_path in new_products
+            ]
+        )
+
+        new_product_tree = ProductTree(proposal=new_proposal_object)
+
+        for product_path, new_product in new_products.items():
+            new_product_tree.set(
+                product_path=product_path,
+                product=polygon_handler.add_polygon_to_product(new_product),
+            )
+
+        logger.info(
+            "PROPOSAL HANDLER => %d of %d subtrees regenerated.",
+            len(new_products),
+            len(subtrees),
+        )
+
+        return await self.validate_proposal_object(proposal_object=new_proposal_object)
+
     async def validate_proposal_object(
         self, proposal_object: Devis | ProposalWithPolygonAndValidation
     ) -> Tuple[ProposalWithPolygonAndValidation, ValidationReport]:
@@ -0,0 +1,63 @@
+"""Messages of the LLM calls made on a proposal, laid out for prompt caching."""
+
+from typing import Any, Dict, List, Optional
+
+PROPOSAL_DOCUMENT_SYSTEM_PROMPT = (
+    "Vous êtes le meilleur analyseur de devis du monde. "
+    "Vous recevez un devis au format PDF et son texte brut au format markdown, "
+    "suivis des instructions de la tâche à réaliser sur ce devis."
+)
+
+
+def build_proposal_messages(
+    file_base64: str,
+    proposal_str: str,
+    instructions: str,
+    context: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Build the messages of a call on a proposal.
+
+    The PDF and the text of the proposal come first, in the same messages for every
+    call on the same document, so that the provider prompt cache reuses this large
+    prefix. The instructions of the call and its context come last.
+
+    Args:
+        file_base64 (str): The base64 of the proposal PDF.
+        proposal_str (str): The text of the proposal.
+        instructions (str): The instructions of the call.
+        context (Optional[str]): The data of the call, such as a previous output.
+
+    Returns:
+        List[Dict[str, Any]]: The messages of the call.
+    """
+
+    messages: List[Dict[str, Any]] = [
+        {
+            "role": "system",
+            "content": [{"type": "text", "text": PROPOSAL_DOCUMENT_SYSTEM_PROMPT}],
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "file",
+                    "file": {
+                        "filename": "devis.pdf",
+                        "file_data": f"data:application/pdf;base64,{file_base64}",
+                    },
+                },
+                {
+                    "type": "text",
+                    "text": "# Voici le texte brut du devis :\n\n" + proposal_str,
+                },
+            ],
+        },
+        {"role": "system", "content": [{"type": "text", "text": instructions}]},
+    ]
+
+    if context:
+        messages.append(
+            {"role": "user", "content": [{"type": "text", "text": context}]}
+        )
+
+    return messages
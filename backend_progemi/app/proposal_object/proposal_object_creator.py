@@ -1,7 +1,10 @@
 """Proposal Object Creator Module."""
 
 import base64
-from typing import List, Optional, Tuple, Type
+
+from functools import cached_property
+
+from typing import Optional, Tuple, Type
 
 from azure.ai.documentintelligence.models import (
     AnalyzeResult,
@@ -20,18 +23,44 @@ from app.proposal_object.schemas import Devis, ProposalWithPolygonAndValidation
 
 from app.proposal_object.exceptions import ProposalObjectNotCreated
 
+from app.proposal_object.stages import ProposalStage, StageTracker
+
+from app.proposal_object.checkpoints import ProposalCheckpointHandler
+
 from app.proposal_object.proposal_polygone import ProposalPolygonHandler
 
+from app.proposal_object.proposal_stream import (
+    ProductCallback,
+    ProductEvent,
+    ProductStreamer,
+)
+
 from app.proposal_object.proposal_text_analysis import ProposalTextAnalyzer
 
+from app.proposal_object.model_cascade import ModelCascade
+
+from app.proposal_object.proposal_repair import ProposalRepair
+
+from app.proposal_object.proposal_validate_results import ValidateProposalObject
+
+from config.config import env_param
+
 from config.logger_config import logger
 
 
 class ProposalObjectCreator:
     """Class to create a proposal object (Devis)."""
 
-    def __init__(self, proposal_bytes: bytes, cost_tracker: CostTracker) -> None:
-        """Initialize the ProposalObjectCreator with a proposal object."""
+    def __init__(
+        self,
+        proposal_bytes: bytes,
+        cost_tracker: CostTracker,
+        stage_tracker: Optional[StageTracker] = None,
+        use_llm_cache: bool = True,
+        on_product: Optional[ProductCallback] = None,
+    ) -> None:
+        """Initialize the ProposalObjectCreator with a proposal object, the products
+        are sent to `on_product` as soon as they are structured when it is set."""
 
         self.azure_di_handler = AzureDIHandler()
 
@@ -39,24 +68,165 @@ class ProposalObjectCreator:
 
         self.proposal_bytes: bytes = proposal_bytes
 
-    async def create(
-        self, devis_model: Type[Devis]
-    ) -> Tuple[ProposalWithPolygonAndValidation, str, AnalyzeResult]:
-        """Create and return the proposal object."""
+        self.stage_tracker: StageTracker = stage_tracker or StageTracker()
+
+        self.use_llm_cache: bool = use_llm_cache
+
+        self.on_product: Optional[ProductCallback] = on_product
+
+    @cached_property
+    def file_base64(self) -> str:
+        """Base64 of the proposal PDF, sent to the LLM along with its text."""
+
+        return base64.b64encode(self.proposal_bytes).decode("utf-8")
+
+    def get_analyze_result_key(self) -> str:
+        """Return the key of the analysis of the proposal in the OCR cache."""
+
+        return self.azure_di_handler.get_cache_key(file_binary=self.proposal_bytes)
+
+    async def load_analyze_result(self) -> AnalyzeResult:
+        """Return the analysis of the proposal, from the OCR cache when available."""
 
-        proposal_str, analyze_result = self.azure_di_handler.analyze_and_extract(
+        return await self.azure_di_handler.get_analyze_result(
             file_binary=self.proposal_bytes
         )
 
-        file_base64: str = base64.b64encode(self.proposal_bytes).decode("utf-8")
+    async def create(
+        self,
+        devis_model: Type[Devis],
+        checkpoint: Optional[ProposalCheckpointHandler] = None,
+    ) -> Tuple[ProposalWithPolygonAndValidation, str, Optional[AnalyzeResult]]:
+        """Create and return the proposal object.
+
+        The stages already completed in the checkpoint are restored instead of run,
+        so the analysis is only returned if one of the stages needed it.
+        """
+
+        checkpoint = checkpoint or ProposalCheckpointHandler.in_memory(packs=[])
+
+        analyze_result: Optional[AnalyzeResult] = None
+
+        if checkpoint.is_done(ProposalStage.OCR):
+            proposal_str: str = checkpoint.checkpoint.proposal_str
+
+            await self.stage_tracker.skip(ProposalStage.OCR)
+
+        else:
+            async with checkpoint.track(self.stage_tracker, ProposalStage.OCR):
+                (
+                    proposal_str,
+                    analyze_result,
+                ) = await self.azure_di_handler.analyze_and_extract(
+                    file_binary=self.proposal_bytes
+                )
+
+                checkpoint.record(
+                    ProposalStage.OCR,
+                    analyze_result_key=self.get_analyze_result_key(),
+                    proposal_str=proposal_str,
+                )
+
+        if checkpoint.is_done(ProposalStage.SECTIONS):
+            proposal_sections: StructureProduitsDevis = checkpoint.checkpoint.sections
+
+            await self.stage_tracker.skip(ProposalStage.SECTIONS)
+
+        else:
+            async with checkpoint.track(self.stage_tracker, ProposalStage.SECTIONS):
+                proposal_sections = await self.analyze_sections(
+                    proposal_str=proposal_str
+                )
+
+                checkpoint.record(ProposalStage.SECTIONS, sections=proposal_sections)
+
+        streamer: Optional[ProductStreamer] = None
+
+        if self.on_product and not checkpoint.is_done(ProposalStage.POLYGONS):
+            analyze_result = analyze_result or await self.load_analyze_result()
+
+            streamer = ProductStreamer(
+                on_product=self.on_product, analyze_result=analyze_result
+            )
+
+        if checkpoint.is_done(ProposalStage.STRUCTURING):
+            proposal_object: Devis = devis_model.model_validate(
+                checkpoint.checkpoint.structured_object
+            )
 
-        proposal_sections: Optional[
-            StructureProduitsDevis
-        ] = await ProposalSectionAnalysis(
-            cost_tracker=self.cost_tracker,
-            proposal_str=proposal_str,
-            file_base64=file_base64,
-        ).get_sections()
+            await self.stage_tracker.skip(ProposalStage.STRUCTURING)
+
+            if streamer:
+                streamer.restart()
+
+                await streamer.finish(proposal_object=proposal_object)
+
+        else:
+            async with checkpoint.track(self.stage_tracker, ProposalStage.STRUCTURING):
+                proposal_object = await self.structure(
+                    proposal_str=proposal_str,
+                    proposal_sections=proposal_sections,
+                    devis_model=devis_model,
+                    streamer=streamer,
+                )
+
+                checkpoint.record(
+                    ProposalStage.STRUCTURING,
+                    structured_object=proposal_object.model_dump(mode="json"),
+                )
+
+        if checkpoint.is_done(ProposalStage.POLYGONS):
+            proposal_with_polygon: ProposalWithPolygonAndValidation = (
+                checkpoint.checkpoint.polygon_object
+            )
+
+            await self.stage_tracker.skip(ProposalStage.POLYGONS)
+
+            if self.on_product:
+                for index, product in enumerate(proposal_with_polygon.devis_produits):
+                    await self.on_product(
+                        ProductEvent(index=index, attempt=1, product=product)
+                    )
+
+        else:
+            async with checkpoint.track(self.stage_tracker, ProposalStage.POLYGONS):
+                analyze_result = analyze_result or await self.load_analyze_result()
+
+                polygon_handler = ProposalPolygonHandler(
+                    proposal_object=proposal_object,
+                    analyze_result=analyze_result,
+                )
+
+                if streamer:
+                    streamer.remember_polygons(polygon_handler=polygon_handler)
+
+                proposal_with_polygon = polygon_handler.add_polygon_to_products()
+
+                checkpoint.record(
+                    ProposalStage.POLYGONS, polygon_object=proposal_with_polygon
+                )
+
+        return proposal_with_polygon, proposal_str, analyze_result
+
+    async def analyze_sections(self, proposal_str: str) -> StructureProduitsDevis:
+        """Analyze the sections of the proposal products, escalating to a larger
+        model when no sections are found."""
+
+        proposal_sections: Optional[StructureProduitsDevis]
+
+        proposal_sections, _ = await ModelCascade(
+            stage=ProposalStage.SECTIONS,
+            models=env_param.CASCADE_SECTIONS_MODELS,
+            stage_tracker=self.stage_tracker,
+        ).run(
+            call=lambda model: ProposalSectionAnalysis(
+                cost_tracker=self.cost_tracker,
+                proposal_str=proposal_str,
+                file_base64=self.file_base64,
+                use_cache=self.use_llm_cache,
+                model=model,
+            ).get_sections()
+        )
 
         if not proposal_sections:
             logger.error(
@@ -65,13 +235,52 @@ class ProposalObjectCreator:
 
             raise ProposalObjectNotCreated()
 
-        proposal_object: Optional[Devis] = await ProposalTextAnalyzer(
-            cost_tracker=self.cost_tracker, file_base64=file_base64
-        ).analyze_and_structure(
-            raw_proposal=proposal_str,
-            section_analysis=proposal_sections.model_dump_json(indent=2),
-            devis_model=devis_model,
-        )
+        return proposal_sections
+
+    async def structure(
+        self,
+        proposal_str: str,
+        proposal_sections: StructureProduitsDevis,
+        devis_model: Type[Devis],
+        streamer: Optional[ProductStreamer] = None,
+    ) -> Devis:
+        """Structure the proposal text into the Devis model of the packs.
+
+        The output of a smaller model is kept only if it is valid once repaired,
+        a larger model is used otherwise. With a streamer, the products of each
+        model are emitted while its answer is written.
+        """
+
+        async def call(model: str) -> Optional[Devis]:
+            """Structure the proposal with a model of the cascade."""
+
+            if streamer:
+                streamer.restart()
+
+            result: Optional[Devis] = await ProposalTextAnalyzer(
+                cost_tracker=self.cost_tracker,
+                file_base64=self.file_base64,
+                use_cache=self.use_llm_cache,
+                model=model,
+            ).analyze_and_structure(
+                raw_proposal=proposal_str,
+                section_analysis=proposal_sections.model_dump_json(indent=2),
+                devis_model=devis_model,
+                on_partial=streamer.on_partial if streamer else None,
+            )
+
+            if streamer:
+                await streamer.finish(proposal_object=result)
+
+            return result
+
+        proposal_object: Optional[Devis]
+
+        proposal_object, _ = await ModelCascade(
+            stage=ProposalStage.STRUCTURING,
+            models=env_param.CASCADE_STRUCTURING_MODELS,
+            stage_tracker=self.stage_tracker,
+        ).run(call=call, accept=self.is_valid)
 
         if not proposal_object:
             logger.error(
@@ -80,11 +289,20 @@ class ProposalObjectCreator:
 
             raise ProposalObjectNotCreated()
 
-        proposal_with_polygon: ProposalWithPolygonAndValidation = (
-            ProposalPolygonHandler(
-                proposal_object=proposal_object,
-                analyze_result=analyze_result,
-            ).add_polygon_to_products()
+        return proposal_object
+
+    @staticmethod
+    def is_valid(proposal_object: Devis) -> bool:
+        """Check that a structured proposal has no validation error left once the
+        rule-based repair is applied."""
+
+        proposal, report = ValidateProposalObject().validate_proposal_object(
+            devis=proposal_object
         )
 
-        return proposal_with_polygon, proposal_str, analyze_result
+        if report.errors:
+            _, report, _ = ProposalRepair().repair(
+                proposal=proposal, validation_report=report
+            )
+
+        return not report.errors
@@ -1,13 +1,15 @@
 """Class to handle proposal polygons for visualization."""
 
-from typing import List, Tuple
+from functools import cached_property
 
-from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Tuple
 
 from azure.ai.documentintelligence.models import (
     AnalyzeResult,
 )
 
+from app.proposal_object.polygon_line_index import PolygonLineIndex
+
 from app.proposal_object.schemas import (
     Devis,
     ProposalWithPolygonAndValidation,
@@ -15,53 +17,89 @@ from app.proposal_object.schemas import (
     ProductWithPolygonAndValidation,
 )
 
+from config.config import env_param
+
 from config.logger_config import logger
 
 
 class ProposalPolygonHandler:
     """Class to handle proposal polygons for visualization."""
 
-    def __init__(self, proposal_object: Devis, analyze_result: AnalyzeResult) -> None:
+    def __init__(
+        self,
+        proposal_object: Devis,
+        analyze_result: AnalyzeResult,
+        exhaustive: bool = env_param.POLYGON_EXHAUSTIVE_MATCHING,
+        top_k: int = env_param.POLYGON_CANDIDATES_TOP_K,
+    ) -> None:
+        """Initialize the handler, the OCR lines are indexed on the first match.
+
+        Args:
+            proposal_object (Devis): The structured proposal.
+            analyze_result (AnalyzeResult): The OCR result of the proposal.
+            exhaustive (bool): Compare each product with every line instead of the trigram candidates.
+            top_k (int): Number of candidate lines compared with each product.
+        """
+
         self.proposal_object: Devis = proposal_object
 
         self.analyze_result: AnalyzeResult = analyze_result
 
+        self.exhaustive: bool = exhaustive
+
+        self.top_k: int = top_k
+
+        self.known_polygons: Dict[str, Tuple[List[float], int]] = {}
+
+    @cached_property
+    def line_index(self) -> PolygonLineIndex:
+        """Index of the OCR lines of the document."""
+
+        return PolygonLineIndex(
+            analyze_result=self.analyze_result, normalize=self._normalize
+        )
+
     @staticmethod
     def _normalize(text: str) -> str:
         """Normalize a string by removing non-alphanumeric characters and converting to lowercase."""
 
         return "".join(ch for ch in text.lower() if ch.isalnum())
 
-    @staticmethod
-    def _similarity(a: str, b: str) -> float:
-        """Calculate the similarity ratio between two strings."""
-
-        return SequenceMatcher(None, a, b).ratio()
-
     def _best_matching_line_polygon(self, norm_label: str) -> Tuple[List[float], int]:
         """Find the best matching line polygon for a normalized label."""
 
-        best_score = 0.0
+        if norm_label in self.known_polygons:
+            return self.known_polygons[norm_label]
+
+        positions: Iterable[int] = range(len(self.line_index))
 
-        best_polygon: List[float] = []
+        if not self.exhaustive:
+            candidates = self.line_index.candidates(norm_label, top_k=self.top_k)
 
-        page_associated: int = 0
+            if candidates:
+                positions = candidates
 
-        for page in self.analyze_result.pages or []:
-            for line in page.lines or []:
-                if not line.polygon:
-                    continue
+        return self.line_index.best_match(norm_label, positions)
 
-                score = self._similarity(norm_label, self._normalize(line.content))
+    def _product_key(self, produit: Produit) -> str:
+        """Normalized text of a product matched against the OCR lines."""
 
-                if score > best_score:
-                    best_score = score
+        return self._normalize(produit.label) + self._normalize(produit.description)
 
-                    best_polygon = line.polygon
+    def remember_polygons(
+        self, products: List[ProductWithPolygonAndValidation]
+    ) -> None:
+        """Keep the polygons already matched for products and their sub-products, so
+        an unchanged product is not matched again."""
 
-                    page_associated = page.page_number
+        for product in products:
+            if product.polygon:
+                self.known_polygons[self._product_key(product)] = (
+                    product.polygon,
+                    product.page,
+                )
 
-        return best_polygon, page_associated
+            self.remember_polygons(products=product.sous_produits or [])
 
     def add_polygon_to_product(
         self, produit: Produit
@@ -69,7 +107,7 @@ class ProposalPolygonHandler:
         """Create a ProductWithPolygonAndValidation from a Produit, adding the best matching polygon."""
 
         polygon, page_associated = self._best_matching_line_polygon(
-            self._normalize(produit.label) + self._normalize(produit.description)
+            self._product_key(produit)
         )
 
         sous_prods_with_poly: List[ProductWithPolygonAndValidation] = []
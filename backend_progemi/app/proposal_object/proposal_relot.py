@@ -0,0 +1,182 @@
+"""Re-assignment of the lots of an extracted proposal to a new pack set."""
+
+import json
+
+from typing import Dict, List, Optional, Type
+
+from app.cost.cost import CostTracker
+
+from app.llm.llm_cache import cached_parse
+
+from app.proposal_object.devis_model_factory import devis_model_factory
+
+from app.proposal_object.schemas import (
+    LotAssignments,
+    ProductWithPolygonAndValidation,
+    ProposalWithPolygonAndValidation,
+)
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+PROPOSAL_RELOT_SYSTEM_PROMPT = (
+    "Vous êtes un expert du bâtiment. "
+    "Vous recevez la liste des produits d'un devis, chacun avec son index, son label et sa description. "
+    "Attribuez à chaque produit le lot du chantier auquel il appartient, parmi les lots autorisés par le schéma de réponse. "
+    "Répondez avec exactement un élément par produit, en reprenant son index."
+)
+
+
+class ProposalRelot:
+    """Assign the products of an extracted proposal to the lots of new packs.
+
+    Only the labels and descriptions of the products are sent to a small model,
+    whose answer is constrained to the lot Enum of the packs. The amounts,
+    polygons and validation of the proposal are left untouched.
+    """
+
+    def __init__(
+        self,
+        packs: List[str],
+        cost_tracker: CostTracker,
+        use_cache: bool = True,
+    ) -> None:
+        """Initialize the relot with the sorted pack names to assign."""
+
+        self.packs: List[str] = packs
+
+        self.cost_tracker: CostTracker = cost_tracker
+
+        self.use_cache: bool = use_cache
+
+        self.model: str = env_param.GPT_4_1_MINI
+
+        self.max_products_per_call: int = env_param.RELOT_MAX_PRODUCTS_PER_CALL
+
+    @staticmethod
+    def flatten_products(
+        products: List[ProductWithPolygonAndValidation],
+    ) -> List[ProductWithPolygonAndValidation]:
+        """List the products and their nested sub-products, depth first."""
+
+        flat_products: List[ProductWithPolygonAndValidation] = []
+
+        for product in products:
+            flat_products.append(product)
+
+            flat_products.extend(
+                ProposalRelot.flatten_products(products=product.sous_produits or [])
+            )
+
+        return flat_products
+
+    async def assign_lots(
+        self, products: List[ProductWithPolygonAndValidation], offset: int
+    ) -> Dict[int, str]:
+        """Ask the model the lot of a batch of products.
+
+        Args:
+            products (List[ProductWithPolygonAndValidation]): The batch of products.
+            offset (int): The index of the first product of the batch.
+
+        Returns:
+            Dict[int, str]: The lot of each product index the model answered for.
+        """
+
+        response_format: Type[LotAssignments] = (
+            devis_model_factory.get_lot_assignment_model(packs=self.packs)
+        )
+
+        products_labels = [
+            {
+                "index": offset + i,
+                "label": product.label,
+                "description": product.description,
+            }
+            for i, product in enumerate(products)
+        ]
+
+        assignments: Optional[LotAssignments] = await cached_parse(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": PROPOSAL_RELOT_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": json.dumps(products_labels, ensure_ascii=False),
+                },
+            ],
+            store=False,
+            response_format=response_format,
+            temperature=0.0,
+            cost_tracker=self.cost_tracker,
+            function_name="proposal_relot",
+            use_cache=self.use_cache,
+        )
+
+        if assignments is None:
+            logger.warning(
+                "PROPOSAL RELOT => No lots assigned to products %d to %d.",
+                offset,
+                offset + len(products) - 1,
+            )
+
+            return {}
+
+        return {
+            assignment.index: assignment.lot.value
+            for assignment in assignments.lots
+            if offset <= assignment.index < offset + len(products)
+        }
+
+    async def relot(self, proposal_object: ProposalWithPolygonAndValidation) -> int:
+        """Patch the `lot` of every product of a proposal in place.
+
+        A proposal with a single pack is assigned locally, without any call. A
+        product the model did not answer for keeps its lot.
+
+        Args:
+            proposal_object (ProposalWithPolygonAndValidation): The extracted proposal.
+
+        Returns:
+            int: The number of products whose lot changed.
+        """
+
+        products = self.flatten_products(products=proposal_object.devis_produits)
+
+        if not products:
+            return 0
+
+        if len(self.packs) == 1:
+            lots: Dict[int, str] = {i: self.packs[0] for i in range(len(products))}
+
+        else:
+            lots = {}
+
+            for offset in range(0, len(products), self.max_products_per_call):
+                lots.update(
+                    await self.assign_lots(
+                        products=products[offset : offset + self.max_products_per_call],
+                        offset=offset,
+                    )
+                )
+
+        nb_changed = 0
+
+        for i, product in enumerate(products):
+            lot = lots.get(i)
+
+            if lot is None or lot == product.lot:
+                continue
+
+            product.lot = lot
+
+            nb_changed += 1
+
+        if len(lots) < len(products):
+            logger.warning(
+                "PROPOSAL RELOT => %d products kept their lot, no answer for them.",
+                len(products) - len(lots),
+            )
+
+        return nb_changed
@@ -0,0 +1,435 @@
+"""Rule-based repair of the arithmetic errors of a proposal, before any LLM retry."""
+
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.proposal_object.product_tree import ROOT_PATH, ProductPath, ProductTree
+
+from app.proposal_object.proposal_validate_results import (
+    EPSILON,
+    TVA_RATES,
+    IncoherenceKind,
+    Totals,
+    ValidateProposalObject,
+    ValidationError,
+    ValidationReport,
+)
+
+from app.proposal_object.schemas import (
+    ProductWithPolygonAndValidation,
+    ProposalWithPolygonAndValidation,
+)
+
+from config.logger_config import logger
+
+DECIMALS = 4
+
+ProductCandidate = Tuple[str, ProductWithPolygonAndValidation]
+
+ProposalCandidate = Tuple[str, ProposalWithPolygonAndValidation]
+
+
+class RepairFix(BaseModel):
+    """Fix applied to a proposal to clear a validation error."""
+
+    path: str
+
+    kind: IncoherenceKind
+
+    description: str
+
+
+class ProposalRepair:
+    """Fix the arithmetic errors of a proposal with deterministic rules.
+
+    Each rule proposes candidate fixes for an error. A product candidate is checked
+    by validating its subtree only, a candidate on the totals by validating the
+    proposal once. A candidate is kept if it clears its error and lowers the number
+    of errors, the errors left are for the LLM retry.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the repair with the proposal validator."""
+
+        self.validator = ValidateProposalObject()
+
+    @staticmethod
+    def is_close(a: float, b: float) -> bool:
+        """Compare two amounts with the validation tolerance."""
+
+        return abs(a - b) <= EPSILON
+
+    @staticmethod
+    def line_ht(product: ProductWithPolygonAndValidation) -> float:
+        """HT amount of a product line, as computed by the validation."""
+
+        return round(product.price_unitaire_ht * product.quantite, 2)
+
+    def container_candidates(
+        self, product: ProductWithPolygonAndValidation, children: Totals
+    ) -> List[ProductCandidate]:
+        """Propose fixes of the declared amount of a container.
+
+        - the container total was read as its unit price;
+        - the container total was read with taxes.
+        """
+
+        candidates: List[ProductCandidate] = []
+
+        quantite = product.quantite
+
+        if quantite not in (0, 1) and self.is_close(
+            product.price_unitaire_ht, children.ht
+        ):
+            price = round(product.price_unitaire_ht / quantite, DECIMALS)
+
+            candidates.append(
+                (
+                    f"Total de « {product.label} » lu comme prix unitaire : "
+                    f"PU {product.price_unitaire_ht} → {price}",
+                    product.model_copy(update={"price_unitaire_ht": price}, deep=True),
+                )
+            )
+
+        if quantite and self.is_close(
+            self.line_ht(product), round(children.ht + children.tva, 2)
+        ):
+            price = round(children.ht / quantite, DECIMALS)
+
+            candidates.append(
+                (
+                    f"Total TTC de « {product.label} » lu comme HT : "
+                    f"PU {product.price_unitaire_ht} → {price}",
+                    product.model_copy(update={"price_unitaire_ht": price}, deep=True),
+                )
+            )
+
+        return candidates
+
+    def child_candidates(
+        self, product: ProductWithPolygonAndValidation
+    ) -> List[ProductCandidate]:
+        """Propose fixes of the line amount of a child of a container.
+
+        - the line total was read as the quantity;
+        - the line total was read as the unit price.
+        """
+
+        candidates: List[ProductCandidate] = []
+
+        for index, child in enumerate(product.sous_produits or []):
+            if child.sous_produits:
+                continue
+
+            updates: List[Tuple[str, Dict[str, float]]] = []
+
+            if child.price_unitaire_ht not in (0, 1) and child.quantite:
+                quantite = round(child.quantite / child.price_unitaire_ht, DECIMALS)
+
+                updates.append(
+                    (
+                        f"Total de « {child.label} » lu comme quantité : "
+                        f"quantité {child.quantite} → {quantite}",
+                        {"quantite": quantite},
+                    )
+                )
+
+            if child.quantite not in (0, 1):
+                price = round(child.price_unitaire_ht / child.quantite, DECIMALS)
+
+                updates.append(
+                    (
+                        f"Total de « {child.label} » lu comme prix unitaire : "
+                        f"PU {child.price_unitaire_ht} → {price}",
+                        {"price_unitaire_ht": price},
+                    )
+                )
+
+            for description, update in updates:
+                new_product = product.model_copy(deep=True)
+
+                new_product.sous_produits[index] = child.model_copy(
+                    update=update, deep=True
+                )
+
+                candidates.append((description, new_product))
+
+        return candidates
+
+    def clears(
+        self,
+        product: ProductWithPolygonAndValidation,
+        prefix: str,
+        error: ValidationError,
+        nb_errors: int,
+    ) -> bool:
+        """Check on its subtree that a product candidate clears an error."""
+
+        _, _, errors = self.validator.validate_product(product, path=prefix)
+
+        return len(errors) < nb_errors and all(e.path != error.path for e in errors)
+
+    def repair_product(
+        self,
+        product_tree: ProductTree,
+        product_path: ProductPath,
+        error: ValidationError,
+    ) -> Optional[RepairFix]:
+        """Fix the amounts of a container whose children do not sum up.
+
+        A container fix is kept as soon as it clears the error. A fix of one of its
+        children is kept only if it is the only one clearing the error.
+        """
+
+        product = product_tree.get(product_path=product_path)
+
+        prefix = product_tree.get_path_prefix(product_path=product_path)
+
+        _, _, errors = self.validator.validate_product(product, path=prefix)
+
+        if all(e.path != error.path for e in errors):
+            return None
+
+        children = Totals()
+
+        for child in product.sous_produits or []:
+            child_totals, _, _ = self.validator.validate_product(child)
+
+            children += child_totals
+
+        children.round()
+
+        for description, candidate in self.container_candidates(
+            product=product, children=children
+        ):
+            if self.clears(candidate, prefix, error, nb_errors=len(errors)):
+                product_tree.set(product_path=product_path, product=candidate)
+
+                return RepairFix(
+                    path=error.path, kind=error.kind, description=description
+                )
+
+        clearing = [
+            (description, candidate)
+            for description, candidate in self.child_candidates(product=product)
+            if self.clears(candidate, prefix, error, nb_errors=len(errors))
+        ]
+
+        if len(clearing) != 1:
+            return None
+
+        description, candidate = clearing[0]
+
+        product_tree.set(product_path=product_path, product=candidate)
+
+        return RepairFix(path=error.path, kind=error.kind, description=description)
+
+    def extra_cost_candidates(
+        self, proposal: ProposalWithPolygonAndValidation, report: ValidationReport
+    ) -> List[ProposalCandidate]:
+        """Propose fixes of an additional cost counted twice.
+
+        - on a container and on its sub-products;
+        - in the declared total of the proposal.
+        """
+
+        candidates: List[ProposalCandidate] = []
+
+        new_proposal = proposal.model_copy(deep=True)
+
+        product_tree = ProductTree(proposal=new_proposal)
+
+        labels: List[str] = []
+
+        for product_paths in product_tree.get_product_paths().values():
+            for product_path in product_paths:
+                product = product_tree.get(product_path=product_path)
+
+                if not product.sous_produits or not product.eco_participation:
+                    continue
+
+                children_extra = sum(
+                    self.validator.validate_product(child)[1]
+                    for child in product.sous_produits
+                )
+
+                if self.is_close(product.eco_participation, children_extra):
+                    product.eco_participation = None
+
+                    labels.append(product.label)
+
+        if labels:
+            candidates.append(
+                (
+                    "Éco-participation comptée sur les conteneurs et leurs sous-produits : "
+                    + ", ".join(f"« {label} »" for label in labels),
+                    new_proposal,
+                )
+            )
+
+        computed_extra = report.computed_total_cout_additionnel
+
+        if computed_extra and self.is_close(
+            proposal.devis_eco_participation or 0.0, 2 * computed_extra
+        ):
+            candidates.append(
+                (
+                    "Éco-participation du devis comptée deux fois : "
+                    f"{proposal.devis_eco_participation} → {computed_extra}",
+                    proposal.model_copy(
+                        update={"devis_eco_participation": computed_extra}, deep=True
+                    ),
+                )
+            )
+
+        return candidates
+
+    def tva_candidates(
+        self, proposal: ProposalWithPolygonAndValidation, report: ValidationReport
+    ) -> List[ProposalCandidate]:
+        """Propose fixes of the VAT rates of the product lines.
+
+        - the rate of a single line, if exactly one line and rate explain the gap;
+        - the rate of every line, if exactly one rate gives the declared VAT.
+        """
+
+        candidates: List[ProposalCandidate] = []
+
+        product_tree = ProductTree(proposal=proposal)
+
+        leaf_paths = product_tree.get_leaf_paths()
+
+        leaves = [product_tree.get(product_path=path) for path in leaf_paths]
+
+        gap = proposal.devis_total_tva - report.computed_total_tva
+
+        single_fixes = [
+            (leaf_path, leaf, tva)
+            for leaf_path, leaf in zip(leaf_paths, leaves)
+            for tva, rate in TVA_RATES.items()
+            if tva != leaf.tva
+            and self.is_close(
+                round(self.line_ht(leaf) * rate, 2)
+                - round(self.line_ht(leaf) * TVA_RATES[leaf.tva], 2),
+                gap,
+            )
+        ]
+
+        if len(single_fixes) == 1:
+            leaf_path, leaf, tva = single_fixes[0]
+
+            new_proposal = proposal.model_copy(deep=True)
+
+            ProductTree(proposal=new_proposal).get(product_path=leaf_path).tva = tva
+
+            candidates.append(
+                (
+                    f"TVA de « {leaf.label} » : {leaf.tva.value} → {tva.value}",
+                    new_proposal,
+                )
+            )
+
+        uniform_rates = [
+            tva
+            for tva, rate in TVA_RATES.items()
+            if self.is_close(
+                sum(round(self.line_ht(leaf) * rate, 2) for leaf in leaves),
+                proposal.devis_total_tva,
+            )
+        ]
+
+        if len(uniform_rates) == 1 and any(
+            leaf.tva != uniform_rates[0] for leaf in leaves
+        ):
+            new_proposal = proposal.model_copy(deep=True)
+
+            new_product_tree = ProductTree(proposal=new_proposal)
+
+            for leaf_path in leaf_paths:
+                new_product_tree.get(product_path=leaf_path).tva = uniform_rates[0]
+
+            candidates.append(
+                (
+                    f"TVA de toutes les lignes : {uniform_rates[0].value}",
+                    new_proposal,
+                )
+            )
+
+        return candidates
+
+    def repair(
+        self,
+        proposal: ProposalWithPolygonAndValidation,
+        validation_report: ValidationReport,
+    ) -> Tuple[ProposalWithPolygonAndValidation, ValidationReport, List[RepairFix]]:
+        """Repair the errors of a validated proposal.
+
+        Args:
+            proposal (ProposalWithPolygonAndValidation): The validated proposal.
+            validation_report (ValidationReport): Its validation report.
+
+        Returns:
+            Tuple[ProposalWithPolygonAndValidation, ValidationReport, List[RepairFix]]:
+                The repaired proposal, its validation report and the fixes applied,
+                the given proposal and report if nothing was fixed.
+        """
+
+        fixes: List[RepairFix] = []
+
+        repaired = proposal.model_copy(deep=True)
+
+        product_tree = ProductTree(proposal=repaired)
+
+        product_paths = product_tree.get_product_paths()
+
+        for error in validation_report.errors:
+            if error.path == ROOT_PATH:
+                continue
+
+            for product_path in product_paths.get(error.path, []):
+                fix = self.repair_product(
+                    product_tree=product_tree, product_path=product_path, error=error
+                )
+
+                if fix:
+                    fixes.append(fix)
+
+        repaired, report = self.validator.validate_proposal_object(repaired)
+
+        for kind, get_candidates in (
+            (IncoherenceKind.TOTAL_EXTRA_COST_MISMATCH, self.extra_cost_candidates),
+            (IncoherenceKind.TOTAL_TVA_MISMATCH, self.tva_candidates),
+        ):
+            if all(error.kind != kind for error in report.errors):
+                continue
+
+            for description, candidate in get_candidates(repaired, report):
+                candidate, candidate_report = self.validator.validate_proposal_object(
+                    candidate
+                )
+
+                if len(candidate_report.errors) < len(report.errors) and all(
+                    error.kind != kind for error in candidate_report.errors
+                ):
+                    repaired, report = candidate, candidate_report
+
+                    fixes.append(
+                        RepairFix(path=ROOT_PATH, kind=kind, description=description)
+                    )
+
+                    break
+
+        if not fixes or len(report.errors) >= len(validation_report.errors):
+            return proposal, validation_report, []
+
+        report.logs.extend(f"🔧 {fix.description}" for fix in fixes)
+
+        logger.info(
+            "PROPOSAL REPAIR => %d fixes applied, %d errors left: %s",
+            len(fixes),
+            len(report.errors),
+            [fix.description for fix in fixes],
+        )
+
+        return repaired, report, fixes
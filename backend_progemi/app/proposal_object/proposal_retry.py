@@ -1,35 +1,75 @@
 """Retry to generate a proposal object if the first attempt fails."""
 
-from typing import Optional
+import asyncio
 
-from openai import AsyncOpenAI
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
 
 from app.cost.cost import CostTracker
 
+from app.llm.llm_cache import cached_parse
+
+from app.proposal_object.proposal_messages import build_proposal_messages
+
 from app.proposal_object.proposal_validate_results import (
+    ValidationError,
     ValidationReport,
 )
 
-from app.proposal_object.schemas import Devis, ProposalWithPolygonAndValidation
+from app.proposal_object.proposal_relot import ProposalRelot
+
+from app.proposal_object.product_tree import ROOT_PATH, ProductPath, ProductTree
+
+from app.proposal_object.schemas import (
+    Devis,
+    ProductWithPolygonAndValidation,
+    ProposalWithPolygonAndValidation,
+    Produit,
+)
 
 from config.config import env_param
 
+from config.logger_config import logger
+
 RETRY_PROMPT = """Regénérez la structure du devis en corrigeant les erreurs de structure suivantes :
 {full_errors_str}
 Assurez-vous que la structure du devis respecte le format attendu et que les totaux HT, TVA et TTC sont corrects."""
 
+SUBTREE_RETRY_PROMPT = """Regénérez un produit du devis et ses sous-produits en corrigeant les erreurs de structure suivantes :
+{errors_str}
+Le HT déclaré du produit doit être égal à la somme du HT de ses sous-produits. Ne régénérez que ce produit, conservez son lot et n'inventez aucune ligne."""
+
+MAX_LABEL_CHARS = 30
+
+
+class ProduitCorrige(BaseModel):
+    """Produit du devis corrigé, avec ses sous-produits."""
+
+    produit: Produit = Field(..., description="Produit corrigé avec ses sous-produits")
+
 
 class ProposalRetry:
     """Class to retry proposal object creation."""
 
-    def __init__(self, cost_tracker: CostTracker) -> None:
-        """Initialize the ProposalRetry with a cost tracker."""
+    def __init__(
+        self,
+        cost_tracker: CostTracker,
+        file_base64: str,
+        use_cache: bool = True,
+        model: str = env_param.GPT_4_1,
+    ) -> None:
+        """Initialize the ProposalRetry with a cost tracker and the proposal PDF."""
 
         self.cost_tracker: CostTracker = cost_tracker
 
-        self.model: str = "gpt-4.1"
+        self.file_base64: str = file_base64
 
-        self.client: AsyncOpenAI = AsyncOpenAI(api_key=env_param.OPENAI_API_KEY)
+        self.use_cache: bool = use_cache
+
+        self.model: str = model
+
+        self.context_lines: int = env_param.RETRY_CONTEXT_LINES
 
     def get_full_errors_str(self, validation_report: ValidationReport) -> str:
         """Get a string representation of the full errors in the validation report.
@@ -48,7 +88,6 @@ class ProposalRetry:
     def create_proposal_context(
         self,
         proposal: ProposalWithPolygonAndValidation,
-        proposal_str: str,
         full_errors_str: str,
     ) -> str:
         """Create a context for proposal object creation.
@@ -61,9 +100,7 @@ class ProposalRetry:
             indent=1, exclude_none=True, exclude={"polygon"}
         )
 
-        context_wrong = f"""# Voici le devis original : {proposal_str}
-
-        # Voici le devis avec les erreurs de structure :
+        context_wrong = f"""# Voici le devis avec les erreurs de structure :
         {wrong_structure}
 
         # Voici les erreurs de structure du devis :
@@ -92,12 +129,172 @@ class ProposalRetry:
         full_errors_str = self.get_full_errors_str(proposal_validation)
 
         context_wrong = self.create_proposal_context(
-            proposal=proposal_object,
-            proposal_str=proposal_str,
-            full_errors_str=full_errors_str,
+            proposal=proposal_object, full_errors_str=full_errors_str
         )
 
-        completion = await self.client.chat.completions.parse(
+        new_proposal_object: Optional[Devis] = await cached_parse(
+            model=self.model,
+            messages=build_proposal_messages(
+                file_base64=self.file_base64,
+                proposal_str=proposal_str,
+                instructions=RETRY_PROMPT.format(full_errors_str=full_errors_str),
+                context=context_wrong,
+            ),
+            tools=[],
+            store=False,
+            response_format=Devis,
+            temperature=0.0,
+            cost_tracker=self.cost_tracker,
+            function_name="proposal_retry",
+            use_cache=self.use_cache,
+        )
+
+        return new_proposal_object
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize a string by removing non-alphanumeric characters and converting to lowercase."""
+
+        return "".join(ch for ch in text.lower() if ch.isalnum())
+
+    def locate_errors(
+        self,
+        proposal: ProposalWithPolygonAndValidation,
+        validation_report: ValidationReport,
+    ) -> Optional[Dict[ProductPath, List[ValidationError]]]:
+        """Group the product errors by the outermost subtree containing them.
+
+        Errors on the proposal totals are left out, they usually follow from the
+        product errors and are checked again once the subtrees are fixed.
+
+        Returns:
+            Optional[Dict[ProductPath, List[ValidationError]]]: The errors of each
+                subtree to regenerate, None if there is no product error or if one
+                cannot be located.
+        """
+
+        product_errors = [
+            error for error in validation_report.errors if error.path != ROOT_PATH
+        ]
+
+        if not product_errors:
+            return None
+
+        product_paths = ProductTree(proposal=proposal).get_product_paths()
+
+        located: List[Tuple[ProductPath, ValidationError]] = []
+
+        for error in product_errors:
+            if error.path not in product_paths:
+                logger.warning(
+                    "PROPOSAL RETRY => Product %s of the error not found.", error.path
+                )
+
+                return None
+
+            located.extend((position, error) for position in product_paths[error.path])
+
+        subtrees: Dict[ProductPath, List[ValidationError]] = {}
+
+        for product_path, error in sorted(located, key=lambda item: len(item[0])):
+            subtree_path = next(
+                (path for path in subtrees if product_path[: len(path)] == path),
+                product_path,
+            )
+
+            subtree_errors = subtrees.setdefault(subtree_path, [])
+
+            if error not in subtree_errors:
+                subtree_errors.append(error)
+
+        return subtrees
+
+    def get_text_slice(
+        self, proposal_str: str, product: ProductWithPolygonAndValidation
+    ) -> str:
+        """Get the lines of the proposal text spanning a product and its sub-products.
+
+        The slice starts at the first line containing the product label and ends at
+        the last line containing one of its sub-products labels, with
+        `context_lines` lines around. The whole text is returned if the product
+        label is not found.
+        """
+
+        lines = proposal_str.splitlines()
+
+        norm_lines = [self.normalize(line) for line in lines]
+
+        def find_line(label: str, start: int) -> Optional[int]:
+            norm_label = self.normalize(label)[:MAX_LABEL_CHARS]
+
+            if not norm_label:
+                return None
+
+            return next(
+                (i for i in range(start, len(lines)) if norm_label in norm_lines[i]),
+                None,
+            )
+
+        first_line = find_line(label=product.label, start=0)
+
+        if first_line is None:
+            logger.warning(
+                "PROPOSAL RETRY => Product %s not found in the text, sending the whole text.",
+                product.label,
+            )
+
+            return proposal_str
+
+        last_line = first_line
+
+        children = ProposalRelot.flatten_products(products=product.sous_produits or [])
+
+        for child in children:
+            child_line = find_line(label=child.label, start=first_line)
+
+            if child_line is not None:
+                last_line = max(last_line, child_line)
+
+        start = max(first_line - self.context_lines, 0)
+
+        end = min(last_line + self.context_lines + 1, len(lines))
+
+        return "\n".join(lines[start:end])
+
+    async def retry_subtree(
+        self,
+        proposal_str: str,
+        product: ProductWithPolygonAndValidation,
+        errors: List[ValidationError],
+    ) -> Optional[Produit]:
+        """Regenerate a product and its sub-products from the matching slice of text.
+
+        Args:
+            proposal_str (str): The proposal string.
+            product (ProductWithPolygonAndValidation): The product to regenerate.
+            errors (List[ValidationError]): The errors found in the product subtree.
+
+        Returns:
+            Optional[Produit]: The regenerated product, None if the model did not answer.
+        """
+
+        errors_str = "\n".join(f"- {error}" for error in errors)
+
+        wrong_structure = Produit.model_validate(product.model_dump()).model_dump_json(
+            indent=1, exclude_none=True
+        )
+
+        text_slice = self.get_text_slice(proposal_str=proposal_str, product=product)
+
+        context_wrong = f"""# Voici l'extrait du devis original contenant le produit : {text_slice}
+
+        # Voici le produit avec les erreurs de structure :
+        {wrong_structure}
+
+        # Voici les erreurs de structure du produit :
+        {errors_str}"""
+
+        produit_corrige: Optional[ProduitCorrige] = await cached_parse(
             model=self.model,
             messages=[
                 {
@@ -105,9 +302,7 @@ class ProposalRetry:
                     "content": [
                         {
                             "type": "text",
-                            "text": RETRY_PROMPT.format(
-                                full_errors_str=full_errors_str
-                            ),
+                            "text": SUBTREE_RETRY_PROMPT.format(errors_str=errors_str),
                         }
                     ],
                 },
@@ -120,17 +315,56 @@ class ProposalRetry:
             ],
             tools=[],
             store=False,
-            response_format=Devis,
+            response_format=ProduitCorrige,
             temperature=0.0,
+            cost_tracker=self.cost_tracker,
+            function_name="proposal_subtree_retry",
+            use_cache=self.use_cache,
         )
 
-        new_proposal_object: Optional[Devis] = completion.choices[0].message.parsed
+        if produit_corrige is None:
+            logger.warning(
+                "PROPOSAL RETRY => Product %s could not be regenerated.", product.label
+            )
 
-        self.cost_tracker.add_openai_query(
-            model=self.model,
-            nb_input_token=completion.usage.prompt_tokens,
-            nb_output_token=completion.usage.completion_tokens,
-            function_name="proposal_section_analyzer",
+            return None
+
+        return produit_corrige.produit
+
+    async def retry_subtrees(
+        self,
+        proposal_str: str,
+        proposal_object: ProposalWithPolygonAndValidation,
+        subtrees: Dict[ProductPath, List[ValidationError]],
+    ) -> Dict[ProductPath, Produit]:
+        """Regenerate the subtrees with errors in parallel.
+
+        Args:
+            proposal_str (str): The proposal string.
+            proposal_object (ProposalWithPolygonAndValidation): The proposal object.
+            subtrees (Dict[ProductPath, List[ValidationError]]): The errors of each
+                subtree, as returned by `locate_errors`.
+
+        Returns:
+            Dict[ProductPath, Produit]: The regenerated product of each subtree, the
+                subtrees the model did not answer for are left out.
+        """
+
+        product_tree = ProductTree(proposal=proposal_object)
+
+        new_products = await asyncio.gather(
+            *(
+                self.retry_subtree(
+                    proposal_str=proposal_str,
+                    product=product_tree.get(product_path=product_path),
+                    errors=errors,
+                )
+                for product_path, errors in subtrees.items()
+            )
         )
 
-        return new_proposal_object
+        return {
+            product_path: new_product
+            for product_path, new_product in zip(subtrees, new_products)
+            if new_product is not None
+        }
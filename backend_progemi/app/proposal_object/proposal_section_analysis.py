@@ -2,12 +2,14 @@
 
 from typing import Optional, List
 
-from openai import AsyncOpenAI
-
 from pydantic import BaseModel, Field
 
 from app.cost.cost import CostTracker
 
+from app.llm.llm_cache import cached_parse
+
+from app.proposal_object.proposal_messages import build_proposal_messages
+
 from app.utils.utils import token_counter
 
 from config.logger_config import logger
@@ -15,8 +17,7 @@ from config.logger_config import logger
 from config.config import env_param
 
 PROPOSAL_SECTION_ANALYZER_SYSTEM_PROMPT = (
-    "Vous êtes le meilleur analyseur de devis du monde. "
-    "Vous devez analyser un devis au format markdown pour déterminer la structure des catégories de produits de celui-ci, c'est-à-dire les différentes sections et sous-sections des produits du devis. "
+    "Vous devez analyser le devis pour déterminer la structure des catégories de produits de celui-ci, c'est-à-dire les différentes sections et sous-sections des produits du devis. "
     "Vous devez vérifier que le prix total de la catégorie correspond bien au prix des produits listés dans la catégorie. Respectez la structure originale du devis, ne tentez pas de fusionner des lignes. "
     "Ne comptez pas les nouvelles pages comme une nouvelle section. "
     "Ne comptez les éco contributions, éco taxes, éco participations, etc. que si elles sont listées dans le devis. "
@@ -53,18 +54,23 @@ class ProposalSectionAnalysis:
     """Class to handle proposal section analysis."""
 
     def __init__(
-        self, proposal_str: str, cost_tracker: CostTracker, file_base64: str
+        self,
+        proposal_str: str,
+        cost_tracker: CostTracker,
+        file_base64: str,
+        use_cache: bool = True,
+        model: str = env_param.GPT_4_1,
     ) -> None:
         """Initialize with the path to the proposal."""
         self.proposal_str = proposal_str
 
+        self.use_cache = use_cache
+
         self.cost_tracker = cost_tracker
 
         self.file_base64 = file_base64
 
-        self.model = "gpt-4.1"
-
-        self.client = AsyncOpenAI(api_key=env_param.OPENAI_API_KEY)
+        self.model = model
 
     async def get_sections(self) -> Optional[StructureProduitsDevis]:
         """Get the structured sections of the proposal."""
@@ -76,47 +82,20 @@ class ProposalSectionAnalysis:
             token_counter(self.proposal_str),
         )
 
-        completion = await self.client.chat.completions.parse(
+        proposal_structure: Optional[StructureProduitsDevis] = await cached_parse(
             model=self.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": PROPOSAL_SECTION_ANALYZER_SYSTEM_PROMPT,
-                        }
-                    ],
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "file",
-                            "file": {
-                                "filename": "devis.pdf",
-                                "file_data": f"data:application/pdf;base64,{self.file_base64}",
-                            },
-                        },
-                        {"type": "text", "text": self.proposal_str},
-                    ],
-                },
-            ],
+            messages=build_proposal_messages(
+                file_base64=self.file_base64,
+                proposal_str=self.proposal_str,
+                instructions=PROPOSAL_SECTION_ANALYZER_SYSTEM_PROMPT,
+            ),
             tools=[],
             store=False,
             response_format=StructureProduitsDevis,
             temperature=0.0,
-        )
-
-        proposal_structure: Optional[StructureProduitsDevis] = completion.choices[
-            0
-        ].message.parsed
-
-        self.cost_tracker.add_openai_query(
-            model=self.model,
-            nb_input_token=completion.usage.prompt_tokens,
-            nb_output_token=completion.usage.completion_tokens,
+            cost_tracker=self.cost_tracker,
             function_name="proposal_section_analyzer",
+            use_cache=self.use_cache,
         )
 
         if not proposal_structure:
@@ -0,0 +1,136 @@
+"""Deliver the products of a proposal as soon as the structuring LLM writes them."""
+
+import json
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from azure.ai.documentintelligence.models import (
+    AnalyzeResult,
+)
+
+from pydantic import BaseModel, Field, ValidationError
+
+from app.proposal_object.proposal_polygone import ProposalPolygonHandler
+
+from app.proposal_object.schemas import (
+    Devis,
+    Produit,
+    ProductWithPolygonAndValidation,
+)
+
+from config.logger_config import logger
+
+
+class ProductEvent(BaseModel):
+    """Top-level product of a proposal, delivered while the structuring runs."""
+
+    index: int = Field(..., description="Index of the product in the proposal")
+
+    attempt: int = Field(
+        ...,
+        description="Structuring attempt of the product, the products of a previous "
+        "attempt are replaced when a larger model is used",
+    )
+
+    product: ProductWithPolygonAndValidation = Field(
+        ..., description="Product with its polygon, not validated yet"
+    )
+
+
+ProductCallback = Callable[[ProductEvent], Awaitable[None]]
+
+
+class ProductStreamer:
+    """Emit each top-level product of a streamed structuring once it is complete.
+
+    The partial JSON of the answer grows at each chunk: a product is complete once
+    the next one has started, the last one once the answer is complete. Each
+    product gets its polygon before being emitted, its validation is left to the
+    validation of the whole proposal.
+    """
+
+    def __init__(
+        self, on_product: ProductCallback, analyze_result: AnalyzeResult
+    ) -> None:
+        """Initialize the streamer with the callback and the OCR of the proposal."""
+
+        self.on_product: ProductCallback = on_product
+
+        self.polygon_handler = ProposalPolygonHandler(
+            proposal_object=Devis.model_construct(devis_produits=[]),
+            analyze_result=analyze_result,
+        )
+
+        self.products: List[Optional[ProductWithPolygonAndValidation]] = []
+
+        self.attempt: int = 0
+
+    def restart(self) -> None:
+        """Start a new structuring attempt, whose products replace the emitted ones."""
+
+        self.products = []
+
+        self.attempt += 1
+
+    async def emit(self, product: Dict[str, Any]) -> None:
+        """Add the polygon to a complete product and emit it."""
+
+        index = len(self.products)
+
+        try:
+            produit = Produit.model_validate(product)
+
+        except ValidationError as e:
+            logger.warning(
+                "PROPOSAL STREAM => Product %d of attempt %d not emitted: %s",
+                index,
+                self.attempt,
+                str(e),
+            )
+
+            produit = None
+
+        product_with_polygon: Optional[ProductWithPolygonAndValidation] = (
+            self.polygon_handler.add_polygon_to_product(produit) if produit else None
+        )
+
+        self.products.append(product_with_polygon)
+
+        if product_with_polygon:
+            await self.on_product(
+                ProductEvent(
+                    index=index, attempt=self.attempt, product=product_with_polygon
+                )
+            )
+
+    async def on_partial(self, partial: Dict[str, Any]) -> None:
+        """Emit the products of the partial answer followed by another product."""
+
+        products: List[Dict[str, Any]] = partial.get("devis_produits") or []
+
+        while len(self.products) < len(products) - 1:
+            await self.emit(product=products[len(self.products)])
+
+    async def finish(self, proposal_object: Optional[Devis]) -> None:
+        """Emit the products of the complete answer not emitted yet."""
+
+        if not proposal_object:
+            return
+
+        products = proposal_object.model_dump(mode="json")["devis_produits"]
+
+        while len(self.products) < len(products):
+            await self.emit(product=products[len(self.products)])
+
+    def remember_polygons(self, polygon_handler: ProposalPolygonHandler) -> None:
+        """Share the polygons matched for the emitted products with another handler."""
+
+        polygon_handler.remember_polygons(
+            products=[product for product in self.products if product]
+        )
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format an event of a `text/event-stream` response, with its data as JSON."""
+
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -2,20 +2,26 @@
 
 from typing import Optional, Type
 
-from openai import AsyncOpenAI
-
 from app.agent.agent import Agent
 
 from app.cost.cost import CostTracker
 
+from app.llm.llm_cache import cached_parse
+
+from app.llm.openai_gateway import PartialCallback
+
 from app.proposal_object.schemas import Devis
 
+from app.proposal_object.devis_model_factory import devis_model_factory
+
+from app.proposal_object.proposal_messages import build_proposal_messages
+
 from config.config import env_param
 
 from config.logger_config import logger
 
 PROPOSAL_ANALYZER_SYSTEM_PROMPT = (
-    "Vous êtes le meilleur analyseur de devis du monde. Vous devez reconstruire le devis à partir d'un texte brut. "
+    "Vous devez reconstruire la structure du devis à partir de son texte brut. "
     "Pour chaque produit du devis, vous devez très précisément noter son label, sa description, le lot auquel il appartient, son prix HT unitaire, la quantité, l'unité, la TVA et les possibles coûts supplémentaires. "
     "Les produits peuvent être groupés par catégories et ou contenir des sous-catégories de produits imbriquées. "
     "1 - Trouvez la structure exacte de chaque catégorie du devis. "
@@ -31,13 +37,18 @@ PROPOSAL_ANALYZER_SYSTEM_PROMPT = (
 class ProposalTextAnalyzer:
     """Proposal text analyzer"""
 
-    def __init__(self, cost_tracker: CostTracker, file_base64: str) -> None:
+    def __init__(
+        self,
+        cost_tracker: CostTracker,
+        file_base64: str,
+        use_cache: bool = True,
+        model: str = env_param.GPT_4_1,
+    ) -> None:
         """Initialize the proposal analyzer with the OpenAI API key and model."""
 
-        self.model = "gpt-4.1"
+        self.model = model
 
         self.agent: Agent = Agent(
-            api_key=env_param.OPENAI_API_KEY,
             model_name=self.model,
             system_promt=PROPOSAL_ANALYZER_SYSTEM_PROMPT,
             nb_retry=2,
@@ -48,66 +59,41 @@ class ProposalTextAnalyzer:
             reasoning_effort="high",
         )
 
-        self.client = AsyncOpenAI(api_key=env_param.OPENAI_API_KEY)
-
         self.cost_tracker: CostTracker = cost_tracker
 
         self.file_base64: str = file_base64
 
+        self.use_cache: bool = use_cache
+
     async def structure_proposal(
-        self, raw_proposal: str, section_analysis: str, devis_model: Type[Devis]
+        self,
+        raw_proposal: str,
+        section_analysis: str,
+        devis_model: Type[Devis],
+        on_partial: Optional[PartialCallback] = None,
     ) -> Optional[Devis]:
-        """Check if the client is spam"""
+        """Structure the proposal, streaming the partial answer to `on_partial`."""
 
-        completion = await self.client.chat.completions.parse(
+        proposal_structured: Optional[Devis] = await cached_parse(
             model=self.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": PROPOSAL_ANALYZER_SYSTEM_PROMPT.format(
-                                proposal_schemas=devis_model.model_json_schema()
-                            ),
-                        }
-                    ],
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "file",
-                            "file": {
-                                "filename": "devis.pdf",
-                                "file_data": f"data:application/pdf;base64,{self.file_base64}",
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": "# Voici une première analyse de la structure du devis :\n\n"
-                            + section_analysis
-                            + "\n\n# Voici le texte brut du devis :\n\n"
-                            + raw_proposal,
-                        },
-                    ],
-                },
-            ],
+            messages=build_proposal_messages(
+                file_base64=self.file_base64,
+                proposal_str=raw_proposal,
+                instructions=PROPOSAL_ANALYZER_SYSTEM_PROMPT.format(
+                    proposal_schemas=devis_model_factory.get_json_schema(devis_model)
+                ),
+                context="# Voici une première analyse de la structure du devis :\n\n"
+                + section_analysis,
+            ),
             tools=[],
             store=False,
             response_format=devis_model,
             temperature=0.0,
-        )
-
-        proposal_structured: Optional[devis_model] = completion.choices[
-            0
-        ].message.parsed
-
-        self.cost_tracker.add_openai_query(
-            model=self.model,
-            nb_input_token=completion.usage.prompt_tokens,
-            nb_output_token=completion.usage.completion_tokens,
-            function_name="proposal_section_analyzer",
+            cost_tracker=self.cost_tracker,
+            function_name="proposal_text_analyzer",
+            use_cache=self.use_cache,
+            hedge=True,
+            on_partial=on_partial,
         )
 
         if proposal_structured is None:
@@ -118,7 +104,11 @@ class ProposalTextAnalyzer:
         return proposal_structured
 
     async def analyze_and_structure(
-        self, raw_proposal: str, section_analysis: str, devis_model: Type[Devis]
+        self,
+        raw_proposal: str,
+        section_analysis: str,
+        devis_model: Type[Devis],
+        on_partial: Optional[PartialCallback] = None,
     ) -> Optional[Devis]:
         """Analyze and structure the proposal text."""
 
@@ -128,6 +118,7 @@ class ProposalTextAnalyzer:
             raw_proposal=raw_proposal,
             section_analysis=section_analysis,
             devis_model=devis_model,
+            on_partial=on_partial,
         )
 
         if structured_proposal is None:
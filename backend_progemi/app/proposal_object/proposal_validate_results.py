@@ -113,10 +113,6 @@ class ValidationReport(BaseModel):
 
     errors: List[ValidationError]
 
-    def __iter__(self):
-        """Iterate over the report items for easy access."""
-        yield from self.model_dump().items()
-
 
 class ValidateProposalObject:
     """Validate a proposal object (Devis) and return a validation report."""
@@ -209,6 +205,22 @@ class ValidateProposalObject:
 
         return devis, report
 
+    def validate_product(
+        self, prod: ProductWithPolygonAndValidation, path: str = ""
+    ) -> Tuple[Totals, float, List[ValidationError]]:
+        """Validate a product subtree alone and return its totals, additional cost
+        and errors, `path` being the validation path of its parent."""
+
+        logs: List[str] = []
+
+        errors: List[ValidationError] = []
+
+        totals, extra = self._validate_product(
+            prod, path=path, level=0, logs=logs, errors=errors
+        )
+
+        return totals, extra, errors
+
     def _validate_product(
         self,
         prod: ProductWithPolygonAndValidation,
@@ -79,6 +79,23 @@ class Devis(BaseModel):
     )
 
 
+class LotAssignment(BaseModel):
+    """Lot attribué à un produit du devis."""
+
+    index: int = Field(..., description="Index du produit dans la liste fournie")
+
+    lot: str = Field(..., description="Lot auquel appartient le produit")
+
+
+class LotAssignments(BaseModel):
+    """Lots attribués aux produits d'un devis."""
+
+    lots: List[LotAssignment] = Field(
+        ...,
+        description="Lot de chaque produit de la liste fournie, un élément par produit",
+    )
+
+
 class ProductWithPolygonAndValidation(Produit):
     """A product with an associated polygon and validation information."""
 
@@ -0,0 +1,150 @@
+"""Track the stages of the proposal processing pipeline."""
+
+from enum import Enum
+
+from datetime import datetime, timezone
+
+from contextlib import asynccontextmanager
+
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from pydantic import BaseModel, Field
+
+from config.logger_config import logger
+
+
+class ProposalStage(str, Enum):
+    """Stages of the proposal processing pipeline, in execution order."""
+
+    OCR = "ocr"
+
+    SECTIONS = "sections"
+
+    STRUCTURING = "structuring"
+
+    POLYGONS = "polygons"
+
+    VALIDATION = "validation"
+
+    RETRY = "retry"
+
+
+class StageStatus(str, Enum):
+    """Status of a pipeline stage."""
+
+    PENDING = "pending"
+
+    RUNNING = "running"
+
+    DONE = "done"
+
+    FAILED = "failed"
+
+    SKIPPED = "skipped"
+
+
+class StageInfo(BaseModel):
+    """Status and timestamps of a pipeline stage."""
+
+    stage: ProposalStage = Field(..., description="Stage of the pipeline")
+
+    status: StageStatus = Field(
+        default=StageStatus.PENDING,
+        description="Status of the stage",
+    )
+
+    started_at: Optional[datetime] = Field(
+        default=None,
+        description="Date when the stage started",
+    )
+
+    ended_at: Optional[datetime] = Field(
+        default=None,
+        description="Date when the stage ended",
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="Model whose output was kept, for the stages calling a LLM",
+    )
+
+    tier: Optional[int] = Field(
+        default=None,
+        description="Rank of this model in the stage cascade, 0 for the cheapest",
+    )
+
+
+StageCallback = Callable[[StageInfo], Awaitable[None]]
+
+
+class StageTracker:
+    """Record the status of each pipeline stage and notify an optional callback."""
+
+    def __init__(self, on_change: Optional[StageCallback] = None) -> None:
+        """Initialize all the stages as pending."""
+
+        self.stages: List[StageInfo] = [StageInfo(stage=stage) for stage in ProposalStage]
+
+        self.on_change: Optional[StageCallback] = on_change
+
+    def get_stage(self, stage: ProposalStage) -> StageInfo:
+        """Get the info of a stage."""
+
+        return next(info for info in self.stages if info.stage == stage)
+
+    async def set_status(self, stage: ProposalStage, status: StageStatus) -> None:
+        """Set the status of a stage and notify the callback."""
+
+        info = self.get_stage(stage)
+
+        info.status = status
+
+        now = datetime.now(timezone.utc)
+
+        if status == StageStatus.RUNNING:
+            info.started_at = now
+
+            info.ended_at = None
+
+            info.model = None
+
+            info.tier = None
+
+        elif status != StageStatus.PENDING:
+            info.ended_at = now
+
+        logger.debug("PIPELINE STAGES => %s : %s", stage.value, status.value)
+
+        if self.on_change:
+            await self.on_change(info)
+
+    def set_model(self, stage: ProposalStage, model: str, tier: int) -> None:
+        """Record the model whose output was kept by a running stage, notified with
+        the end of the stage."""
+
+        info = self.get_stage(stage)
+
+        info.model = model
+
+        info.tier = tier
+
+    async def skip(self, stage: ProposalStage) -> None:
+        """Mark a stage as skipped."""
+
+        await self.set_status(stage, StageStatus.SKIPPED)
+
+    @asynccontextmanager
+    async def track(self, stage: ProposalStage) -> AsyncIterator[None]:
+        """Mark a stage as running, then done or failed when the block exits."""
+
+        await self.set_status(stage, StageStatus.RUNNING)
+
+        try:
+            yield
+
+        except BaseException:
+            await self.set_status(stage, StageStatus.FAILED)
+
+            raise
+
+        await self.set_status(stage, StageStatus.DONE)
@@ -67,6 +67,20 @@ class ProposalNotFound(HTTPException):
         )
 
 
+class ProposalFileNotFound(HTTPException):
+    """Exception raised when a proposal file is not found in a project of the user."""
+
+    status_code = status.HTTP_404_NOT_FOUND
+
+    detail = "Proposal file {pdf_id} does not exist in project {project_name}"
+
+    def __init__(self, pdf_id: str, project_name: str) -> None:
+        super().__init__(
+            status_code=self.status_code,
+            detail=self.detail.format(pdf_id=pdf_id, project_name=project_name),
+        )
+
+
 class ProposalNotExtracted(HTTPException):
     """Exception raised when a proposal is not extracted."""
 
@@ -135,3 +149,18 @@ class PacksNameNotExists(HTTPException):
             status_code=self.status_code,
             detail=self.detail.format(pack_name=pack_name),
         )
+
+
+class RangeNotSatisfiable(HTTPException):
+    """Exception raised when a requested byte range is outside of a file."""
+
+    status_code = status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+    detail = "Range {range_header} is not satisfiable for a file of {file_size} bytes"
+
+    def __init__(self, range_header: str, file_size: int) -> None:
+        super().__init__(
+            status_code=self.status_code,
+            detail=self.detail.format(range_header=range_header, file_size=file_size),
+            headers={"Content-Range": f"bytes */{file_size}"},
+        )
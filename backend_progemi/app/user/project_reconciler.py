@@ -0,0 +1,247 @@
+"""Background synchronization of the local projects with the Progemi projects."""
+
+import time
+
+import asyncio
+
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from pymongo.errors import BulkWriteError
+
+from beanie.odm.bulk import BulkWriter
+
+from beanie.operators import In
+
+from app.auth.schemas import ConnectedUser
+
+from app.progemi_api.schemas import ProjectProgemi
+
+from app.progemi_api.progemi_api_handler import ProgemiAPIHandler
+
+from app.user.schemas import ProjectDocument, ProjectNameView, ProposalDocument
+
+from app.user.user_handler import UserHandler
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+
+class ActiveUser(BaseModel):
+    """User to keep in sync, with the credentials of its last request."""
+
+    connected_user: ConnectedUser
+
+    last_seen: float
+
+    last_synced: Optional[float] = None
+
+
+class ProjectReconciler:
+    """Reconcile the projects of the active users with Progemi, out of the request path.
+
+    A user is registered when a session token is issued to it, so at login and at
+    each session renewal, and when it lists its projects. It is synchronized then,
+    and every `interval_seconds` until it has not been registered again for
+    `active_user_ttl_seconds`.
+    """
+
+    def __init__(self, interval_seconds: int, active_user_ttl_seconds: int) -> None:
+        """Initialize the reconciler, the periodic loop is started with `start`."""
+
+        self.interval_seconds: int = interval_seconds
+
+        self.active_user_ttl_seconds: int = active_user_ttl_seconds
+
+        self.users: Dict[str, ActiveUser] = {}
+
+        self.running: Dict[str, asyncio.Task] = {}
+
+        self.loop_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the periodic synchronization loop."""
+
+        self.loop_task = asyncio.create_task(self._loop(), name="project_reconciler")
+
+        logger.debug("PROJECT RECONCILER => ✅ Started")
+
+    async def stop(self) -> None:
+        """Cancel the loop and the running synchronizations."""
+
+        tasks = list(self.running.values())
+
+        if self.loop_task:
+            tasks.append(self.loop_task)
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.loop_task = None
+
+        logger.debug("PROJECT RECONCILER => Stopped")
+
+    def schedule(self, connected_user: ConnectedUser) -> Optional[asyncio.Task]:
+        """Register a user as active and start its synchronization if it is due.
+
+        Returns:
+            Optional[asyncio.Task]: The running synchronization of the user, if any.
+        """
+
+        now = time.monotonic()
+
+        active_user = self.users.get(connected_user.user_id)
+
+        if active_user:
+            active_user.connected_user = connected_user
+
+            active_user.last_seen = now
+
+        else:
+            active_user = ActiveUser(connected_user=connected_user, last_seen=now)
+
+            self.users[connected_user.user_id] = active_user
+
+        return self._start_if_due(active_user=active_user)
+
+    def _start_if_due(self, active_user: ActiveUser) -> Optional[asyncio.Task]:
+        """Start the synchronization of a user if it never ran or is out of date."""
+
+        user_id = active_user.connected_user.user_id
+
+        is_due = (
+            active_user.last_synced is None
+            or time.monotonic() - active_user.last_synced >= self.interval_seconds
+        )
+
+        if is_due and user_id not in self.running:
+            task = asyncio.create_task(self._sync(active_user=active_user))
+
+            self.running[user_id] = task
+
+            task.add_done_callback(lambda _: self.running.pop(user_id, None))
+
+        return self.running.get(user_id)
+
+    async def ensure_synced(self, connected_user: ConnectedUser) -> None:
+        """Schedule the synchronization of a user, waiting for it only the first time."""
+
+        task = self.schedule(connected_user=connected_user)
+
+        if task and self.users[connected_user.user_id].last_synced is None:
+            await asyncio.shield(task)
+
+    async def reconcile(self, connected_user: ConnectedUser) -> Tuple[int, int]:
+        """Apply the difference between the Progemi and the local projects of a user.
+
+        New projects are inserted and removed projects deleted in a single bulk
+        write, then the proposals and files of the removed projects are deleted.
+
+        Returns:
+            Tuple[int, int]: The number of added and removed projects.
+        """
+
+        projects_progemi: List[ProjectProgemi] = (
+            await ProgemiAPIHandler().get_user_project(connected_user=connected_user)
+        )
+
+        progemi_names: List[str] = list(
+            dict.fromkeys(project.designationprojet for project in projects_progemi)
+        )
+
+        local_projects: List[ProjectNameView] = (
+            await ProjectDocument.find(ProjectDocument.user_id == connected_user.user_id)
+            .project(ProjectNameView)
+            .to_list()
+        )
+
+        local_names = {project.name for project in local_projects}
+
+        new_names = [name for name in progemi_names if name not in local_names]
+
+        removed_names = list(local_names.difference(progemi_names))
+
+        if not new_names and not removed_names:
+            return 0, 0
+
+        try:
+            async with BulkWriter(ordered=False, object_class=ProjectDocument) as bulk:
+                for name in new_names:
+                    await ProjectDocument.insert_one(
+                        ProjectDocument(
+                            user_id=connected_user.user_id,
+                            name=name,
+                            project_packs=[],
+                            is_pack_to_choose=True,
+                        ),
+                        bulk_writer=bulk,
+                    )
+
+                if removed_names:
+                    await ProjectDocument.find(
+                        ProjectDocument.user_id == connected_user.user_id,
+                        In(ProjectDocument.name, removed_names),
+                    ).delete(bulk_writer=bulk)
+
+        except BulkWriteError as e:
+            logger.warning(
+                "PROJECT RECONCILER => Some projects of user %s were already synchronized: %s",
+                connected_user.user_id,
+                str(e.details.get("writeErrors", [])),
+            )
+
+        if removed_names:
+            await UserHandler().delete_proposals(
+                ProposalDocument.user_id == connected_user.user_id,
+                In(ProposalDocument.project_name, removed_names),
+            )
+
+        logger.info(
+            "PROJECT RECONCILER => User %s: %d projects added, %d removed",
+            connected_user.user_id,
+            len(new_names),
+            len(removed_names),
+        )
+
+        return len(new_names), len(removed_names)
+
+    async def _sync(self, active_user: ActiveUser) -> None:
+        """Reconcile a user, a failure is logged and retried at the next interval."""
+
+        try:
+            await self.reconcile(connected_user=active_user.connected_user)
+
+        except Exception as e:
+            logger.error(
+                "PROJECT RECONCILER => Error synchronizing user %s: %s",
+                active_user.connected_user.user_id,
+                str(e),
+            )
+
+        active_user.last_synced = time.monotonic()
+
+    async def _loop(self) -> None:
+        """Synchronize the active users every interval, dropping the inactive ones."""
+
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+
+            now = time.monotonic()
+
+            for user_id, active_user in list(self.users.items()):
+                if now - active_user.last_seen > self.active_user_ttl_seconds:
+                    del self.users[user_id]
+
+                    continue
+
+                self._start_if_due(active_user=active_user)
+
+
+project_reconciler = ProjectReconciler(
+    interval_seconds=env_param.PROJECT_SYNC_INTERVAL_SECONDS,
+    active_user_ttl_seconds=env_param.PROJECT_SYNC_ACTIVE_USER_TTL_SECONDS,
+)
@@ -0,0 +1,84 @@
+"""Migration of the projects embedded in User documents to their own collections."""
+
+from beanie.operators import Set
+
+from app.user.schemas import Project, ProjectDocument, ProposalDocument, User
+
+from config.logger_config import logger
+
+
+class EmbeddedProjectsMigration:
+    """Move the projects embedded in `User.projects` to the user_projects and
+    user_proposals collections.
+
+    Projects and proposals are upserted, and the embedded list is emptied only once
+    all of them are copied, so an interrupted migration can safely be run again.
+    """
+
+    async def migrate_project(self, user_id: str, project: Project) -> None:
+        """Copy an embedded project and its proposals to their collections."""
+
+        await ProjectDocument.find_one(
+            ProjectDocument.user_id == user_id,
+            ProjectDocument.name == project.name,
+        ).update(
+            {
+                "$setOnInsert": ProjectDocument(
+                    user_id=user_id,
+                    name=project.name,
+                    project_packs=project.project_packs,
+                    is_pack_to_choose=project.is_pack_to_choose,
+                )
+            },
+            upsert=True,
+        )
+
+        for proposal in project.proposals:
+            await ProposalDocument.find_one(
+                ProposalDocument.user_id == user_id,
+                ProposalDocument.project_name == project.name,
+                ProposalDocument.title == proposal.title,
+                ProposalDocument.pdf_id == proposal.pdf_id,
+            ).update(
+                {
+                    "$setOnInsert": ProposalDocument(
+                        **proposal.model_dump(),
+                        user_id=user_id,
+                        project_name=project.name,
+                    )
+                },
+                upsert=True,
+            )
+
+    async def migrate_user(self, user: User) -> None:
+        """Copy the embedded projects of a user, then remove them from the user."""
+
+        for project in user.projects:
+            await self.migrate_project(user_id=user.user_id, project=project)
+
+        await User.find_one(User.id == user.id).update(Set({User.projects: []}))
+
+        logger.info(
+            "PROJECTS MIGRATION => %d projects of user %s migrated",
+            len(user.projects),
+            user.user_id,
+        )
+
+    async def run(self) -> int:
+        """Migrate every user still having embedded projects.
+
+        Returns:
+            int: The number of migrated users.
+        """
+
+        nb_users = 0
+
+        async for user in User.find({"projects.0": {"$exists": True}}):
+            await self.migrate_user(user=user)
+
+            nb_users += 1
+
+        if nb_users:
+            logger.info("PROJECTS MIGRATION => ✅ %d users migrated", nb_users)
+
+        return nb_users
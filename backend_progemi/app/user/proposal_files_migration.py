@@ -0,0 +1,51 @@
+"""Migration of the proposal files stored as documents to GridFS."""
+
+from app.user.proposal_storage import proposal_file_storage
+
+from app.user.schemas import ProposalDocument, ProposalFile
+
+from config.logger_config import logger
+
+
+class ProposalFilesMigration:
+    """Move the PDF files of the `proposals` collection to the GridFS bucket.
+
+    Each file keeps its ID, so the `pdf_id` of the proposals stays valid. A legacy
+    document is deleted only once its file is stored, so an interrupted migration
+    can safely be run again.
+    """
+
+    async def migrate_file(self, proposal_file: ProposalFile) -> None:
+        """Copy a legacy proposal file to GridFS, then delete its document."""
+
+        if not await proposal_file_storage.exists(file_id=proposal_file.id):
+            proposal = await ProposalDocument.find_one(
+                ProposalDocument.pdf_id == proposal_file.id
+            )
+
+            await proposal_file_storage.upload_bytes(
+                file_id=proposal_file.id,
+                filename=proposal.title if proposal else str(proposal_file.id),
+                content=bytes(proposal_file.pdf_content),
+            )
+
+        await proposal_file.delete()
+
+    async def run(self) -> int:
+        """Migrate every legacy proposal file.
+
+        Returns:
+            int: The number of migrated files.
+        """
+
+        nb_files = 0
+
+        async for proposal_file in ProposalFile.find_all():
+            await self.migrate_file(proposal_file=proposal_file)
+
+            nb_files += 1
+
+        if nb_files:
+            logger.info("PROPOSAL FILES MIGRATION => ✅ %d files migrated", nb_files)
+
+        return nb_files
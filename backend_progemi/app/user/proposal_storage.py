@@ -0,0 +1,403 @@
+"""GridFS storage of the proposal PDF files, read and written by chunks."""
+
+import re
+
+import hashlib
+
+from datetime import datetime, timedelta, timezone
+
+from typing import AsyncIterator, List, Optional
+
+from fastapi import UploadFile
+
+from gridfs.errors import FileExists, NoFile
+
+from pymongo import ASCENDING, IndexModel
+
+from pymongo.errors import DuplicateKeyError
+
+from pydantic import BaseModel
+
+from beanie.odm.fields import PydanticObjectId
+
+from motor.motor_asyncio import (
+    AsyncIOMotorDatabase,
+    AsyncIOMotorGridFSBucket,
+    AsyncIOMotorGridOut,
+)
+
+from app.user.exception import ProposalNotFound, RangeNotSatisfiable
+
+from config.config import env_param
+
+from config.logger_config import logger
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ByteRange(BaseModel):
+    """Inclusive byte range of a file."""
+
+    start: int
+
+    end: int
+
+    @property
+    def length(self) -> int:
+        """Number of bytes in the range."""
+
+        return self.end - self.start + 1
+
+    @classmethod
+    def from_header(
+        cls, range_header: Optional[str], file_size: int
+    ) -> Optional["ByteRange"]:
+        """Parse a single range `Range` header.
+
+        Malformed and multiple ranges are ignored, as allowed by RFC 9110, and the
+        whole file is served.
+
+        Returns:
+            Optional[ByteRange]: The requested range, None to serve the whole file.
+
+        Raises:
+            RangeNotSatisfiable: If the range starts after the end of the file.
+        """
+
+        if not range_header:
+            return None
+
+        match = RANGE_PATTERN.match(range_header.strip())
+
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+
+        first, last = match.group(1), match.group(2)
+
+        if first == "":
+            start, end = max(file_size - int(last), 0), file_size - 1
+
+        else:
+            start = int(first)
+
+            end = min(int(last), file_size - 1) if last else file_size - 1
+
+        if start >= file_size or start > end:
+            raise RangeNotSatisfiable(range_header=range_header, file_size=file_size)
+
+        return cls(start=start, end=end)
+
+
+class StoredFile(BaseModel):
+    """File stored in the proposal storage."""
+
+    file_id: PydanticObjectId
+
+    sha256: str
+
+    is_duplicate: bool = False
+
+
+class ProposalFileStorage:
+    """Store proposal files in a GridFS bucket, so they are never held in a single
+    document nor fully loaded in memory to be served.
+
+    Files are identified by the SHA-256 of their content, an upload of an already
+    stored content is not kept and links to the existing file. A link is stamped on
+    the file, which is not deleted as unreferenced for `link_grace_seconds`, the time
+    for the uploading proposal to be saved.
+    """
+
+    def __init__(
+        self, bucket_name: str, chunk_size_bytes: int, link_grace_seconds: int
+    ) -> None:
+        """Initialize the storage, the bucket is created by `init`."""
+
+        self.bucket_name: str = bucket_name
+
+        self.chunk_size_bytes: int = chunk_size_bytes
+
+        self.link_grace_seconds: int = link_grace_seconds
+
+        self._bucket: Optional[AsyncIOMotorGridFSBucket] = None
+
+        self._database: Optional[AsyncIOMotorDatabase] = None
+
+    async def init(self, database: AsyncIOMotorDatabase) -> None:
+        """Create the GridFS bucket on the given database, with the unique index on
+        the content hashes."""
+
+        self._bucket = AsyncIOMotorGridFSBucket(
+            database,
+            bucket_name=self.bucket_name,
+            chunk_size_bytes=self.chunk_size_bytes,
+        )
+
+        self._database = database
+
+        await database[f"{self.bucket_name}.files"].create_indexes(
+            [
+                IndexModel(
+                    [("sha256", ASCENDING)],
+                    unique=True,
+                    partialFilterExpression={"sha256": {"$exists": True}},
+                )
+            ]
+        )
+
+        logger.debug("PROPOSAL STORAGE => ✅ GridFS bucket %s ready", self.bucket_name)
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        """Return the GridFS bucket."""
+
+        if self._bucket is None:
+            raise RuntimeError("Proposal file storage is not initialized")
+
+        return self._bucket
+
+    @property
+    def database(self) -> AsyncIOMotorDatabase:
+        """Return the database of the bucket."""
+
+        if self._database is None:
+            raise RuntimeError("Proposal file storage is not initialized")
+
+        return self._database
+
+    async def link(self, file_id: PydanticObjectId) -> bool:
+        """Stamp a new link on a stored file, False if the file was deleted."""
+
+        result = await self.database[f"{self.bucket_name}.files"].update_one(
+            {"_id": file_id},
+            {"$set": {"metadata.linked_at": datetime.now(timezone.utc)}},
+        )
+
+        return result.matched_count == 1
+
+    @staticmethod
+    def is_sha256_conflict(error: FileExists) -> bool:
+        """Check whether a file was not stored because another file with the same
+        content hash was stored meanwhile, and not because its ID is taken.
+
+        GridFS raises `FileExists` for any duplicate key when the file document is
+        inserted, the duplicate key error it replaces gives the index.
+        """
+
+        duplicate = error.__context__
+
+        if not isinstance(duplicate, DuplicateKeyError):
+            return False
+
+        key_pattern = (duplicate.details or {}).get("keyPattern")
+
+        if key_pattern is not None:
+            return "sha256" in key_pattern
+
+        return "sha256" in str(duplicate)
+
+    async def upload(self, file: UploadFile) -> StoredFile:
+        """Stream an uploaded file to GridFS one chunk at a time, hashing it on the way.
+
+        Args:
+            file (UploadFile): The uploaded file.
+
+        Returns:
+            StoredFile: The stored file, or the existing file with the same content.
+        """
+
+        file_id = PydanticObjectId()
+
+        sha256 = hashlib.sha256()
+
+        grid_in = self.bucket.open_upload_stream_with_id(
+            file_id,
+            file.filename or str(file_id),
+            metadata={"content_type": file.content_type},
+        )
+
+        try:
+            while chunk := await file.read(self.chunk_size_bytes):
+                sha256.update(chunk)
+
+                await grid_in.write(chunk)
+
+            existing_id = await self.find_by_sha256(sha256=sha256.hexdigest())
+
+            if existing_id and await self.link(file_id=existing_id):
+                await grid_in.abort()
+
+                logger.debug(
+                    "PROPOSAL STORAGE => File %s already stored with ID %s",
+                    file.filename,
+                    str(existing_id),
+                )
+
+                return StoredFile(
+                    file_id=existing_id, sha256=sha256.hexdigest(), is_duplicate=True
+                )
+
+            await grid_in.set("sha256", sha256.hexdigest())
+
+            await grid_in.close()
+
+        except FileExists as e:
+            await grid_in.abort()
+
+            if not self.is_sha256_conflict(error=e):
+                raise
+
+            existing_id = await self.find_by_sha256(sha256=sha256.hexdigest())
+
+            if not existing_id or not await self.link(file_id=existing_id):
+                raise
+
+            logger.debug(
+                "PROPOSAL STORAGE => File %s stored concurrently with ID %s",
+                file.filename,
+                str(existing_id),
+            )
+
+            return StoredFile(
+                file_id=existing_id, sha256=sha256.hexdigest(), is_duplicate=True
+            )
+
+        except Exception:
+            await grid_in.abort()
+
+            raise
+
+        logger.debug(
+            "PROPOSAL STORAGE => File %s stored with ID %s (%d bytes)",
+            file.filename,
+            str(file_id),
+            grid_in.length,
+        )
+
+        return StoredFile(file_id=file_id, sha256=sha256.hexdigest())
+
+    async def find_by_sha256(self, sha256: str) -> Optional[PydanticObjectId]:
+        """Return the ID of the stored file with the given content hash, if any."""
+
+        files = await self.bucket.find({"sha256": sha256}).to_list(1)
+
+        return PydanticObjectId(files[0]._id) if files else None
+
+    async def upload_bytes(
+        self, file_id: PydanticObjectId, filename: str, content: bytes
+    ) -> None:
+        """Store an in-memory file under a given ID."""
+
+        await self.bucket.upload_from_stream_with_id(file_id, filename, content)
+
+    async def open(self, file_id: PydanticObjectId) -> AsyncIOMotorGridOut:
+        """Open a stored file, its size is available in `length`.
+
+        Raises:
+            ProposalNotFound: If no file has this ID.
+        """
+
+        try:
+            return await self.bucket.open_download_stream(file_id)
+
+        except NoFile as e:
+            logger.error("PROPOSAL STORAGE => File with ID %s not found", file_id)
+
+            raise ProposalNotFound(proposal_id=str(file_id)) from e
+
+    async def exists(self, file_id: PydanticObjectId) -> bool:
+        """Check whether a file is stored under an ID."""
+
+        return await self.bucket.find({"_id": file_id}).to_list(1) != []
+
+    async def read(self, file_id: PydanticObjectId) -> bytes:
+        """Read a whole stored file, for the processings needing its full content."""
+
+        grid_out = await self.open(file_id=file_id)
+
+        return await grid_out.read()
+
+    @staticmethod
+    async def iter_range(
+        grid_out: AsyncIOMotorGridOut, byte_range: Optional[ByteRange] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield the chunks of an opened file, restricted to a byte range if any."""
+
+        if byte_range is None:
+            byte_range = ByteRange(start=0, end=grid_out.length - 1)
+
+        grid_out.seek(byte_range.start)
+
+        remaining = byte_range.length
+
+        while remaining > 0:
+            chunk = await grid_out.readchunk()
+
+            if not chunk:
+                break
+
+            chunk = chunk[:remaining]
+
+            remaining -= len(chunk)
+
+            yield chunk
+
+    async def delete(self, file_id: PydanticObjectId) -> None:
+        """Delete a stored file, a missing file is only logged."""
+
+        try:
+            await self.bucket.delete(file_id)
+
+        except NoFile:
+            logger.warning(
+                "PROPOSAL STORAGE => File with ID %s already deleted", file_id
+            )
+
+    async def delete_unlinked(self, file_ids: List[PydanticObjectId]) -> int:
+        """Delete the stored files not linked to a new upload in the grace period.
+
+        The file document is deleted only if it has no recent link, in one
+        operation, so an upload linking a file at the same time either keeps it or
+        sees it deleted and stores its own copy.
+
+        Returns:
+            int: The number of deleted files.
+        """
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.link_grace_seconds)
+
+        nb_deleted = 0
+
+        for file_id in file_ids:
+            result = await self.database[f"{self.bucket_name}.files"].delete_one(
+                {
+                    "_id": file_id,
+                    "$or": [
+                        {"metadata.linked_at": {"$exists": False}},
+                        {"metadata.linked_at": {"$lt": cutoff}},
+                    ],
+                }
+            )
+
+            if not result.deleted_count:
+                logger.debug(
+                    "PROPOSAL STORAGE => File %s recently linked or deleted, kept",
+                    str(file_id),
+                )
+
+                continue
+
+            await self.database[f"{self.bucket_name}.chunks"].delete_many(
+                {"files_id": file_id}
+            )
+
+            nb_deleted += 1
+
+        return nb_deleted
+
+
+proposal_file_storage = ProposalFileStorage(
+    bucket_name=env_param.PROPOSAL_STORAGE_BUCKET_NAME,
+    chunk_size_bytes=env_param.PROPOSAL_STORAGE_CHUNK_SIZE_BYTES,
+    link_grace_seconds=env_param.PROPOSAL_STORAGE_LINK_GRACE_SECONDS,
+)
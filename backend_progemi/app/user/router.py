@@ -1,13 +1,12 @@
 """Users routes"""
 
-import io
-
-from typing import List
+from typing import List, Optional
 
 from fastapi import (
     Depends,
     File,
     Form,
+    Header,
     Response,
     APIRouter,
     UploadFile,
@@ -15,10 +14,16 @@ from fastapi import (
 
 from fastapi.responses import StreamingResponse
 
+from beanie.odm.fields import PydanticObjectId
+
+from motor.motor_asyncio import AsyncIOMotorGridOut
+
 from app.auth.auth import verify_token
 
 from app.auth.schemas import ConnectedUser
 
+from app.auth.session_token import SESSION_COOKIE_NAME
+
 from app.progemi_api.schemas import PackProgemi
 
 from app.user.schemas import (
@@ -34,8 +39,8 @@ from app.user.schemas import (
     GetUsersPacksNamesOutput,
     NewProjectInput,
     NewUserInput,
-    ProposalFile,
     ProposalInfos,
+    RelotProjectProposalsInput,
     SetProposalExtractedObjectInput,
     UpdateProjectPacksInput,
     UploadProposalInput,
@@ -45,6 +50,19 @@ from app.user.schemas import (
 
 from app.user.user_handler import UserHandler
 
+from app.user.proposal_storage import ByteRange, proposal_file_storage
+
+from app.user.project_reconciler import project_reconciler
+
+from app.jobs.job_queue import proposal_job_queue
+
+from app.jobs.schemas import (
+    GetProposalJobInput,
+    ProposalJob,
+    ProposalJobOutput,
+    SubmitProposalJobOutput,
+)
+
 from app.proposal_object.schemas import ProposalWithPolygonAndValidation
 
 from app.proposal_object.proposal_validate_results import ValidationReport
@@ -84,7 +102,7 @@ async def get_user(connected_user: ConnectedUser = Depends(verify_token)) -> Use
     Retrieve user information based on the provided user ID.
     """
 
-    user = await UserHandler().get_user(connected_user=connected_user)
+    user = await UserHandler().get_user_with_projects(connected_user=connected_user)
 
     return user
 
@@ -120,11 +138,15 @@ async def delete_user(
 
     await UserHandler().delete_user(connected_user=connected_user)
 
-    return Response(
+    response = Response(
         status_code=200,
         content=f"User {connected_user.user_id} deleted successfully",
     )
 
+    response.delete_cookie(key=SESSION_COOKIE_NAME)
+
+    return response
+
 
 @router.post("/new_project")
 async def new_project(
@@ -172,9 +194,12 @@ async def get_all_projects(
 ) -> List[UserProjectOutput]:
     """
     Retrieve all projects name associated with a user.
+
+    Projects are synchronized with Progemi in background, only the first listing
+    of a user waits for its synchronization.
     """
 
-    await UserHandler().run_delta_projects(connected_user=connected_user)
+    await project_reconciler.ensure_synced(connected_user=connected_user)
 
     projects = await UserHandler().get_all_user_projects(connected_user=connected_user)
 
@@ -212,27 +237,78 @@ async def upload_proposal(
     )
 
 
+def proposal_file_response(
+    proposal_file: AsyncIOMotorGridOut, range_header: Optional[str]
+) -> StreamingResponse:
+    """Stream a proposal file chunk by chunk, or only the requested byte range."""
+
+    byte_range: Optional[ByteRange] = ByteRange.from_header(
+        range_header=range_header, file_size=proposal_file.length
+    )
+
+    headers = {
+        "Content-Disposition": 'inline; filename="proposal.pdf"',
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(
+            byte_range.length if byte_range else proposal_file.length
+        ),
+    }
+
+    if byte_range:
+        headers["Content-Range"] = (
+            f"bytes {byte_range.start}-{byte_range.end}/{proposal_file.length}"
+        )
+
+    return StreamingResponse(
+        proposal_file_storage.iter_range(grid_out=proposal_file, byte_range=byte_range),
+        status_code=206 if byte_range else 200,
+        media_type="application/pdf",
+        headers=headers,
+    )
+
+
 @router.post("/get_proposal")
 async def get_proposal(
     get_proposal_input: GetProposalInput,
-    _=Depends(verify_token),
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    connected_user: ConnectedUser = Depends(verify_token),
 ) -> StreamingResponse:
     """
     Return a proposal file for the given user & project.
+
+    Supports `Range: bytes=start-end` requests, answered with 206 Partial Content.
     """
 
-    proposal_doc: ProposalFile = await UserHandler().get_proposal_by_id(
-        get_proposal_input
+    proposal_file: AsyncIOMotorGridOut = await UserHandler().get_proposal_by_id(
+        get_proposal_input=get_proposal_input, connected_user=connected_user
     )
 
-    file_like = io.BytesIO(bytes(proposal_doc.pdf_content))
+    return proposal_file_response(
+        proposal_file=proposal_file, range_header=range_header
+    )
 
-    headers = {"Content-Disposition": 'inline; filename="proposal.pdf"'}
 
-    return StreamingResponse(
-        file_like,
-        media_type="application/pdf",
-        headers=headers,
+@router.get("/get_proposal/{project_name}/{proposal_id}")
+async def get_proposal_file(
+    project_name: str,
+    proposal_id: PydanticObjectId,
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    connected_user: ConnectedUser = Depends(verify_token),
+) -> StreamingResponse:
+    """
+    Return a proposal file for the given user & project, for PDF viewers fetching
+    the pages lazily with `Range` requests.
+    """
+
+    proposal_file: AsyncIOMotorGridOut = await UserHandler().get_proposal_by_id(
+        get_proposal_input=GetProposalInput(
+            project_name=project_name, proposal_id=proposal_id
+        ),
+        connected_user=connected_user,
+    )
+
+    return proposal_file_response(
+        proposal_file=proposal_file, range_header=range_header
     )
 
 
@@ -325,6 +401,27 @@ async def update_project_packs(
     )
 
 
+@router.post("/relot_project_proposals")
+async def relot_project_proposals(
+    relot_project_proposals_input: RelotProjectProposalsInput,
+    connected_user: ConnectedUser = Depends(verify_token),
+) -> Response:
+    """
+    Re-assign the products of the extracted proposals of a project to the lots of its
+    current packs, without extracting them again.
+    """
+
+    nb_relotted: int = await UserHandler().relot_project_proposals(
+        relot_project_proposals_input=relot_project_proposals_input,
+        connected_user=connected_user,
+    )
+
+    return Response(
+        status_code=200,
+        content=f"{nb_relotted} proposals of project {relot_project_proposals_input.project_name} re-assigned to its packs for user {connected_user.user_id}",
+    )
+
+
 @router.post("/get_proposal_extracted_object")
 async def get_proposal_extracted_object(
     get_proposal_extracted_object_input: GetProposalExtractedObjectInput,
@@ -382,6 +479,77 @@ async def get_proposal_object(
     return proposal_object
 
 
+@router.post("/stream_proposal_object")
+async def stream_proposal_object(
+    stream_proposal_object_input: CreateProposalObjectInput,
+    connected_user: ConnectedUser = Depends(verify_token),
+) -> StreamingResponse:
+    """
+    Create a structured proposal object and stream its progress as Server-Sent Events.
+
+    The `stage` events give the status of each pipeline stage, the `product` events
+    each product with its polygon as soon as it is structured, and the `result`
+    event the validated proposal object. An `error` event ends a failed run.
+
+    A client disconnecting only stops the events: the extraction goes on and its
+    result is read with `get_proposal_extracted_object`.
+    """
+
+    return StreamingResponse(
+        UserHandler().stream_proposal_object(
+            create_proposal_object_input=stream_proposal_object_input,
+            connected_user=connected_user,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/submit_proposal_object",
+    responses={
+        503: {"description": "Job queue is full"},
+    },
+)
+async def submit_proposal_object(
+    submit_proposal_object_input: CreateProposalObjectInput,
+    connected_user: ConnectedUser = Depends(verify_token),
+) -> SubmitProposalJobOutput:
+    """
+    Queue the creation of a structured proposal object and return the job ID.
+    """
+
+    job: ProposalJob = await proposal_job_queue.submit(
+        create_proposal_object_input=submit_proposal_object_input,
+        connected_user=connected_user,
+    )
+
+    return SubmitProposalJobOutput(job_id=str(job.id), status=job.status)
+
+
+@router.post(
+    "/get_proposal_object_job",
+    responses={
+        404: {"description": "Job does not exist"},
+    },
+)
+async def get_proposal_object_job(
+    get_proposal_job_input: GetProposalJobInput,
+    connected_user: ConnectedUser = Depends(verify_token),
+) -> ProposalJobOutput:
+    """
+    Retrieve the status of each stage of a proposal job, its result once done, and
+    the number of OpenAI calls waiting in the gateway.
+    """
+
+    job_output: ProposalJobOutput = await proposal_job_queue.get_job_output(
+        job_id=get_proposal_job_input.job_id,
+        connected_user=connected_user,
+    )
+
+    return job_output
+
+
 @router.post("/create_proposal_object_validation")
 async def create_proposal_object_validation(
     create_proposal_object_validation_input: CreateProposalObjectValidationInput,
@@ -16,6 +16,8 @@ from pydantic import (
     PlainValidator,
 )
 
+from pymongo import ASCENDING, IndexModel
+
 from beanie import Document
 
 from beanie.odm.fields import PydanticObjectId
@@ -26,6 +28,8 @@ from app.proposal_object.schemas import ProposalWithPolygonAndValidation
 
 from app.proposal_object.proposal_validate_results import ValidationReport
 
+from app.proposal_object.stages import ProposalStage
+
 
 def _bson_from_b64(v: str | bytes | Binary) -> Binary:
     """Convert a base64 encoded string or bytes to a BSON Binary object."""
@@ -62,7 +66,7 @@ BsonBinary = Annotated[
 
 
 class ProposalFile(Document):
-    """Proposal file schema."""
+    """Legacy proposal file schema, the files are now stored in GridFS."""
 
     id: Optional[PydanticObjectId] = Field(
         default_factory=PydanticObjectId, alias="_id"
@@ -112,6 +116,16 @@ class ProposalInfos(BaseModel):
 class Proposal(ProposalInfos):
     """Proposal schema."""
 
+    sha256: Optional[str] = Field(
+        default=None,
+        description="SHA-256 of the content of the PDF file",
+    )
+
+    extraction_packs: Optional[List[str]] = Field(
+        default=None,
+        description="Sorted pack names used by the last extraction of the proposal",
+    )
+
     proposal_str: Optional[str] = Field(
         default=None,
         description="String representation of the proposal from OCR",
@@ -151,6 +165,112 @@ class Project(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
+class ProposalDocument(Proposal, Document):
+    """Proposal of a project, stored in its own collection."""
+
+    id: Optional[PydanticObjectId] = Field(
+        default_factory=PydanticObjectId, alias="_id"
+    )
+
+    user_id: str = Field(..., description="ID of the user owning the proposal")
+
+    project_name: str = Field(..., description="Name of the project of the proposal")
+
+    class Settings:
+        """Settings for the ProposalDocument collection."""
+
+        name = "user_proposals"
+
+        indexes = [
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("project_name", ASCENDING),
+                    ("title", ASCENDING),
+                ]
+            ),
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("sha256", ASCENDING),
+                    ("extraction_packs", ASCENDING),
+                ]
+            ),
+            IndexModel([("pdf_id", ASCENDING)]),
+        ]
+
+
+class ProjectDocument(Document):
+    """Project of a user, stored in its own collection without its proposals."""
+
+    id: Optional[PydanticObjectId] = Field(
+        default_factory=PydanticObjectId, alias="_id"
+    )
+
+    user_id: str = Field(..., description="ID of the user owning the project")
+
+    name: str = Field(..., description="Name of the project")
+
+    project_packs: List[PackProgemi] = Field(
+        ...,
+        description="List of pack names associated with the project",
+    )
+
+    is_pack_to_choose: bool = Field(
+        default=True,
+        description="Indicates if the project has packs to choose from",
+    )
+
+    class Settings:
+        """Settings for the ProjectDocument collection."""
+
+        name = "user_projects"
+
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("name", ASCENDING)], unique=True),
+        ]
+
+    def to_project(self, proposals: List[Proposal]) -> Project:
+        """Build the embedded Project representation with its proposals."""
+
+        return Project(
+            name=self.name,
+            proposals=proposals,
+            project_packs=self.project_packs,
+            is_pack_to_choose=self.is_pack_to_choose,
+        )
+
+
+class ProjectNameView(BaseModel):
+    """Projection of a project on its name."""
+
+    name: str
+
+
+class ProjectPacksView(BaseModel):
+    """Projection of a project on its packs."""
+
+    project_packs: List[PackProgemi]
+
+
+class ProposalPdfView(BaseModel):
+    """Projection of a proposal on its ID and PDF file ID."""
+
+    id: PydanticObjectId = Field(..., alias="_id")
+
+    pdf_id: Optional[PydanticObjectId] = None
+
+
+class ProposalExtractedView(BaseModel):
+    """Projection of a proposal on its ID, title and extracted object."""
+
+    id: PydanticObjectId = Field(..., alias="_id")
+
+    title: str
+
+    extracted_object: ProposalWithPolygonAndValidation
+
+
 class User(Document):
     """User schema."""
 
@@ -168,7 +288,9 @@ class User(Document):
     )
 
     projects: List[Project] = Field(
-        default_factory=list, description="List of projects associated with the user"
+        default_factory=list,
+        description="List of projects associated with the user, only filled when returned by the API, "
+        "projects are stored in the user_projects and user_proposals collections",
     )
 
     class Settings:
@@ -176,6 +298,22 @@ class User(Document):
 
         name = "users"
 
+        indexes = [
+            IndexModel([("user_id", ASCENDING)]),
+        ]
+
+
+class UserIdView(BaseModel):
+    """Projection of a user on its ID."""
+
+    user_id: str
+
+
+class UserPacksView(BaseModel):
+    """Projection of a user on its packs."""
+
+    user_packs: List[PackProgemi]
+
 
 class NewUserInput(BaseModel):
     """Parameters for creating a new user."""
@@ -284,6 +422,17 @@ class UpdateProjectPacksInput(BaseModel):
     )
 
 
+class RelotProjectProposalsInput(BaseModel):
+    """Parameters for re-assigning the proposals products to the project packs."""
+
+    project_name: str = Field(..., description="Name of the project")
+
+    use_llm_cache: bool = Field(
+        default=True,
+        description="Reuse cached LLM answers for identical inputs, False to force new calls",
+    )
+
+
 class GetProposalExtractedObjectInput(BaseModel):
     """Parameters for getting a structured proposal object."""
 
@@ -321,6 +470,22 @@ class CreateProposalObjectInput(BaseModel):
         description="Title of the proposal to analyze and structure",
     )
 
+    use_llm_cache: bool = Field(
+        default=True,
+        description="Reuse cached LLM answers for identical inputs, False to force new calls",
+    )
+
+    reuse_previous_extraction: bool = Field(
+        default=True,
+        description="Copy the extraction of a proposal with the same file and packs, False to run it again",
+    )
+
+    rerun_from: Optional[ProposalStage] = Field(
+        default=None,
+        description="Stage to run the pipeline again from, keeping the outputs of the previous stages. "
+        "By default an interrupted run resumes after its last completed stage",
+    )
+
 
 class GetProposalObjectValidationInput(BaseModel):
     """Parameters for getting a proposal object validation."""
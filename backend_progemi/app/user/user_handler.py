@@ -1,18 +1,29 @@
 """User handler module"""
 
-from typing import List, Optional
+import asyncio
 
-from fastapi import UploadFile
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile
+
+from pymongo import ASCENDING
 
 from pymongo.errors import DuplicateKeyError
 
+from beanie.odm.bulk import BulkWriter
+
+from beanie.operators import NE, In, Set
+
 from beanie.odm.fields import PydanticObjectId
 
+from motor.motor_asyncio import AsyncIOMotorGridOut
+
 from app.user.exception import (
     FileNameMissing,
     NoPacksInProject,
     PacksNameNotExists,
     ProjectNotFound,
+    ProposalFileNotFound,
     ProposalNotExtracted,
     ProposalNotFound,
     ProposalValidationNotCreated,
@@ -32,20 +43,29 @@ from app.user.schemas import (
     GetProposalObjectValidationInput,
     NewProjectInput,
     NewUserInput,
-    Project,
+    ProjectDocument,
+    ProjectNameView,
+    ProjectPacksView,
     Proposal,
-    ProposalFile,
+    ProposalDocument,
+    ProposalExtractedView,
     ProposalInfos,
+    ProposalPdfView,
     ProposalStatus,
+    RelotProjectProposalsInput,
     SetProposalExtractedObjectInput,
     UpdateProjectPacksInput,
     UploadProposalInput,
     User,
+    UserIdView,
+    UserPacksView,
 )
 
 from app.auth.schemas import ConnectedUser
 
-from app.progemi_api.schemas import PackProgemi, ProjectProgemi
+from app.user.proposal_storage import StoredFile, proposal_file_storage
+
+from app.progemi_api.schemas import PackProgemi
 
 from app.proposal_object.proposal_validate_results import (
     ValidationReport,
@@ -53,14 +73,39 @@ from app.proposal_object.proposal_validate_results import (
 
 from app.proposal_object.proposal_handler import ProposalHandler
 
-from app.progemi_api.progemi_api_handler import ProgemiAPIHandler
+from app.proposal_object.stages import ProposalStage, StageInfo, StageTracker
+
+from app.proposal_object.proposal_stream import (
+    ProductCallback,
+    ProductEvent,
+    format_sse,
+)
+
+from app.proposal_object.checkpoints import (
+    ProposalCheckpoint,
+    ProposalCheckpointHandler,
+)
 
 from app.proposal_object.schemas import ProposalWithPolygonAndValidation
 
 from app.proposal_object.proposal_object_analyzer import ProposalObjectHandler
 
+from app.proposal_object.proposal_relot import ProposalRelot
+
+from app.cost.cost import CostTracker
+
+from app.llm.retry_policy import llm_retry_deadline
+
+from config.config import env_param
+
 from config.logger_config import logger
 
+STREAM_ERROR_DETAIL = "The proposal object could not be created"
+
+# Pipelines of the streamed extractions, kept referenced until they finish even
+# when their client is gone.
+stream_tasks: set[asyncio.Task] = set()
+
 
 class UserHandler:
     """User handler class to manage user-related operations."""
@@ -94,7 +139,6 @@ class UserHandler:
         return User(
             name=new_user_params.user_name,
             user_id=new_user_params.user_id,
-            projects=[],
             user_packs=new_user_params.user_packs,
         )
 
@@ -149,6 +193,60 @@ class UserHandler:
 
         return user
 
+    async def user_exists(self, user_id: str) -> bool:
+        """Check if a user exists, with an indexed lookup on user_id.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            bool: True if the user exists.
+        """
+
+        user: Optional[UserIdView] = await User.find_one(
+            User.user_id == user_id, projection_model=UserIdView
+        )
+
+        return user is not None
+
+    async def get_user_with_projects(self, connected_user: ConnectedUser) -> User:
+        """Get a user with its projects and their proposals, as embedded before.
+
+        Args:
+            connected_user (ConnectedUser): The connected user object.
+        Returns:
+            User: The user object with its projects filled.
+        Raises:
+            UserNotExists: If the user does not exist.
+        """
+
+        user: User = await self.get_user(connected_user=connected_user)
+
+        projects: List[ProjectDocument] = await self.get_all_user_projects(
+            connected_user=connected_user
+        )
+
+        proposals: List[ProposalDocument] = (
+            await ProposalDocument.find(
+                ProposalDocument.user_id == connected_user.user_id
+            )
+            .sort(+ProposalDocument.id)
+            .to_list()
+        )
+
+        user.projects = [
+            project.to_project(
+                proposals=[
+                    proposal
+                    for proposal in proposals
+                    if proposal.project_name == project.name
+                ]
+            )
+            for project in projects
+        ]
+
+        return user
+
     async def get_user_packs_names(self, connected_user: ConnectedUser) -> List[str]:
         """Get all pack names associated with a user.
 
@@ -160,12 +258,32 @@ class UserHandler:
             UserNotExists: If the user does not exist.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
+        user_packs: List[PackProgemi] = await self.get_user_packs(
+            connected_user=connected_user
+        )
+
+        return [pack.libellelot for pack in user_packs]
+
+    async def get_user_packs(self, connected_user: ConnectedUser) -> List[PackProgemi]:
+        """Get the packs of a user, without loading the rest of the user.
+
+        Raises:
+            UserNotExists: If the user does not exist.
+        """
+
+        user: Optional[UserPacksView] = await User.find_one(
+            User.user_id == connected_user.user_id, projection_model=UserPacksView
+        )
+
+        if not user:
+            logger.error("USER HANDLER => User %s not found.", connected_user.user_id)
+
+            raise UserNotExists(user_id=connected_user.user_id)
 
-        return [pack.libellelot for pack in user.user_packs]
+        return user.user_packs
 
     async def delete_user(self, connected_user: ConnectedUser) -> None:
-        """Delete user by user_id.
+        """Delete user by user_id, with its projects and proposals.
 
         Args:
             connected_user (ConnectedUser): The connected user object.
@@ -177,6 +295,12 @@ class UserHandler:
 
         user: User = await self.get_user(connected_user=connected_user)
 
+        await self.delete_proposals(ProposalDocument.user_id == connected_user.user_id)
+
+        await ProjectDocument.find(
+            ProjectDocument.user_id == connected_user.user_id
+        ).delete()
+
         await user.delete()
 
         logger.debug(
@@ -184,21 +308,6 @@ class UserHandler:
             connected_user.user_id,
         )
 
-    async def get_all_user_ids(self) -> List[str]:
-        """Get all user IDs.
-
-        Returns:
-            List[str]: A list of all user IDs.
-        """
-
-        users: List[User] = await User.find_all().to_list()
-
-        user_ids: List[str] = [str(user.id) for user in users]
-
-        logger.debug("USER HANDLER => Retrieved %d user IDs.", len(user_ids))
-
-        return user_ids
-
     async def insert_proposal_file(self, file: UploadFile) -> Proposal:
         """Insert a proposal file into the database.
 
@@ -217,59 +326,39 @@ class UserHandler:
 
             raise FileNameMissing()
 
-        proposal_file = ProposalFile(pdf_content=await file.read())
-
-        await proposal_file.insert()
+        stored_file: StoredFile = await proposal_file_storage.upload(file=file)
 
         proposal = Proposal(
             title=file.filename,
             status=ProposalStatus.PENDING,
-            pdf_id=proposal_file.id,
+            pdf_id=stored_file.file_id,
+            sha256=stored_file.sha256,
             packs=[],
         )
 
         return proposal
 
-    async def get_proposal_file_by_id(
-        self, proposal_id: PydanticObjectId
-    ) -> ProposalFile:
-        """Get a proposal file by its ID.
-
-        Args:
-            proposal_id (PydanticObjectId): The ID of the proposal file to retrieve.
-
-        Returns:
-            ProposalFile: The proposal file object if found.
-        """
-
-        proposal_file: Optional[ProposalFile] = await ProposalFile.get(proposal_id)
-
-        if not proposal_file:
-            logger.error(
-                "USER HANDLER => Proposal file with ID %s not found.", proposal_id
-            )
-
-            raise ProposalNotFound(proposal_id=proposal_id)
-
-        return proposal_file
-
     async def get_proposal_file_by_title(
-        self, project: Project, proposal_title: str
-    ) -> ProposalFile:
-        """Get a proposal file by its title.
+        self, connected_user: ConnectedUser, project_name: str, proposal_title: str
+    ) -> bytes:
+        """Get the content of a proposal file by its title.
 
         Args:
+            connected_user (ConnectedUser): The connected user object.
+            project_name (str): The name of the project of the proposal.
             proposal_title (str): The title of the proposal file to retrieve.
 
         Returns:
-            ProposalFile: The proposal file object if found.
+            bytes: The content of the proposal file.
 
         Raises:
             ProposalNotFound: If the proposal file is not found.
         """
 
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=proposal_title
+        proposal: ProposalDocument = await self.get_proposal_by_title(
+            connected_user=connected_user,
+            project_name=project_name,
+            title=proposal_title,
         )
 
         if not proposal.pdf_id:
@@ -280,44 +369,49 @@ class UserHandler:
 
             raise ProposalNotFound(proposal_id=proposal.title)
 
-        proposal_file: ProposalFile = await self.get_proposal_file_by_id(
-            proposal_id=proposal.pdf_id
-        )
+        return await proposal_file_storage.read(file_id=proposal.pdf_id)
 
-        if not proposal_file:
-            logger.error(
-                "USER HANDLER => Proposal file with title %s not found.",
-                proposal_title,
-            )
-
-            raise ProposalNotFound(proposal_id=proposal_title)
+    async def delete_proposals(self, *criteria: Any) -> None:
+        """Delete the proposals matching the given criteria, with their files."""
 
-        return proposal_file
+        proposals: List[ProposalPdfView] = (
+            await ProposalDocument.find(*criteria).project(ProposalPdfView).to_list()
+        )
 
-    async def delete_proposal_file(self, proposal_id: PydanticObjectId) -> None:
-        """Delete a proposal file from the database.
+        await ProposalDocument.find(*criteria).delete()
 
-        Args:
-            proposal_id (PydanticObjectId): The ID of the proposal to delete.
+        await ProposalCheckpoint.find(
+            In(ProposalCheckpoint.proposal_id, [proposal.id for proposal in proposals])
+        ).delete()
 
-        Returns:
-            None: If the proposal file is deleted successfully.
-        """
+        await self.delete_unreferenced_files(
+            file_ids=[proposal.pdf_id for proposal in proposals if proposal.pdf_id]
+        )
 
-        if not proposal_id:
-            logger.error("USER HANDLER => No PDF ID provided for deletion.")
+    async def delete_unreferenced_files(self, file_ids: List[PydanticObjectId]) -> None:
+        """Delete the given proposal files that no proposal refers to anymore, a file
+        being shared by all the uploads of the same content. A file just linked to
+        an upload whose proposal is not saved yet is kept."""
 
-            raise ProposalNotFound(proposal_id=str(proposal_id))
+        if not file_ids:
+            return
 
-        proposal_file: ProposalFile = await self.get_proposal_file_by_id(
-            proposal_id=str(proposal_id)
+        still_used: List[ProposalPdfView] = (
+            await ProposalDocument.find(In(ProposalDocument.pdf_id, file_ids))
+            .project(ProposalPdfView)
+            .to_list()
         )
 
-        await proposal_file.delete()
+        used_ids = {proposal.pdf_id for proposal in still_used}
+
+        unused_ids = [file_id for file_id in set(file_ids) if file_id not in used_ids]
+
+        nb_deleted = await proposal_file_storage.delete_unlinked(file_ids=unused_ids)
 
         logger.debug(
-            "USER HANDLER => Proposal file with ID %s deleted successfully.",
-            str(proposal_id),
+            "USER HANDLER => %d proposal files deleted, %d still used.",
+            nb_deleted,
+            len(set(file_ids)) - nb_deleted,
         )
 
     async def create_new_project(
@@ -326,8 +420,8 @@ class UserHandler:
         """Create a new project for a user.
 
         Args:
-            user (User): The user object to which the project will be added.
-            project_name (str): The name of the new project.
+            new_project_input (NewProjectInput): Input containing the project name.
+            connected_user (ConnectedUser): The connected user object.
 
         Returns:
             None: If the project is created successfully.
@@ -336,170 +430,35 @@ class UserHandler:
             DuplicateKeyError: If a project with the same name already exists for the user.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        if any(proj.name == new_project_input.project_name for proj in user.projects):
-            logger.error(
-                "USER HANDLER => Project %s already exists for user %s.",
-                new_project_input.project_name,
-                user.user_id,
-            )
-
-            raise DuplicateKeyError(
-                f"Project {new_project_input.project_name} already exists."
-            )
-
-        new_project = Project(
+        new_project = ProjectDocument(
+            user_id=connected_user.user_id,
             name=new_project_input.project_name,
-            proposals=[],
             project_packs=[],
             is_pack_to_choose=True,
         )
 
-        user.projects.append(new_project)
+        try:
+            await new_project.insert()
 
-        await user.save()
+        except DuplicateKeyError:
+            logger.error(
+                "USER HANDLER => Project %s already exists for user %s.",
+                new_project_input.project_name,
+                connected_user.user_id,
+            )
+
+            raise
 
         logger.debug(
             "USER HANDLER => Project %s created successfully for user %s.",
             new_project_input.project_name,
-            user.user_id,
-        )
-
-    async def get_progemi_user_project_names(
-        self, connected_user: ConnectedUser
-    ) -> List[str]:
-        """Get all project names for a connected user.
-
-        Args:
-            connected_user (ConnectedUser): The connected user object.
-
-        Returns:
-            List[str]: A list of project names for the user.
-        """
-
-        projects_progemi: List[
-            ProjectProgemi
-        ] = await ProgemiAPIHandler().get_user_project(connected_user=connected_user)
-
-        projects_progemi_names: List[str] = [
-            project.designationprojet for project in projects_progemi
-        ]
-
-        logger.debug(
-            "USER HANDLER => Retrieved %d  PROGEMI projects for user %s.",
-            len(projects_progemi_names),
             connected_user.user_id,
         )
 
-        return projects_progemi_names
-
-    def get_new_progemi_project_names(
-        self, progemi_user_project_names: List[str], ia_db_projects_name: List[str]
-    ) -> List[str]:
-        """Get progemi project names that are not in the IA database."""
-
-        not_in_ia_db_projects: List[str] = []
-
-        for project_name in progemi_user_project_names:
-            if project_name not in ia_db_projects_name:
-                logger.debug(
-                    "USER HANDLER => New Progemi project found: %s.", project_name
-                )
-                not_in_ia_db_projects.append(project_name)
-
-        logger.debug(
-            "USER HANDLER => Found %d new Progemi projects not in IA DB.",
-            len(not_in_ia_db_projects),
-        )
-
-        return not_in_ia_db_projects
-
-    def get_progemi_project_to_delete(
-        self, progemi_user_project_names: List[str], ia_db_projects_name: List[str]
-    ) -> List[str]:
-        """Get Progemi project names that are not in the PROGEMI database anymore."""
-
-        not_in_progemi_db_projects: List[str] = []
-
-        for project_name in ia_db_projects_name:
-            if project_name not in progemi_user_project_names:
-                logger.debug(
-                    "USER HANDLER => Project AI not found in PROGEMI DB: %s.",
-                    project_name,
-                )
-                not_in_progemi_db_projects.append(project_name)
-
-        logger.debug(
-            "USER HANDLER => Found %d Progemi projects not in PROGEMI DB to remove.",
-            len(not_in_progemi_db_projects),
-        )
-
-        return not_in_progemi_db_projects
-
-    async def create_new_project_from_progemi(
-        self, new_project_name: str, connected_user: ConnectedUser
-    ) -> None:
-        """Create a new project from Progemi for a connected user."""
-
-        logger.debug(
-            "USER HANDLER => Creating new project %s from Progemi for user %s.",
-            new_project_name,
-            connected_user.user_id,
-        )
-
-        packs = await ProgemiAPIHandler().get_user_packs(token=connected_user.token)
-
-        new_project_input = NewProjectInput(
-            user_id=connected_user.user_id,
-            project_name=new_project_name,
-            packs=[p.libellelot for p in packs],
-        )
-
-        await self.create_new_project(
-            new_project_input=new_project_input, connected_user=connected_user
-        )
-
-    async def run_delta_projects(self, connected_user: ConnectedUser) -> None:
-        """Run delta projects for all users."""
-
-        progemi_user_project_names: List[
-            str
-        ] = await self.get_progemi_user_project_names(connected_user=connected_user)
-
-        ia_db_projects: List[str] = await self.get_all_projects_name(
-            connected_user=connected_user
-        )
-
-        new_projects: List[str] = self.get_new_progemi_project_names(
-            progemi_user_project_names=progemi_user_project_names,
-            ia_db_projects_name=ia_db_projects,
-        )
-
-        for project_name in new_projects:
-            await self.create_new_project_from_progemi(
-                new_project_name=project_name, connected_user=connected_user
-            )
-
-        ia_db_projects = await self.get_all_projects_name(connected_user=connected_user)
-
-        projects_to_delete: List[str] = self.get_progemi_project_to_delete(
-            progemi_user_project_names=progemi_user_project_names,
-            ia_db_projects_name=ia_db_projects,
-        )
-
-        for project_name in projects_to_delete:
-            delete_project_input = DeleteProjectInput(
-                user_id=connected_user.user_id, project_name=project_name
-            )
-            await self.delete_project(
-                delete_project_input=delete_project_input, connected_user=connected_user
-            )
-
     async def delete_project(
         self, delete_project_input: DeleteProjectInput, connected_user: ConnectedUser
     ) -> None:
-        """Delete a project from a user's projects.
+        """Delete a project from a user's projects, with its proposals.
 
         Args:
             delete_project_input (DeleteProjectInput): Input containing user_id and project_name.
@@ -509,123 +468,169 @@ class UserHandler:
 
         Raises:
             ProjectNotFound: If the project is not found for the user.
-            UserNotExists: If the user does not exist.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=delete_project_input.project_name
+        project: ProjectDocument = await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=delete_project_input.project_name,
         )
 
-        user.projects.remove(project)
+        await self.delete_proposals(
+            ProposalDocument.user_id == connected_user.user_id,
+            ProposalDocument.project_name == project.name,
+        )
 
-        await user.save()
+        await project.delete()
 
         logger.debug(
             "USER HANDLER => Project %s deleted successfully for user %s.",
             delete_project_input.project_name,
-            user.user_id,
+            connected_user.user_id,
         )
 
     async def get_all_user_projects(
         self, connected_user: ConnectedUser
-    ) -> List[Project]:
+    ) -> List[ProjectDocument]:
         """Get all projects for a connected user.
 
         Args:
             connected_user (ConnectedUser): The connected user object.
 
         Returns:
-            List[Project]: A list of projects associated with the user.
+            List[ProjectDocument]: A list of projects associated with the user.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
+        projects: List[ProjectDocument] = (
+            await ProjectDocument.find(ProjectDocument.user_id == connected_user.user_id)
+            .sort(+ProjectDocument.id)
+            .to_list()
+        )
 
-        if not user.projects:
+        if not projects:
             logger.warning(
-                "USER HANDLER => No projects found for user %s.", user.user_id
+                "USER HANDLER => No projects found for user %s.",
+                connected_user.user_id,
             )
 
-        return user.projects
+        return projects
 
     async def get_all_projects_name(self, connected_user: ConnectedUser) -> List[str]:
         """Get the names of all projects for a user."""
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        if not user.projects:
-            logger.warning(
-                "USER HANDLER => No projects found for user %s.", user.user_id
-            )
-
-            return []
+        projects: List[ProjectNameView] = (
+            await ProjectDocument.find(ProjectDocument.user_id == connected_user.user_id)
+            .sort(+ProjectDocument.id)
+            .project(ProjectNameView)
+            .to_list()
+        )
 
-        project_names: List[str] = [project.name for project in user.projects]
+        project_names: List[str] = [project.name for project in projects]
 
         logger.debug(
             "USER HANDLER => Retrieved projects names for user %s: %s.",
-            user.user_id,
+            connected_user.user_id,
             project_names,
         )
 
         return project_names
 
-    def get_project_by_name(self, user: User, project_name: str) -> Project:
+    async def get_project_by_name(
+        self, connected_user: ConnectedUser, project_name: str
+    ) -> ProjectDocument:
         """Get a project by its name from a user.
         Args:
-            user (User): The user object containing the projects.
+            connected_user (ConnectedUser): The connected user object.
             project_name (str): The name of the project to retrieve.
         Returns:
-            Project: The project object if found.
+            ProjectDocument: The project object if found.
         Raises:
             ProjectNotFound: If the project is not found for the user.
         """
 
-        project = next(
-            (proj for proj in user.projects if proj.name == project_name), None
+        project: Optional[ProjectDocument] = await ProjectDocument.find_one(
+            ProjectDocument.user_id == connected_user.user_id,
+            ProjectDocument.name == project_name,
         )
 
         if not project:
             logger.error(
                 "USER HANDLER => Project %s not found for user %s.",
                 project_name,
-                user.user_id,
+                connected_user.user_id,
             )
 
             raise ProjectNotFound(project_name=project_name)
 
         return project
 
-    def get_proposal_by_title(self, project: Project, title: str) -> Proposal:
+    async def get_proposal_by_title(
+        self, connected_user: ConnectedUser, project_name: str, title: str
+    ) -> ProposalDocument:
         """Get a proposal by its title from a project.
 
         Args:
-            project (Project): The project object containing the proposals.
+            connected_user (ConnectedUser): The connected user object.
+            project_name (str): The name of the project of the proposal.
             title (str): The title of the proposal to retrieve.
 
         Returns:
-            Proposal: The proposal object if found.
+            ProposalDocument: The proposal object if found.
 
         Raises:
             ProposalNotFound: If the proposal is not found in the project.
         """
 
-        proposal = next(
-            (prop for prop in project.proposals if prop.title == title), None
+        proposal: Optional[ProposalDocument] = await ProposalDocument.find_one(
+            ProposalDocument.user_id == connected_user.user_id,
+            ProposalDocument.project_name == project_name,
+            ProposalDocument.title == title,
         )
 
         if not proposal:
             logger.error(
                 "USER HANDLER => Proposal with title %s not found in project %s.",
                 title,
-                project.name,
+                project_name,
             )
 
             raise ProposalNotFound(proposal_id=title)
 
         return proposal
 
+    async def update_proposal_by_title(
+        self,
+        connected_user: ConnectedUser,
+        project_name: str,
+        proposal_title: str,
+        fields: Dict[Any, Any],
+    ) -> None:
+        """Set some fields of a proposal, without rewriting the other ones.
+
+        Args:
+            connected_user (ConnectedUser): The connected user object.
+            project_name (str): The name of the project of the proposal.
+            proposal_title (str): The title of the proposal.
+            fields (Dict[Any, Any]): The ProposalDocument fields to set, with their values.
+
+        Raises:
+            ProposalNotFound: If the proposal is not found in the project.
+        """
+
+        result = await ProposalDocument.find_one(
+            ProposalDocument.user_id == connected_user.user_id,
+            ProposalDocument.project_name == project_name,
+            ProposalDocument.title == proposal_title,
+        ).update(Set(fields))
+
+        if not result or not result.matched_count:
+            logger.error(
+                "USER HANDLER => Proposal with title %s not found in project %s.",
+                proposal_title,
+                project_name,
+            )
+
+            raise ProposalNotFound(proposal_id=proposal_title)
+
     async def upload_proposal_to_project(
         self,
         upload_proposal_input: UploadProposalInput,
@@ -646,17 +651,18 @@ class UserHandler:
             ProjectNotFound: If the project is not found for the user.
         """
 
-        proposal: Proposal = await self.insert_proposal_file(file=file)
-
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=upload_proposal_input.project_name
+        project: ProjectDocument = await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=upload_proposal_input.project_name,
         )
 
-        project.proposals.append(proposal)
+        proposal: Proposal = await self.insert_proposal_file(file=file)
 
-        await user.save()
+        await ProposalDocument(
+            **proposal.model_dump(),
+            user_id=connected_user.user_id,
+            project_name=project.name,
+        ).insert()
 
         logger.debug(
             "USER HANDLER => Proposal %s uploaded for user %s in project %s.",
@@ -677,25 +683,16 @@ class UserHandler:
             None: If the proposal is deleted successfully.
 
         Raises:
-            ProjectNotFound: If the project is not found for the user.
-            UserNotExists: If the user does not exist.
+            ProposalNotFound: If the proposal is not found in the project.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=delete_proposal_input.project_name
+        proposal: ProposalDocument = await self.get_proposal_by_title(
+            connected_user=connected_user,
+            project_name=delete_proposal_input.project_name,
+            title=delete_proposal_input.proposal_title,
         )
 
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=delete_proposal_input.proposal_title
-        )
-
-        project.proposals.remove(proposal)
-
-        await self.delete_proposal_file(proposal_id=proposal.pdf_id)
-
-        await user.save()
+        await self.delete_proposals(ProposalDocument.id == proposal.id)
 
         logger.debug(
             "USER HANDLER => Proposal with ID %s deleted from user %s in project %s.",
@@ -705,23 +702,45 @@ class UserHandler:
         )
 
     async def get_proposal_by_id(
-        self, get_proposal_input: GetProposalInput
-    ) -> ProposalFile:
-        """Get a proposal file by its ID.
+        self, get_proposal_input: GetProposalInput, connected_user: ConnectedUser
+    ) -> AsyncIOMotorGridOut:
+        """Open a proposal file by its ID, to be streamed.
+
+        Files are shared by the proposals with the same content, so the file is only
+        opened if a proposal of the user in the project references it.
 
         Args:
-            get_proposal_input (GetProposalInput): Input containing user_id and proposal_id.
+            get_proposal_input (GetProposalInput): Input containing project_name and proposal_id, the ID of the file.
+            connected_user (ConnectedUser): The connected user.
 
         Returns:
-            ProposalFile: The proposal file object if found.
+            AsyncIOMotorGridOut: The opened proposal file.
 
+        Raises:
+            ProposalFileNotFound: If no proposal of the user in the project has this file.
         """
 
-        proposal_file: ProposalFile = await self.get_proposal_file_by_id(
-            proposal_id=get_proposal_input.proposal_id
+        proposal: Optional[ProposalPdfView] = await ProposalDocument.find_one(
+            ProposalDocument.user_id == connected_user.user_id,
+            ProposalDocument.project_name == get_proposal_input.project_name,
+            ProposalDocument.pdf_id == get_proposal_input.proposal_id,
+            projection_model=ProposalPdfView,
         )
 
-        return proposal_file
+        if not proposal:
+            logger.error(
+                "USER HANDLER => File %s not found in project %s of user %s.",
+                str(get_proposal_input.proposal_id),
+                get_proposal_input.project_name,
+                connected_user.user_id,
+            )
+
+            raise ProposalFileNotFound(
+                pdf_id=str(get_proposal_input.proposal_id),
+                project_name=get_proposal_input.project_name,
+            )
+
+        return await proposal_file_storage.open(file_id=get_proposal_input.proposal_id)
 
     async def get_all_user_project_proposal_infos(
         self,
@@ -730,79 +749,96 @@ class UserHandler:
     ) -> List[ProposalInfos]:
         """Get all proposals for a user's projects.
 
+        Only the title, status, PDF ID and distinct lots of the extracted products
+        are read from the database, with an aggregation pipeline.
+
         Args:
             get_all_proposals_input (GetAllProposalsInput): Input containing user_id and project_name.
 
         Returns:
-            list[Proposal]: A list of proposals for the user's projects.
+            list[ProposalInfos]: A list of proposals for the user's projects.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project = self.get_project_by_name(
-            user=user, project_name=get_all_proposals_input.project_name
+        await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=get_all_proposals_input.project_name,
         )
 
-        return [
-            ProposalInfos(
-                **proposal.model_dump(exclude="packs"),
-                packs=self.get_all_proposal_packs(proposal_object=proposal),
+        return (
+            await ProposalDocument.find(
+                ProposalDocument.user_id == connected_user.user_id,
+                ProposalDocument.project_name == get_all_proposals_input.project_name,
             )
-            for proposal in project.proposals
-        ]
-
-    @staticmethod
-    def get_all_proposal_packs(proposal_object: Proposal) -> List[str]:
-        """
-        Get the list of packs associated with a proposal object.
-
-        Args:
-            proposal_object (Proposal): The proposal object.
-        """
-
-        all_packs: List[str] = []
-
-        if not proposal_object.extracted_object:
-            return []
-
-        for produit in proposal_object.extracted_object.devis_produits:
-            if produit.lot:
-                all_packs.append(produit.lot)
-
-        return list(set(all_packs))
+            .aggregate(
+                [
+                    {"$sort": {"_id": ASCENDING}},
+                    {
+                        "$project": {
+                            "title": 1,
+                            "status": 1,
+                            "pdf_id": 1,
+                            "packs": {
+                                "$setUnion": [
+                                    {
+                                        "$filter": {
+                                            "input": {
+                                                "$ifNull": [
+                                                    "$extracted_object.devis_produits.lot",
+                                                    [],
+                                                ]
+                                            },
+                                            # null and "" sort before any lot
+                                            "cond": {"$gt": ["$$this", ""]},
+                                        }
+                                    },
+                                    [],
+                                ]
+                            },
+                        }
+                    },
+                ],
+                projection_model=ProposalInfos,
+            )
+            .to_list()
+        )
 
     async def get_all_user_project_proposal_files(
         self,
         get_all_proposals_input: GetAllProposalsInput,
         connected_user: ConnectedUser,
-    ) -> List[ProposalFile]:
-        """Get all proposal files for a user's projects.
+    ) -> List[bytes]:
+        """Get the content of all proposal files of a user's project.
 
         Args:
             get_all_proposals_input (GetAllProposalsInput): Input containing user_id and project_name.
 
         Returns:
-            list[ProposalFile]: A list of proposal files for the user's projects.
+            list[bytes]: The content of the proposal files of the project.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
+        await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=get_all_proposals_input.project_name,
+        )
 
-        project = self.get_project_by_name(
-            user=user, project_name=get_all_proposals_input.project_name
+        proposals: List[ProposalPdfView] = (
+            await ProposalDocument.find(
+                ProposalDocument.user_id == connected_user.user_id,
+                ProposalDocument.project_name == get_all_proposals_input.project_name,
+            )
+            .sort(+ProposalDocument.id)
+            .project(ProposalPdfView)
+            .to_list()
         )
 
         proposal_project_ids: List[PydanticObjectId] = [
-            proposal.pdf_id for proposal in project.proposals if proposal.pdf_id
+            proposal.pdf_id for proposal in proposals if proposal.pdf_id
         ]
 
-        proposal_files: List[ProposalFile] = []
+        proposal_files: List[bytes] = []
 
         for proposal_id in proposal_project_ids:
-            proposal_file: ProposalFile = await self.get_proposal_file_by_id(
-                proposal_id=proposal_id
-            )
-
-            proposal_files.append(proposal_file)
+            proposal_files.append(await proposal_file_storage.read(file_id=proposal_id))
 
         return proposal_files
 
@@ -820,16 +856,24 @@ class UserHandler:
             List[str]: A list of pack names associated with the project.
 
         Raises:
-            UserNotExists: If the user does not exist.
             ProjectNotFound: If the project is not found for the user.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=get_project_packs_input.project_name
+        project: Optional[ProjectPacksView] = await ProjectDocument.find_one(
+            ProjectDocument.user_id == connected_user.user_id,
+            ProjectDocument.name == get_project_packs_input.project_name,
+            projection_model=ProjectPacksView,
         )
 
+        if not project:
+            logger.error(
+                "USER HANDLER => Project %s not found for user %s.",
+                get_project_packs_input.project_name,
+                connected_user.user_id,
+            )
+
+            raise ProjectNotFound(project_name=get_project_packs_input.project_name)
+
         return project.project_packs
 
     async def update_project_packs(
@@ -843,17 +887,15 @@ class UserHandler:
             update_project_packs_input (UpdateProjectPacksInput): Input containing user_id, project_name, and packs.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=update_project_packs_input.project_name
+        user_packs: List[PackProgemi] = await self.get_user_packs(
+            connected_user=connected_user
         )
 
         packs_to_add: List[PackProgemi] = []
 
         for pack_name in update_project_packs_input.packs_name:
             pack_to_add = next(
-                (pack for pack in user.user_packs if pack.libellelot == pack_name),
+                (pack for pack in user_packs if pack.libellelot == pack_name),
                 None,
             )
 
@@ -864,11 +906,26 @@ class UserHandler:
 
             packs_to_add.append(pack_to_add)
 
-        project.project_packs = packs_to_add
+        result = await ProjectDocument.find_one(
+            ProjectDocument.user_id == connected_user.user_id,
+            ProjectDocument.name == update_project_packs_input.project_name,
+        ).update(
+            Set(
+                {
+                    ProjectDocument.project_packs: packs_to_add,
+                    ProjectDocument.is_pack_to_choose: False,
+                }
+            )
+        )
 
-        project.is_pack_to_choose = False
+        if not result or not result.matched_count:
+            logger.error(
+                "USER HANDLER => Project %s not found for user %s.",
+                update_project_packs_input.project_name,
+                connected_user.user_id,
+            )
 
-        await user.save()
+            raise ProjectNotFound(project_name=update_project_packs_input.project_name)
 
         logger.debug(
             "USER HANDLER => Packs updated for project %s of user %s.",
@@ -876,39 +933,135 @@ class UserHandler:
             connected_user.user_id,
         )
 
-    async def get_proposal_extracted_object(
+    async def relot_project_proposals(
         self,
-        get_proposal_extracted_object_input: GetProposalExtractedObjectInput,
+        relot_project_proposals_input: RelotProjectProposalsInput,
         connected_user: ConnectedUser,
-    ) -> ProposalWithPolygonAndValidation:
-        """Get the extracted object from a proposal.
+    ) -> int:
+        """Re-assign the products of the extracted proposals of a project to the lots
+        of its current packs, without extracting them again.
+
+        The proposals are processed in parallel and their new lots written in a
+        single bulk write. Proposals already extracted with the current packs are
+        skipped.
 
         Args:
-            get_proposal_extracted_object_input (GetProposalExtractedObjectInput): Input containing user_id, project_name, and title.
+            relot_project_proposals_input (RelotProjectProposalsInput): Input containing project_name.
 
         Returns:
-            ProposalWithPolygonAndValidation: The extracted object from the proposal.
-        """
+            int: The number of proposals re-assigned.
 
-        user: User = await self.get_user(connected_user=connected_user)
+        Raises:
+            NoPacksInProject: If the project has no packs.
+        """
 
-        project: Project = self.get_project_by_name(
-            user=user, project_name=get_proposal_extracted_object_input.project_name
+        project: ProjectDocument = await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=relot_project_proposals_input.project_name,
         )
 
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=get_proposal_extracted_object_input.proposal_title
+        if not project.project_packs:
+            logger.error(
+                "USER HANDLER => No packs found in project %s.",
+                relot_project_proposals_input.project_name,
+            )
+
+            raise NoPacksInProject(project_name=project.name)
+
+        packs: List[str] = sorted(
+            set(self.get_packs_names_from_progemi_packs(project.project_packs))
         )
 
-        if not proposal.extracted_object:
-            logger.error(
-                "USER HANDLER => Proposal %s has not been extracted.",
-                get_proposal_extracted_object_input.proposal_title,
+        proposals: List[ProposalExtractedView] = (
+            await ProposalDocument.find(
+                ProposalDocument.user_id == connected_user.user_id,
+                ProposalDocument.project_name == project.name,
+                NE(ProposalDocument.extracted_object, None),
+                NE(ProposalDocument.extraction_packs, packs),
             )
+            .project(ProposalExtractedView)
+            .to_list()
+        )
 
-            raise ProposalNotExtracted(proposal_title=proposal.title)
+        if not proposals:
+            return 0
 
-        return proposal.extracted_object
+        cost_tracker = CostTracker()
+
+        proposal_relot = ProposalRelot(
+            packs=packs,
+            cost_tracker=cost_tracker,
+            use_cache=relot_project_proposals_input.use_llm_cache,
+        )
+
+        semaphore = asyncio.Semaphore(env_param.RELOT_MAX_CONCURRENT_PROPOSALS)
+
+        async def relot(proposal: ProposalExtractedView) -> int:
+            async with semaphore:
+                return await proposal_relot.relot(
+                    proposal_object=proposal.extracted_object
+                )
+
+        results = await asyncio.gather(
+            *(relot(proposal) for proposal in proposals), return_exceptions=True
+        )
+
+        nb_relotted = 0
+
+        async with BulkWriter(ordered=False, object_class=ProposalDocument) as bulk:
+            for proposal, result in zip(proposals, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        "USER HANDLER => Error re-assigning the lots of proposal %s: %s",
+                        proposal.title,
+                        str(result),
+                    )
+
+                    continue
+
+                await ProposalDocument.find_one(
+                    ProposalDocument.id == proposal.id
+                ).update(
+                    Set(
+                        {
+                            ProposalDocument.extracted_object: proposal.extracted_object,
+                            ProposalDocument.extraction_packs: packs,
+                        }
+                    ),
+                    bulk_writer=bulk,
+                )
+
+                nb_relotted += 1
+
+        logger.info(
+            "USER HANDLER => %d proposals of project %s re-assigned to packs %s, cost: %s",
+            nb_relotted,
+            project.name,
+            packs,
+            cost_tracker.cost.model_dump_json(),
+        )
+
+        return nb_relotted
+
+    async def get_proposal_extracted_object(
+        self,
+        get_proposal_extracted_object_input: GetProposalExtractedObjectInput,
+        connected_user: ConnectedUser,
+    ) -> ProposalWithPolygonAndValidation:
+        """Get the extracted object from a proposal.
+
+        Args:
+            get_proposal_extracted_object_input (GetProposalExtractedObjectInput): Input containing user_id, project_name, and title.
+
+        Returns:
+            ProposalWithPolygonAndValidation: The extracted object from the proposal.
+        """
+
+        return await self.get_proposal_object_by_title(
+            connected_user=connected_user,
+            project_name=get_proposal_extracted_object_input.project_name,
+            proposal_title=get_proposal_extracted_object_input.proposal_title,
+        )
 
     async def set_proposal_extracted_object(
         self,
@@ -930,37 +1083,19 @@ class UserHandler:
             connected_user.user_id,
         )
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        logger.debug(
-            "USER HANDLER => User %s retrieved successfully.",
-            user.user_id,
-        )
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=set_proposal_extracted_object_input.project_name
-        )
-
-        logger.debug(
-            "USER HANDLER => Project %s retrieved successfully for user %s.",
-            project.name,
-            user.user_id,
-        )
-
         proposal_extracted_object, report = ProposalObjectHandler(
             proposal_object=set_proposal_extracted_object_input.extracted_object
         ).validate_proposal_object()
 
-        await self.set_proposal_validation_by_title(
-            project=project,
-            proposal_title=set_proposal_extracted_object_input.title,
-            validation_report=report,
-        )
-
-        await self.set_proposal_object_to_project(
-            project=project,
-            proposal_object=proposal_extracted_object,
+        await self.update_proposal_by_title(
+            connected_user=connected_user,
+            project_name=set_proposal_extracted_object_input.project_name,
             proposal_title=set_proposal_extracted_object_input.title,
+            fields={
+                ProposalDocument.extracted_object: proposal_extracted_object,
+                ProposalDocument.validation_object: report,
+                ProposalDocument.extraction_packs: None,
+            },
         )
 
         logger.debug(
@@ -970,70 +1105,26 @@ class UserHandler:
             connected_user.user_id,
         )
 
-        await user.save()
-
         logger.debug("%s", proposal_extracted_object.model_dump_json(indent=2))
 
         return proposal_extracted_object
 
-    async def set_proposal_object_to_project(
-        self,
-        project: Project,
-        proposal_object: ProposalWithPolygonAndValidation,
-        proposal_title: str,
-    ) -> None:
-        """Set the proposal object for a project.
-
-        Args:
-            get_proposal_object_input (GetProposalObjectInput): Input containing user_id, project_name, and proposal_title.
-
-        Returns:
-            None: If the proposal object is set successfully.
-        """
-
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=proposal_title
-        )
-
-        proposal.extracted_object = proposal_object
-
-    async def set_proposal_str_to_project(
-        self,
-        project: Project,
-        proposal_str: str,
-        proposal_title: str,
-    ) -> None:
-        """Set the proposal string for a project.
-
-        Args:
-            project (Project): The project to which the proposal belongs.
-            proposal_str (str): The string representation of the proposal.
-            proposal_title (str): The title of the proposal.
-
-        Returns:
-            None: If the proposal string is set successfully.
-        """
-
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=proposal_title
-        )
-
-        proposal.proposal_str = proposal_str
-
     async def get_proposal_object_by_title(
-        self, project: Project, proposal_title: str
+        self, connected_user: ConnectedUser, project_name: str, proposal_title: str
     ) -> ProposalWithPolygonAndValidation:
         """Get the proposal object by title.
         Args:
-            user (User): The user requesting the proposal object.
-            project (Project): The project to which the proposal belongs.
+            connected_user (ConnectedUser): The connected user object.
+            project_name (str): The name of the project of the proposal.
             proposal_title (str): The title of the proposal.
         Returns:
             ProposalWithPolygonAndValidation: The structured proposal object if found, otherwise raises an error.
         """
 
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=proposal_title
+        proposal: ProposalDocument = await self.get_proposal_by_title(
+            connected_user=connected_user,
+            project_name=project_name,
+            title=proposal_title,
         )
 
         if not proposal.extracted_object:
@@ -1046,72 +1137,28 @@ class UserHandler:
 
         return proposal.extracted_object
 
-    async def set_proposal_validation_by_title(
-        self,
-        project: Project,
-        proposal_title: str,
-        validation_report: ValidationReport,
-    ) -> None:
-        """Set the validation report for a proposal object in a project.
-
-        Args:
-            user (User): The user who owns the project.
-            project (Project): The project to which the proposal belongs.
-            proposal_title (str): The title of the proposal.
-            validation_report (ValidationReport): The validation report to set.
-
-        Returns:
-            None: If the validation report is set successfully.
-        """
-
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=proposal_title
-        )
-
-        proposal.validation_object = validation_report
-
-    async def set_proposal_packs_by_title(
-        self,
-        project: Project,
-        proposal_title: str,
-        proposal_object: ProposalWithPolygonAndValidation,
-    ) -> None:
-        """Set the packs associated with a proposal object in a project.
-
-        Args:
-            project (Project): The project to which the proposal belongs.
-            proposal_title (str): The title of the proposal.
-            proposal_object (ProposalWithPolygonAndValidation): The proposal object containing the packs.
-
-        Returns:
-            None: If the packs are set successfully.
-        """
-
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=proposal_title
-        )
-
-        proposal.packs = proposal_object.packs
-
     async def create_proposal_object(
         self,
         create_proposal_object_input: CreateProposalObjectInput,
         connected_user: ConnectedUser,
+        stage_tracker: Optional[StageTracker] = None,
+        on_product: Optional[ProductCallback] = None,
     ) -> ProposalWithPolygonAndValidation:
         """Create and return a structured proposal object from the proposal bytes.
 
         Args:
             proposal_bytes (bytes): The raw bytes of the proposal.
             packs (List[str]): The list of packs associated with the proposal.
+            stage_tracker (Optional[StageTracker]): Tracker notified at each pipeline stage.
+            on_product (Optional[ProductCallback]): Callback receiving each product as soon as it is structured.
 
         Returns:
             Optional[ProposalWithPolygonAndValidation]: The structured proposal object if successfully created, otherwise None.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=create_proposal_object_input.project_name
+        project: ProjectDocument = await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=create_proposal_object_input.project_name,
         )
 
         if not project.project_packs:
@@ -1122,40 +1169,205 @@ class UserHandler:
 
             raise NoPacksInProject(project_name=project.name)
 
-        proposal_file: ProposalFile = await self.get_proposal_file_by_title(
-            project=project, proposal_title=create_proposal_object_input.proposal_title
+        packs: List[str] = sorted(
+            set(self.get_packs_names_from_progemi_packs(project.project_packs))
         )
 
-        (
-            proposal_object,
-            validation_report,
-            proposal_str,
-        ) = await ProposalHandler().get_proposal_object(
-            proposal_bytes=proposal_file.pdf_content,
-            packs=self.get_packs_names_from_progemi_packs(project.project_packs),
+        proposal: ProposalDocument = await self.get_proposal_by_title(
+            connected_user=connected_user,
+            project_name=project.name,
+            title=create_proposal_object_input.proposal_title,
         )
 
-        await self.set_proposal_object_to_project(
-            project=project,
-            proposal_object=proposal_object,
-            proposal_title=create_proposal_object_input.proposal_title,
+        previous: Optional[ProposalDocument] = (
+            await self.get_previous_extraction(proposal=proposal, packs=packs)
+            if create_proposal_object_input.reuse_previous_extraction
+            and not create_proposal_object_input.rerun_from
+            else None
         )
 
-        await self.set_proposal_validation_by_title(
-            project=project,
+        if previous:
+            proposal_object = previous.extracted_object
+
+            validation_report = previous.validation_object
+
+            proposal_str = previous.proposal_str
+
+            if stage_tracker:
+                for stage in ProposalStage:
+                    await stage_tracker.skip(stage)
+
+        else:
+            proposal_bytes: bytes = await self.get_proposal_file_by_title(
+                connected_user=connected_user,
+                project_name=project.name,
+                proposal_title=create_proposal_object_input.proposal_title,
+            )
+
+            checkpoint = await ProposalCheckpointHandler.load(
+                proposal_id=proposal.id,
+                packs=packs,
+                rerun_from=create_proposal_object_input.rerun_from,
+            )
+
+            with llm_retry_deadline(env_param.LLM_RETRY_PIPELINE_DEADLINE_SECONDS):
+                (
+                    proposal_object,
+                    validation_report,
+                    proposal_str,
+                ) = await ProposalHandler().get_proposal_object(
+                    proposal_bytes=proposal_bytes,
+                    packs=packs,
+                    stage_tracker=stage_tracker,
+                    use_llm_cache=create_proposal_object_input.use_llm_cache,
+                    checkpoint=checkpoint,
+                    on_product=on_product,
+                )
+
+        await self.update_proposal_by_title(
+            connected_user=connected_user,
+            project_name=project.name,
             proposal_title=create_proposal_object_input.proposal_title,
-            validation_report=validation_report,
+            fields={
+                ProposalDocument.extracted_object: proposal_object,
+                ProposalDocument.validation_object: validation_report,
+                ProposalDocument.proposal_str: proposal_str,
+                ProposalDocument.extraction_packs: packs,
+            },
         )
 
-        await self.set_proposal_str_to_project(
-            project=project,
-            proposal_str=proposal_str,
-            proposal_title=create_proposal_object_input.proposal_title,
+        return proposal_object
+
+    async def stream_proposal_object(
+        self,
+        create_proposal_object_input: CreateProposalObjectInput,
+        connected_user: ConnectedUser,
+    ) -> AsyncIterator[str]:
+        """Create a structured proposal object and yield its progress as Server-Sent
+        Events.
+
+        A `stage` event is sent at each stage change, a `product` event for each
+        product as soon as it is structured, then a `result` event with the
+        validated proposal object, or an `error` event.
+
+        The pipeline runs in its own task: if the client disconnects, only the
+        events stop, the extraction goes on and is saved with the proposal.
+
+        Args:
+            create_proposal_object_input (CreateProposalObjectInput): Input containing project_name and proposal_title.
+            connected_user (ConnectedUser): The connected user.
+
+        Yields:
+            str: The formatted events.
+        """
+
+        events: asyncio.Queue[Optional[str]] = asyncio.Queue()
+
+        listening = True
+
+        def send(event: str, data: Any) -> None:
+            """Queue an event while the client is listening."""
+
+            if listening:
+                events.put_nowait(format_sse(event, data))
+
+        async def on_stage_change(stage_info: StageInfo) -> None:
+            """Send the new stage status."""
+
+            send("stage", stage_info.model_dump(mode="json"))
+
+        async def on_product(product_event: ProductEvent) -> None:
+            """Send a product as soon as it is structured."""
+
+            send("product", product_event.model_dump(mode="json"))
+
+        async def run() -> None:
+            """Run the pipeline, then send its result and close the stream."""
+
+            try:
+                proposal_object = await self.create_proposal_object(
+                    create_proposal_object_input=create_proposal_object_input,
+                    connected_user=connected_user,
+                    stage_tracker=StageTracker(on_change=on_stage_change),
+                    on_product=on_product,
+                )
+
+                send("result", proposal_object.model_dump(mode="json"))
+
+            except Exception as e:
+                logger.exception(
+                    "USER HANDLER => Error streaming proposal object %s: %s",
+                    create_proposal_object_input.proposal_title,
+                    str(e),
+                )
+
+                send(
+                    "error",
+                    {
+                        "detail": (
+                            e.detail
+                            if isinstance(e, HTTPException)
+                            else STREAM_ERROR_DETAIL
+                        )
+                    },
+                )
+
+            finally:
+                events.put_nowait(None)
+
+        task = asyncio.create_task(run())
+
+        stream_tasks.add(task)
+
+        task.add_done_callback(stream_tasks.discard)
+
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+
+        finally:
+            listening = False
+
+            if not task.done():
+                logger.info(
+                    "USER HANDLER => Client of proposal object %s disconnected, "
+                    "the extraction goes on",
+                    create_proposal_object_input.proposal_title,
+                )
+
+    async def get_previous_extraction(
+        self, proposal: ProposalDocument, packs: List[str]
+    ) -> Optional[ProposalDocument]:
+        """Find another proposal of the same user with the same file content,
+        extracted with the same packs, whose extraction can be copied.
+
+        Args:
+            proposal (ProposalDocument): The proposal to extract.
+            packs (List[str]): The sorted pack names the extraction would use.
+
+        Returns:
+            Optional[ProposalDocument]: The previously extracted proposal, if any.
+        """
+
+        if not proposal.sha256:
+            return None
+
+        previous: Optional[ProposalDocument] = await ProposalDocument.find_one(
+            ProposalDocument.user_id == proposal.user_id,
+            ProposalDocument.sha256 == proposal.sha256,
+            ProposalDocument.extraction_packs == packs,
+            ProposalDocument.id != proposal.id,
+            NE(ProposalDocument.extracted_object, None),
         )
 
-        await user.save()
+        if previous:
+            logger.info(
+                "USER HANDLER => Reusing the extraction of proposal %s for proposal %s.",
+                previous.title,
+                proposal.title,
+            )
 
-        return proposal_object
+        return previous
 
     async def create_proposal_object_validation(
         self,
@@ -1167,10 +1379,9 @@ class UserHandler:
             create_proposal_object_input (CreateProposalObjectValidationInput): Input containing user_id, project_name, and proposal_title.
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=create_proposal_object_input.project_name
+        project: ProjectDocument = await self.get_project_by_name(
+            connected_user=connected_user,
+            project_name=create_proposal_object_input.project_name,
         )
 
         if not project.project_packs:
@@ -1183,7 +1394,8 @@ class UserHandler:
 
         proposal_object: ProposalWithPolygonAndValidation = (
             await self.get_proposal_object_by_title(
-                project=project,
+                connected_user=connected_user,
+                project_name=project.name,
                 proposal_title=create_proposal_object_input.proposal_title,
             )
         )
@@ -1192,20 +1404,16 @@ class UserHandler:
             proposal_object=proposal_object
         ).validate_proposal_object()
 
-        await self.set_proposal_validation_by_title(
-            project=project,
-            proposal_title=create_proposal_object_input.proposal_title,
-            validation_report=proposal_validation,
-        )
-
-        await self.set_proposal_object_to_project(
-            project=project,
-            proposal_object=proposal_object,
+        await self.update_proposal_by_title(
+            connected_user=connected_user,
+            project_name=project.name,
             proposal_title=create_proposal_object_input.proposal_title,
+            fields={
+                ProposalDocument.extracted_object: proposal_object,
+                ProposalDocument.validation_object: proposal_validation,
+            },
         )
 
-        await user.save()
-
         return proposal_validation
 
     async def get_proposal_validation_by_title(
@@ -1216,23 +1424,18 @@ class UserHandler:
         """Get the validation report for a proposal object by title.
 
         Args:
-            user (User): The user who owns the project.
-            project (Project): The project to which the proposal belongs.
-            proposal_title (str): The title of the proposal.
+            get_proposal_validation_input (GetProposalObjectValidationInput): Input containing project_name and proposal_title.
+            connected_user (ConnectedUser): The connected user object.
 
         Returns:
             ValidationReport: The validation report for the proposal object.
 
         """
 
-        user: User = await self.get_user(connected_user=connected_user)
-
-        project: Project = self.get_project_by_name(
-            user=user, project_name=get_proposal_validation_input.project_name
-        )
-
-        proposal: Proposal = self.get_proposal_by_title(
-            project=project, title=get_proposal_validation_input.proposal_title
+        proposal: ProposalDocument = await self.get_proposal_by_title(
+            connected_user=connected_user,
+            project_name=get_proposal_validation_input.project_name,
+            title=get_proposal_validation_input.proposal_title,
         )
 
         if not proposal.validation_object:
@@ -8,6 +8,8 @@ import platform
 
 import configparser
 
+from typing import Dict, List, Tuple
+
 from dotenv import load_dotenv
 
 load_dotenv("config/.env")
@@ -103,6 +105,46 @@ def load_param_str_config(section: str, param_name: str) -> str:
     return param
 
 
+def load_param_models_config(section: str, param_name: str) -> List[str]:
+    """Load a non empty comma separated list of [llm] params from .ini, as model
+    names"""
+
+    names: str = load_param_str_config(section=section, param_name=param_name)
+
+    models: List[str] = [
+        load_param_str_config(section="llm", param_name=name.strip())
+        for name in names.split(",")
+        if name.strip()
+    ]
+
+    if not models:
+        raise ValueError(f"[{section}] {param_name} must list at least one model")
+
+    return models
+
+
+def load_param_model_limits_config(
+    section: str, param_name: str
+) -> Dict[str, Tuple[int, int]]:
+    """Load a comma separated list of `[llm] param:RPM:TPM` from .ini, by model name"""
+
+    limits: Dict[str, Tuple[int, int]] = {}
+
+    for limit in load_param_str_config(section=section, param_name=param_name).split(
+        ","
+    ):
+        if not limit.strip():
+            continue
+
+        name, rpm, tpm = limit.strip().split(":")
+
+        model = load_param_str_config(section="llm", param_name=name.strip())
+
+        limits[model] = (int(rpm), int(tpm))
+
+    return limits
+
+
 def load_param_env_file(name: str) -> str:
     """Load env param from .env"""
 
@@ -120,6 +162,65 @@ class EnvParam:
 
     APP_NAME: str = str(load_param_str_config(section="app", param_name="APP_NAME"))
 
+    SESSION_TTL_SECONDS: int = int(
+        load_param_str_config(section="auth", param_name="SESSION_TTL_SECONDS")
+    )
+
+    SESSION_COOKIE_SECURE: bool = (
+        load_param_str_config(
+            section="auth", param_name="SESSION_COOKIE_SECURE"
+        ).lower()
+        == "true"
+    )
+
+    PROGEMI_API_TIMEOUT_SECONDS: float = float(
+        load_param_str_config(section="progemi_api", param_name="TIMEOUT_SECONDS")
+    )
+
+    PROGEMI_API_CONNECT_TIMEOUT_SECONDS: float = float(
+        load_param_str_config(
+            section="progemi_api", param_name="CONNECT_TIMEOUT_SECONDS"
+        )
+    )
+
+    PROGEMI_API_MAX_CONNECTIONS: int = int(
+        load_param_str_config(section="progemi_api", param_name="MAX_CONNECTIONS")
+    )
+
+    PROGEMI_API_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        load_param_str_config(
+            section="progemi_api", param_name="MAX_KEEPALIVE_CONNECTIONS"
+        )
+    )
+
+    PROGEMI_API_KEEPALIVE_EXPIRY_SECONDS: float = float(
+        load_param_str_config(
+            section="progemi_api", param_name="KEEPALIVE_EXPIRY_SECONDS"
+        )
+    )
+
+    PROGEMI_API_CACHE_TTL_SECONDS: int = int(
+        load_param_str_config(section="progemi_api", param_name="CACHE_TTL_SECONDS")
+    )
+
+    PROGEMI_API_CACHE_STALE_SECONDS: int = int(
+        load_param_str_config(section="progemi_api", param_name="CACHE_STALE_SECONDS")
+    )
+
+    PROGEMI_API_CACHE_MAX_ENTRIES: int = int(
+        load_param_str_config(section="progemi_api", param_name="CACHE_MAX_ENTRIES")
+    )
+
+    PROJECT_SYNC_INTERVAL_SECONDS: int = int(
+        load_param_str_config(section="project_sync", param_name="INTERVAL_SECONDS")
+    )
+
+    PROJECT_SYNC_ACTIVE_USER_TTL_SECONDS: int = int(
+        load_param_str_config(
+            section="project_sync", param_name="ACTIVE_USER_TTL_SECONDS"
+        )
+    )
+
     GPT_O1: str = str(load_param_str_config(section="llm", param_name="GPT_O1"))
 
     GPT_O3: str = str(load_param_str_config(section="llm", param_name="GPT_O3"))
@@ -176,6 +277,196 @@ class EnvParam:
         load_param_str_config(section="llm", param_name="TIMEOUT_GPT_4")
     )
 
+    CASCADE_ENABLED: bool = (
+        load_param_str_config(section="cascade", param_name="ENABLED").lower() == "true"
+    )
+
+    CASCADE_SECTIONS_MODELS: List[str] = load_param_models_config(
+        section="cascade", param_name="SECTIONS_MODELS"
+    )
+
+    CASCADE_STRUCTURING_MODELS: List[str] = load_param_models_config(
+        section="cascade", param_name="STRUCTURING_MODELS"
+    )
+
+    CASCADE_RETRY_MODELS: List[str] = load_param_models_config(
+        section="cascade", param_name="RETRY_MODELS"
+    )
+
+    LLM_CACHE_ENABLED: bool = (
+        load_param_str_config(section="llm_cache", param_name="ENABLED").lower()
+        == "true"
+    )
+
+    LLM_CACHE_TTL_SECONDS: int = int(
+        load_param_str_config(section="llm_cache", param_name="TTL_SECONDS")
+    )
+
+    LLM_CACHE_MAX_ENTRIES: int = int(
+        load_param_str_config(section="llm_cache", param_name="MAX_ENTRIES")
+    )
+
+    LLM_RETRY_MAX_ATTEMPTS: int = int(
+        load_param_str_config(section="llm_retry", param_name="MAX_ATTEMPTS")
+    )
+
+    LLM_RETRY_BASE_DELAY_SECONDS: float = float(
+        load_param_str_config(section="llm_retry", param_name="BASE_DELAY_SECONDS")
+    )
+
+    LLM_RETRY_MAX_DELAY_SECONDS: float = float(
+        load_param_str_config(section="llm_retry", param_name="MAX_DELAY_SECONDS")
+    )
+
+    LLM_RETRY_PIPELINE_DEADLINE_SECONDS: float = float(
+        load_param_str_config(
+            section="llm_retry", param_name="PIPELINE_DEADLINE_SECONDS"
+        )
+    )
+
+    LLM_HEDGING_ENABLED: bool = (
+        load_param_str_config(section="llm_hedging", param_name="ENABLED").lower()
+        == "true"
+    )
+
+    LLM_HEDGING_PERCENTILE: float = float(
+        load_param_str_config(section="llm_hedging", param_name="PERCENTILE")
+    )
+
+    LLM_HEDGING_MIN_SAMPLES: int = int(
+        load_param_str_config(section="llm_hedging", param_name="MIN_SAMPLES")
+    )
+
+    LLM_HEDGING_WINDOW: int = int(
+        load_param_str_config(section="llm_hedging", param_name="WINDOW")
+    )
+
+    LLM_HEDGING_MAX_INPUT_TOKENS: int = int(
+        load_param_str_config(section="llm_hedging", param_name="MAX_INPUT_TOKENS")
+    )
+
+    OPENAI_GATEWAY_TIMEOUT_SECONDS: float = float(
+        load_param_str_config(section="openai_gateway", param_name="TIMEOUT_SECONDS")
+    )
+
+    OPENAI_GATEWAY_MAX_CONNECTIONS: int = int(
+        load_param_str_config(section="openai_gateway", param_name="MAX_CONNECTIONS")
+    )
+
+    OPENAI_GATEWAY_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        load_param_str_config(
+            section="openai_gateway", param_name="MAX_KEEPALIVE_CONNECTIONS"
+        )
+    )
+
+    OPENAI_GATEWAY_MAX_CONCURRENT_REQUESTS: int = int(
+        load_param_str_config(
+            section="openai_gateway", param_name="MAX_CONCURRENT_REQUESTS"
+        )
+    )
+
+    OPENAI_GATEWAY_ESTIMATED_OUTPUT_TOKENS: int = int(
+        load_param_str_config(
+            section="openai_gateway", param_name="ESTIMATED_OUTPUT_TOKENS"
+        )
+    )
+
+    OPENAI_GATEWAY_FILE_BYTES_PER_TOKEN: int = int(
+        load_param_str_config(
+            section="openai_gateway", param_name="FILE_BYTES_PER_TOKEN"
+        )
+    )
+
+    OPENAI_GATEWAY_DEFAULT_RPM: int = int(
+        load_param_str_config(section="openai_gateway", param_name="DEFAULT_RPM")
+    )
+
+    OPENAI_GATEWAY_DEFAULT_TPM: int = int(
+        load_param_str_config(section="openai_gateway", param_name="DEFAULT_TPM")
+    )
+
+    OPENAI_GATEWAY_MODEL_LIMITS: Dict[str, Tuple[int, int]] = (
+        load_param_model_limits_config(
+            section="openai_gateway", param_name="MODEL_LIMITS"
+        )
+    )
+
+    AZURE_DI_MAX_CONCURRENT_ANALYSES: int = int(
+        load_param_str_config(section="ocr", param_name="MAX_CONCURRENT_ANALYSES")
+    )
+
+    AZURE_DI_USE_ASYNC_CLIENT: bool = (
+        load_param_str_config(section="ocr", param_name="USE_ASYNC_CLIENT").lower()
+        == "true"
+    )
+
+    AZURE_DI_CACHE_ENABLED: bool = (
+        load_param_str_config(section="ocr", param_name="CACHE_ENABLED").lower()
+        == "true"
+    )
+
+    AZURE_DI_CACHE_MAX_SIZE_MB: int = int(
+        load_param_str_config(section="ocr", param_name="CACHE_MAX_SIZE_MB")
+    )
+
+    POLYGON_EXHAUSTIVE_MATCHING: bool = (
+        load_param_str_config(
+            section="polygon", param_name="EXHAUSTIVE_MATCHING"
+        ).lower()
+        == "true"
+    )
+
+    POLYGON_CANDIDATES_TOP_K: int = int(
+        load_param_str_config(section="polygon", param_name="CANDIDATES_TOP_K")
+    )
+
+    RETRY_TARGETED_ENABLED: bool = (
+        load_param_str_config(section="retry", param_name="TARGETED_ENABLED").lower()
+        == "true"
+    )
+
+    RETRY_CONTEXT_LINES: int = int(
+        load_param_str_config(section="retry", param_name="CONTEXT_LINES")
+    )
+
+    RELOT_MAX_PRODUCTS_PER_CALL: int = int(
+        load_param_str_config(section="relot", param_name="MAX_PRODUCTS_PER_CALL")
+    )
+
+    RELOT_MAX_CONCURRENT_PROPOSALS: int = int(
+        load_param_str_config(section="relot", param_name="MAX_CONCURRENT_PROPOSALS")
+    )
+
+    PROPOSAL_STORAGE_BUCKET_NAME: str = str(
+        load_param_str_config(section="proposal_storage", param_name="BUCKET_NAME")
+    )
+
+    PROPOSAL_STORAGE_CHUNK_SIZE_BYTES: int = int(
+        load_param_str_config(section="proposal_storage", param_name="CHUNK_SIZE_BYTES")
+    )
+
+    PROPOSAL_STORAGE_LINK_GRACE_SECONDS: int = int(
+        load_param_str_config(
+            section="proposal_storage", param_name="LINK_GRACE_SECONDS"
+        )
+    )
+
+    JOBS_NB_WORKERS: int = int(
+        load_param_str_config(section="jobs", param_name="NB_WORKERS")
+    )
+
+    JOBS_MAX_QUEUE_SIZE: int = int(
+        load_param_str_config(section="jobs", param_name="MAX_QUEUE_SIZE")
+    )
+
+    JOBS_STALE_AFTER_SECONDS: int = int(
+        load_param_str_config(section="jobs", param_name="STALE_AFTER_SECONDS")
+    )
+
+    JOBS_HEARTBEAT_SECONDS: int = int(
+        load_param_str_config(section="jobs", param_name="HEARTBEAT_SECONDS")
+    )
+
     OPENAI_API_KEY: str = str(load_param_env_file(name="OPENAI_API_KEY"))
 
     AZURE_DI_URL: str = str(load_param_env_file(name="AZURE_DI_URL"))
@@ -190,5 +481,7 @@ class EnvParam:
 
     PROGEMI_API_VERSION: str = str(load_param_env_file(name="PROGEMI_API_VERSION"))
 
+    SESSION_SECRET_KEY: str = str(load_param_env_file(name="SESSION_SECRET_KEY"))
+
 
 env_param = EnvParam()
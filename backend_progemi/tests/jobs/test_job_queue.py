@@ -0,0 +1,105 @@
+"""Check that only the jobs lost with their process are failed as stale."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from beanie import init_beanie
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.auth.schemas import ConnectedUser
+
+from app.jobs.job_queue import STALE_JOB_ERROR, ProposalJobQueue
+
+from app.jobs.schemas import JobStatus, ProposalJob
+
+from app.user.schemas import CreateProposalObjectInput
+
+from config.config import env_param
+
+CONNECTED_USER = ConnectedUser(
+    user_id="user",
+    token="token",
+    ip_client="127.0.0.1",
+    idholding=1,
+    idsociete=1,
+    idagence=1,
+)
+
+
+@pytest.fixture(autouse=True)
+async def database() -> None:
+    """Initialize the jobs collection on a mocked database."""
+
+    await init_beanie(
+        database=AsyncMongoMockClient()["progemi"], document_models=[ProposalJob]
+    )
+
+
+@pytest.fixture
+def job_queue() -> ProposalJobQueue:
+    """Queue without workers, its jobs wait in the queue."""
+
+    return ProposalJobQueue(nb_workers=0, max_queue_size=10, heartbeat_seconds=60)
+
+
+def get_old_date() -> datetime:
+    """Date older than the stale delay of the jobs."""
+
+    return datetime.now(timezone.utc) - timedelta(
+        seconds=env_param.JOBS_STALE_AFTER_SECONDS + 60
+    )
+
+
+async def test_waiting_job_is_not_stale(job_queue: ProposalJobQueue) -> None:
+    """A job queued for longer than the stale delay is still queued."""
+
+    job = await job_queue.submit(
+        create_proposal_object_input=CreateProposalObjectInput(
+            project_name="Projet", proposal_title="Devis"
+        ),
+        connected_user=CONNECTED_USER,
+    )
+
+    job.updated_at = get_old_date()
+
+    await job.save()
+
+    job_output = await job_queue.get_job_output(
+        job_id=job.id, connected_user=CONNECTED_USER
+    )
+
+    assert job_output.status == JobStatus.QUEUED
+
+    await job_queue.touch_held_jobs()
+
+    touched = await ProposalJob.get(job.id)
+
+    assert touched.updated_at.replace(tzinfo=timezone.utc) > get_old_date()
+
+    await job_queue.fail_stale_jobs()
+
+    assert (await ProposalJob.get(job.id)).status == JobStatus.QUEUED
+
+
+async def test_lost_job_is_stale(job_queue: ProposalJobQueue) -> None:
+    """A pending job of another process not saved for too long is failed."""
+
+    job = ProposalJob(
+        user_id=CONNECTED_USER.user_id,
+        project_name="Projet",
+        proposal_title="Devis",
+        status=JobStatus.RUNNING,
+        updated_at=get_old_date(),
+    )
+
+    await job.insert()
+
+    job_output = await job_queue.get_job_output(
+        job_id=job.id, connected_user=CONNECTED_USER
+    )
+
+    assert job_output.status == JobStatus.FAILED
+
+    assert job_output.error == STALE_JOB_ERROR
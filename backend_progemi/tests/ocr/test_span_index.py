@@ -0,0 +1,200 @@
+"""Check the span indexes against a brute-force scan of the intervals."""
+
+import random
+
+from typing import List, Tuple
+
+import pytest
+
+from azure.ai.documentintelligence.models import (
+    DocumentPage,
+    DocumentSpan,
+    DocumentStyle,
+    DocumentWord,
+)
+
+from app.ocr.span_index import IntervalIndex, StyleIndex, WordIndex
+
+from app.performances.span_index_benchmark import run_benchmark
+
+SEEDS = range(20)
+
+
+def _intersects(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    """Do two half-open character intervals overlap?"""
+
+    return not (a[1] <= b[0] or a[0] >= b[1])
+
+
+def _random_intervals(
+    rng: random.Random, nb_intervals: int
+) -> List[Tuple[int, int, int]]:
+    """Build (start, end, value) intervals, with duplicates and empty ones."""
+
+    intervals: List[Tuple[int, int, int]] = []
+
+    for value in range(nb_intervals):
+        start = rng.randrange(200)
+
+        intervals.append((start, start + rng.randint(0, 30), value))
+
+    return intervals
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_interval_index_matches_brute_force(seed: int) -> None:
+    """Every query returns exactly the intervals a linear scan finds."""
+
+    rng = random.Random(seed)
+
+    intervals = _random_intervals(rng, nb_intervals=rng.randint(0, 80))
+
+    index = IntervalIndex(intervals)
+
+    for _ in range(100):
+        start = rng.randrange(-10, 240)
+
+        end = start + rng.randint(0, 40)
+
+        expected = sorted(
+            value
+            for interval_start, interval_end, value in intervals
+            if _intersects((interval_start, interval_end), (start, end))
+        )
+
+        assert sorted(index.overlapping(start, end)) == expected
+
+
+def test_interval_index_is_half_open() -> None:
+    """Intervals touching the query bounds do not overlap it."""
+
+    index = IntervalIndex([(0, 10, 0), (10, 20, 1), (20, 30, 2)])
+
+    assert sorted(index.overlapping(10, 20)) == [1]
+
+    assert index.overlapping(30, 40) == []
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_style_index_matches_brute_force(seed: int) -> None:
+    """The styles are those with a span overlapping a range, in the styles order."""
+
+    rng = random.Random(seed)
+
+    styles = [
+        DocumentStyle(
+            is_handwritten=False,
+            font_weight="bold",
+            spans=[
+                DocumentSpan(offset=rng.randrange(500), length=rng.randint(1, 40))
+                for _ in range(rng.randint(0, 4))
+            ],
+        )
+        for _ in range(rng.randint(0, 60))
+    ]
+
+    style_index = StyleIndex(styles)
+
+    for _ in range(50):
+        ranges = []
+
+        for _ in range(rng.randint(1, 6)):
+            start = rng.randrange(500)
+
+            ranges.append((start, start + rng.randint(1, 20)))
+
+        expected = [
+            style
+            for style in styles
+            if any(
+                _intersects((span.offset, span.offset + span.length), cell_range)
+                for span in style.spans or []
+                for cell_range in ranges
+            )
+        ]
+
+        assert style_index.overlapping(ranges) == expected
+
+
+def _make_pages(rng: random.Random) -> List[DocumentPage]:
+    """Build pages of contiguous words picked from a small vocabulary."""
+
+    pages: List[DocumentPage] = []
+
+    offset = 0
+
+    for page_number in range(1, 4):
+        words: List[DocumentWord] = []
+
+        for _ in range(rng.randint(0, 40)):
+            content = rng.choice(["Total", "total", "HT", "TVA", "lot", "1,00"])
+
+            words.append(
+                DocumentWord(
+                    content=content,
+                    span=DocumentSpan(offset=offset, length=len(content)),
+                    confidence=1.0,
+                )
+            )
+
+            offset += len(content) + 1
+
+        pages.append(DocumentPage(page_number=page_number, spans=[], words=words))
+
+    return pages
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_word_index_matches_brute_force(seed: int) -> None:
+    """Lookups by content and by range return the words a linear scan finds."""
+
+    rng = random.Random(seed)
+
+    pages = _make_pages(rng)
+
+    words = [word for page in pages for word in page.words]
+
+    word_index = WordIndex(pages)
+
+    for _ in range(50):
+        start = rng.randrange(400)
+
+        end = start + rng.randint(0, 30)
+
+        target = rng.choice(["total", "HT", "tva", "absent"])
+
+        expected_after = next(
+            (
+                word
+                for word in words
+                if word.span.offset >= start and word.content.lower() == target.lower()
+            ),
+            None,
+        )
+
+        assert word_index.find_after(start, target) is expected_after
+
+        expected_overlapping = [
+            word
+            for word in words
+            if _intersects(
+                (word.span.offset, word.span.offset + word.span.length), (start, end)
+            )
+        ]
+
+        assert list(word_index.overlapping(start, end)) == expected_overlapping
+
+
+def test_benchmark_times_both_implementations() -> None:
+    """The benchmark gives one timing per size, both implementations agreeing."""
+
+    timings = run_benchmark(sizes=[(5, 5), (10, 20)])
+
+    assert [(timing.nb_rows, timing.nb_styles) for timing in timings] == [
+        (5, 5),
+        (10, 20),
+    ]
+
+    assert all(
+        timing.loops_seconds >= 0 and timing.index_seconds >= 0 for timing in timings
+    )
@@ -0,0 +1,33 @@
+"""Check the escalation of ModelCascade and its rejection of an empty model list."""
+
+from typing import Optional
+
+import pytest
+
+from app.proposal_object.model_cascade import ModelCascade
+
+from app.proposal_object.stages import ProposalStage
+
+
+def test_empty_model_list_is_rejected() -> None:
+    """A cascade needs at least one model to run its stage."""
+
+    with pytest.raises(ValueError, match="sections"):
+        ModelCascade(stage=ProposalStage.SECTIONS, models=[], enabled=True)
+
+
+async def test_rejected_output_escalates() -> None:
+    """An output rejected by the stage is replaced by the one of the next model."""
+
+    cascade = ModelCascade(
+        stage=ProposalStage.SECTIONS, models=["mini", "large"], enabled=True
+    )
+
+    async def call(model: str) -> Optional[str]:
+        return f"output of {model}"
+
+    output, model = await cascade.run(
+        call=call, accept=lambda output: "large" in output
+    )
+
+    assert (output, model) == ("output of large", "large")
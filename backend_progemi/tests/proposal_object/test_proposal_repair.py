@@ -0,0 +1,313 @@
+"""Check each repair rule of ProposalRepair on small proposals."""
+
+from typing import Any, Dict, List, Optional
+
+from app.proposal_object.proposal_repair import ProposalRepair
+
+from app.proposal_object.proposal_validate_results import (
+    IncoherenceKind,
+    ValidateProposalObject,
+)
+
+from app.proposal_object.schemas import TVA, ProposalWithPolygonAndValidation
+
+
+def make_product(
+    label: str,
+    price_unitaire_ht: float,
+    quantite: float = 1,
+    tva: str = "TVA 20%",
+    eco_participation: Optional[float] = None,
+    sous_produits: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Build a product line as read from a proposal."""
+
+    return {
+        "label": label,
+        "description": f"Description {label}",
+        "quantite": quantite,
+        "unitee_quantite": None,
+        "price_unitaire_ht": price_unitaire_ht,
+        "tva": tva,
+        "eco_participation": eco_participation,
+        "lot": "Menuiseries",
+        "polygon": [],
+        "page": 1,
+        "sous_produits": sous_produits or [],
+    }
+
+
+def make_proposal(
+    products: List[Dict[str, Any]],
+    total_ht: float,
+    total_tva: float,
+    eco_participation: Optional[float] = None,
+) -> ProposalWithPolygonAndValidation:
+    """Build a proposal with its declared totals."""
+
+    return ProposalWithPolygonAndValidation.model_validate(
+        {
+            "devis_total_ht": total_ht,
+            "devis_total_tva": total_tva,
+            "devis_total_ttc": round(total_ht + total_tva, 2),
+            "devis_eco_participation": eco_participation,
+            "devis_produits": products,
+        }
+    )
+
+
+def repair(proposal: ProposalWithPolygonAndValidation):
+    """Validate a proposal, check it has errors, and repair it."""
+
+    proposal, report = ValidateProposalObject().validate_proposal_object(proposal)
+
+    assert report.errors
+
+    return ProposalRepair().repair(proposal=proposal, validation_report=report)
+
+
+def test_container_total_read_as_unit_price() -> None:
+    """The unit price of a container is its total divided by its quantity."""
+
+    proposal = make_proposal(
+        [
+            make_product(
+                "Lot",
+                300,
+                quantite=2,
+                sous_produits=[
+                    make_product("Porte", 100),
+                    make_product("Fenêtre", 200),
+                ],
+            )
+        ],
+        total_ht=300,
+        total_tva=60,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert [fix.path for fix in fixes] == ["Lot"]
+
+    assert repaired.devis_produits[0].price_unitaire_ht == 150
+
+
+def test_container_ttc_read_as_ht() -> None:
+    """The HT of a container read with taxes is the HT of its sub-products."""
+
+    proposal = make_proposal(
+        [
+            make_product(
+                "Lot",
+                360,
+                sous_produits=[
+                    make_product("Porte", 100),
+                    make_product("Fenêtre", 200),
+                ],
+            )
+        ],
+        total_ht=300,
+        total_tva=60,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert len(fixes) == 1
+
+    assert repaired.devis_produits[0].price_unitaire_ht == 300
+
+
+def test_child_total_read_as_quantity() -> None:
+    """The quantity of a line read as its total is divided by its unit price."""
+
+    proposal = make_proposal(
+        [
+            make_product(
+                "Lot",
+                300,
+                sous_produits=[
+                    make_product("Porte", 25, quantite=100),
+                    make_product("Fenêtre", 200),
+                ],
+            )
+        ],
+        total_ht=300,
+        total_tva=60,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert [fix.path for fix in fixes] == ["Lot"]
+
+    porte = repaired.devis_produits[0].sous_produits[0]
+
+    assert (porte.quantite, porte.price_unitaire_ht) == (4, 25)
+
+
+def test_child_total_read_as_unit_price() -> None:
+    """The unit price of a line read as its total is divided by its quantity."""
+
+    proposal = make_proposal(
+        [
+            make_product(
+                "Lot",
+                300,
+                sous_produits=[
+                    make_product("Porte", 100, quantite=4),
+                    make_product("Fenêtre", 200),
+                ],
+            )
+        ],
+        total_ht=300,
+        total_tva=60,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert len(fixes) == 1
+
+    porte = repaired.devis_produits[0].sous_produits[0]
+
+    assert (porte.quantite, porte.price_unitaire_ht) == (4, 25)
+
+
+def test_child_fix_is_not_applied_when_ambiguous() -> None:
+    """A line whose quantity and unit price fixes both clear the error is kept."""
+
+    proposal = make_proposal(
+        [
+            make_product(
+                "Lot",
+                300,
+                sous_produits=[
+                    make_product("Porte", 100, quantite=100),
+                    make_product("Fenêtre", 200),
+                ],
+            )
+        ],
+        total_ht=300,
+        total_tva=60,
+    )
+
+    validated, report = ValidateProposalObject().validate_proposal_object(proposal)
+
+    repaired, repaired_report, fixes = ProposalRepair().repair(
+        proposal=validated, validation_report=report
+    )
+
+    assert fixes == []
+
+    assert repaired is validated
+
+    assert repaired_report is report
+
+
+def test_eco_participation_on_container_and_children() -> None:
+    """The additional cost of a container summing its children is dropped."""
+
+    proposal = make_proposal(
+        [
+            make_product(
+                "Lot",
+                300,
+                eco_participation=5,
+                sous_produits=[
+                    make_product("Porte", 100, eco_participation=2),
+                    make_product("Fenêtre", 200, eco_participation=3),
+                ],
+            )
+        ],
+        total_ht=305,
+        total_tva=60,
+        eco_participation=5,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert [fix.kind for fix in fixes] == [IncoherenceKind.TOTAL_EXTRA_COST_MISMATCH]
+
+    assert repaired.devis_produits[0].eco_participation is None
+
+    assert [
+        child.eco_participation for child in repaired.devis_produits[0].sous_produits
+    ] == [2, 3]
+
+
+def test_eco_participation_counted_twice_in_total() -> None:
+    """A declared additional cost twice the computed one is halved."""
+
+    proposal = make_proposal(
+        [
+            make_product("Porte", 100, eco_participation=2),
+            make_product("Fenêtre", 200, eco_participation=3),
+        ],
+        total_ht=305,
+        total_tva=60,
+        eco_participation=10,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert [fix.kind for fix in fixes] == [IncoherenceKind.TOTAL_EXTRA_COST_MISMATCH]
+
+    assert repaired.devis_eco_participation == 5
+
+
+def test_single_line_tva() -> None:
+    """The rate of the only line explaining the VAT gap is fixed."""
+
+    proposal = make_proposal(
+        [
+            make_product("Porte", 100, tva="TVA 10%"),
+            make_product("Fenêtre", 200, tva="TVA 5.5%"),
+        ],
+        total_ht=300,
+        total_tva=50,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert [fix.kind for fix in fixes] == [IncoherenceKind.TOTAL_TVA_MISMATCH]
+
+    assert [product.tva for product in repaired.devis_produits] == [
+        TVA.TVA_10,
+        TVA.TVA_20,
+    ]
+
+
+def test_uniform_tva() -> None:
+    """Every line gets the only rate giving the declared VAT."""
+
+    proposal = make_proposal(
+        [
+            make_product("Porte", 100, tva="TVA 10%"),
+            make_product("Fenêtre", 200, tva="TVA 10%"),
+        ],
+        total_ht=300,
+        total_tva=60,
+    )
+
+    repaired, report, fixes = repair(proposal)
+
+    assert report.errors == []
+
+    assert [fix.kind for fix in fixes] == [IncoherenceKind.TOTAL_TVA_MISMATCH]
+
+    assert [product.tva for product in repaired.devis_produits] == [
+        TVA.TVA_20,
+        TVA.TVA_20,
+    ]
@@ -0,0 +1,141 @@
+"""Check how ProposalRetry groups the validation errors by product subtree."""
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from app.cost.cost import CostTracker
+
+from app.proposal_object.proposal_retry import ProposalRetry
+
+from app.proposal_object.proposal_validate_results import (
+    IncoherenceKind,
+    ValidationError,
+    ValidationReport,
+)
+
+from app.proposal_object.schemas import ProposalWithPolygonAndValidation
+
+
+def make_product(
+    label: str,
+    price_unitaire_ht: float,
+    sous_produits: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Build a product line as read from a proposal."""
+
+    return {
+        "label": label,
+        "description": f"Description {label}",
+        "quantite": 1,
+        "unitee_quantite": None,
+        "price_unitaire_ht": price_unitaire_ht,
+        "tva": "TVA 20%",
+        "eco_participation": None,
+        "lot": "Menuiseries",
+        "polygon": [],
+        "page": 1,
+        "sous_produits": sous_produits or [],
+    }
+
+
+@pytest.fixture
+def proposal() -> ProposalWithPolygonAndValidation:
+    """Proposal with two containers, the first one holding a container."""
+
+    return ProposalWithPolygonAndValidation.model_validate(
+        {
+            "devis_total_ht": 350,
+            "devis_total_tva": 70,
+            "devis_total_ttc": 420,
+            "devis_eco_participation": None,
+            "devis_produits": [
+                make_product(
+                    "Lot A",
+                    300,
+                    [
+                        make_product("Porte", 100),
+                        make_product(
+                            "Fenêtre", 200, [make_product("Vitrage", 200)]
+                        ),
+                    ],
+                ),
+                make_product("Lot B", 50, [make_product("Vis", 50)]),
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def proposal_retry() -> ProposalRetry:
+    """Retry without any LLM call, only its error location is used."""
+
+    return ProposalRetry(cost_tracker=CostTracker(), file_base64="")
+
+
+def make_report(*paths: str) -> ValidationReport:
+    """Build a validation report with an HT error at each path."""
+
+    return ValidationReport(
+        computed_total_ht=0,
+        computed_total_tva=0,
+        computed_total_ttc=0,
+        computed_total_cout_additionnel=0,
+        logs=[],
+        errors=[
+            ValidationError(
+                path=path, kind=IncoherenceKind.PRODUCT_HT_MISMATCH, log=path
+            )
+            for path in paths
+        ],
+    )
+
+
+def test_nested_errors_are_grouped_under_outermost_subtree(
+    proposal: ProposalWithPolygonAndValidation, proposal_retry: ProposalRetry
+) -> None:
+    """Errors inside a product with an error are retried with that product."""
+
+    report = make_report(
+        "Lot A > Fenêtre > Vitrage", "Lot A", "Lot A > Fenêtre", "Lot B > Vis"
+    )
+
+    subtrees = proposal_retry.locate_errors(proposal, report)
+
+    assert {
+        product_path: [error.path for error in errors]
+        for product_path, errors in subtrees.items()
+    } == {
+        (0,): ["Lot A", "Lot A > Fenêtre", "Lot A > Fenêtre > Vitrage"],
+        (1, 0): ["Lot B > Vis"],
+    }
+
+
+def test_sibling_errors_are_separate_subtrees(
+    proposal: ProposalWithPolygonAndValidation, proposal_retry: ProposalRetry
+) -> None:
+    """Errors on siblings without an error on their parent stay apart."""
+
+    subtrees = proposal_retry.locate_errors(
+        proposal, make_report("Lot A > Porte", "Lot A > Fenêtre > Vitrage")
+    )
+
+    assert sorted(subtrees) == [(0, 0), (0, 1, 0)]
+
+
+def test_total_errors_are_not_located(
+    proposal: ProposalWithPolygonAndValidation, proposal_retry: ProposalRetry
+) -> None:
+    """Errors on the proposal totals alone leave nothing to regenerate."""
+
+    assert proposal_retry.locate_errors(proposal, make_report("__root__")) is None
+
+
+def test_unknown_product_is_not_located(
+    proposal: ProposalWithPolygonAndValidation, proposal_retry: ProposalRetry
+) -> None:
+    """An error on a product missing from the proposal gives up the location."""
+
+    report = make_report("Lot A", "Lot C")
+
+    assert proposal_retry.locate_errors(proposal, report) is None
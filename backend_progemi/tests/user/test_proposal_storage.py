@@ -0,0 +1,193 @@
+"""Check the deduplication of concurrent uploads in ProposalFileStorage."""
+
+import io
+
+import hashlib
+
+from types import SimpleNamespace
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from fastapi import UploadFile
+
+from gridfs.errors import FileExists
+
+from mongomock_motor import AsyncMongoMockClient
+
+from pymongo.errors import DuplicateKeyError
+
+from beanie.odm.fields import PydanticObjectId
+
+from app.user.proposal_storage import ProposalFileStorage
+
+BUCKET_NAME = "proposal_files"
+
+CONTENT = b"%PDF-1.7 devis"
+
+
+class FakeGridIn:
+    """Upload stream whose file document insert fails with a duplicate key, as
+    GridFS reports it."""
+
+    def __init__(self, database: Any, file_id: Any, key_pattern: Dict[str, int]):
+        """Initialize the stream of a file."""
+
+        self.database = database
+
+        self.file_id = file_id
+
+        self.key_pattern = key_pattern
+
+        self.aborted = False
+
+    async def write(self, chunk: bytes) -> None:
+        """Store a chunk of the file."""
+
+        await self.database[f"{BUCKET_NAME}.chunks"].insert_one(
+            {"files_id": self.file_id, "data": chunk}
+        )
+
+    async def set(self, name: str, value: Any) -> None:
+        """Ignore the file attributes."""
+
+    async def close(self) -> None:
+        """Fail as GridFS does when the file document hits a unique index."""
+
+        try:
+            raise DuplicateKeyError(
+                "E11000 duplicate key error", 11000, {"keyPattern": self.key_pattern}
+            )
+
+        except DuplicateKeyError:
+            raise FileExists(f"file with _id {self.file_id!r} already exists")
+
+    async def abort(self) -> None:
+        """Remove the chunks written so far."""
+
+        await self.database[f"{BUCKET_NAME}.chunks"].delete_many(
+            {"files_id": self.file_id}
+        )
+
+        self.aborted = True
+
+
+class FakeBucket:
+    """GridFS bucket of the fake upload streams, reading the mocked database."""
+
+    def __init__(self, database: Any, key_pattern: Dict[str, int]) -> None:
+        """Initialize the bucket."""
+
+        self.database = database
+
+        self.key_pattern = key_pattern
+
+        self.grid_ins: List[FakeGridIn] = []
+
+    def open_upload_stream_with_id(
+        self, file_id: Any, filename: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> FakeGridIn:
+        """Open an upload stream."""
+
+        grid_in = FakeGridIn(
+            database=self.database, file_id=file_id, key_pattern=self.key_pattern
+        )
+
+        self.grid_ins.append(grid_in)
+
+        return grid_in
+
+    def find(self, query: Dict[str, Any]) -> Any:
+        """Find the file documents."""
+
+        cursor = self.database[f"{BUCKET_NAME}.files"].find(query)
+
+        async def to_list(length: int) -> List[SimpleNamespace]:
+            return [
+                SimpleNamespace(_id=document["_id"])
+                for document in await cursor.to_list(length)
+            ]
+
+        return SimpleNamespace(to_list=to_list)
+
+
+def make_storage(key_pattern: Dict[str, int]) -> ProposalFileStorage:
+    """Build a storage on a mocked database and a fake bucket."""
+
+    database = AsyncMongoMockClient()["progemi"]
+
+    storage = ProposalFileStorage(
+        bucket_name=BUCKET_NAME, chunk_size_bytes=4, link_grace_seconds=300
+    )
+
+    storage._database = database
+
+    storage._bucket = FakeBucket(database=database, key_pattern=key_pattern)
+
+    return storage
+
+
+async def store_concurrent_copy(storage: ProposalFileStorage) -> PydanticObjectId:
+    """Store the same content as another upload finishing first."""
+
+    existing_id = PydanticObjectId()
+
+    await storage.database[f"{BUCKET_NAME}.files"].insert_one(
+        {"_id": existing_id, "sha256": hashlib.sha256(CONTENT).hexdigest()}
+    )
+
+    return existing_id
+
+
+async def test_concurrent_upload_links_to_stored_file() -> None:
+    """An upload losing the race on the content hash links to the stored file."""
+
+    storage = make_storage(key_pattern={"sha256": 1})
+
+    upload_file = UploadFile(file=io.BytesIO(CONTENT), filename="devis.pdf")
+
+    find_by_sha256 = storage.find_by_sha256
+
+    async def find_after_race(sha256: str) -> Optional[PydanticObjectId]:
+        """Find nothing before the upload closes, the concurrent file after."""
+
+        if not storage.bucket.grid_ins[0].aborted:
+            return None
+
+        return await find_by_sha256(sha256=sha256)
+
+    storage.find_by_sha256 = find_after_race
+
+    existing_id = await store_concurrent_copy(storage=storage)
+
+    stored_file = await storage.upload(file=upload_file)
+
+    assert stored_file.file_id == existing_id
+
+    assert stored_file.is_duplicate
+
+    assert storage.bucket.grid_ins[0].aborted
+
+    assert await storage.database[f"{BUCKET_NAME}.chunks"].count_documents({}) == 0
+
+    existing = await storage.database[f"{BUCKET_NAME}.files"].find_one(
+        {"_id": existing_id}
+    )
+
+    assert existing["metadata"]["linked_at"]
+
+
+async def test_upload_with_taken_id_fails() -> None:
+    """An upload conflicting on its ID is not linked to another file."""
+
+    storage = make_storage(key_pattern={"_id": 1})
+
+    upload_file = UploadFile(file=io.BytesIO(CONTENT), filename="devis.pdf")
+
+    with pytest.raises(FileExists):
+        await storage.upload(file=upload_file)
+
+    assert storage.bucket.grid_ins[0].aborted
+
+    assert await storage.database[f"{BUCKET_NAME}.chunks"].count_documents({}) == 0